@@ -0,0 +1,187 @@
+"""
+Admission control for expensive routes
+
+Each limited route admits a fixed number of concurrent requests. Extra
+requests wait in a short bounded queue; when the queue is full, or a slot
+does not free up in time, they are rejected immediately with a 429 and a
+Retry-After header instead of piling more work onto a saturated worker.
+
+Limits are per process (each uvicorn worker enforces its own).
+"""
+import asyncio
+import logging
+from collections import deque
+from typing import Dict, Optional
+
+from starlette.responses import JSONResponse
+from starlette.types import ASGIApp, Receive, Scope, Send
+
+from company_insight_service.config.settings import settings
+from company_insight_service.monitoring.metrics import (
+    ADMISSION_IN_FLIGHT,
+    ADMISSION_QUEUED,
+    ADMISSION_REJECTED
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUE_FULL = "queue_full"
+QUEUE_TIMEOUT = "queue_timeout"
+
+
+class AdmissionRejected(Exception):
+    """Raised when a request cannot be admitted"""
+
+    def __init__(self, reason: str):
+        super().__init__(reason)
+        self.reason = reason
+
+
+class ConcurrencyLimiter:
+    """
+    Concurrency limit with a bounded FIFO wait queue
+
+    Slots are handed directly to the oldest waiter on release, so queued
+    requests are served in arrival order.
+    """
+
+    def __init__(self, name: str, max_concurrent: int, max_queued: int, queue_timeout: float):
+        self.name = name
+        self.max_concurrent = max_concurrent
+        self.max_queued = max_queued
+        self.queue_timeout = queue_timeout
+        self.in_flight = 0
+        self._waiters: deque = deque()
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self):
+        """
+        Take a slot, waiting in the queue if necessary
+
+        Raises:
+            AdmissionRejected: If the queue is full or the wait timed out
+        """
+        if self.in_flight < self.max_concurrent and not self._waiters:
+            self._set_in_flight(self.in_flight + 1)
+            return
+
+        if len(self._waiters) >= self.max_queued:
+            raise AdmissionRejected(QUEUE_FULL)
+
+        waiter = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        self._update_queued()
+        try:
+            await asyncio.wait_for(waiter, timeout=self.queue_timeout)
+        except asyncio.TimeoutError:
+            # The slot may have been handed over just as the wait expired
+            if waiter.done() and not waiter.cancelled():
+                return
+            raise AdmissionRejected(QUEUE_TIMEOUT)
+        except asyncio.CancelledError:
+            # Client went away; pass on a slot we were already given
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            raise
+        finally:
+            if waiter in self._waiters:
+                self._waiters.remove(waiter)
+            self._update_queued()
+
+    def release(self):
+        """Give the slot to the next waiter, or free it"""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                waiter.set_result(None)
+                self._update_queued()
+                return
+        self._update_queued()
+        self._set_in_flight(self.in_flight - 1)
+
+    def _set_in_flight(self, value: int):
+        self.in_flight = value
+        ADMISSION_IN_FLIGHT.labels(route=self.name).set(value)
+
+    def _update_queued(self):
+        ADMISSION_QUEUED.labels(route=self.name).set(len(self._waiters))
+
+
+def default_limiters() -> Dict[str, ConcurrencyLimiter]:
+    """
+    Limiters for the expensive routes, keyed by path
+
+    Paths that run the same work share one limiter (the POST and SSE
+    variants of deep_search count against the same cap).
+    """
+    deep_search = ConcurrencyLimiter(
+        "deep_search",
+        settings.DEEP_SEARCH_MAX_CONCURRENT,
+        settings.DEEP_SEARCH_MAX_QUEUED,
+        settings.DEEP_SEARCH_QUEUE_TIMEOUT
+    )
+    return {
+        "/company/deep_search": deep_search,
+        "/company/deep_search/events": deep_search,
+        "/company/stock_trends": ConcurrencyLimiter(
+            "stock_trends",
+            settings.STOCK_TRENDS_MAX_CONCURRENT,
+            settings.STOCK_TRENDS_MAX_QUEUED,
+            settings.STOCK_TRENDS_QUEUE_TIMEOUT
+        ),
+        "/company/monthly_events": ConcurrencyLimiter(
+            "monthly_events",
+            settings.MONTHLY_EVENTS_MAX_CONCURRENT,
+            settings.MONTHLY_EVENTS_MAX_QUEUED,
+            settings.MONTHLY_EVENTS_QUEUE_TIMEOUT
+        ),
+    }
+
+
+class AdmissionControlMiddleware:
+    """
+    ASGI middleware applying a ConcurrencyLimiter per path
+
+    The slot is held until the response body has been fully sent, so
+    streaming responses (deep_search) count for their whole duration.
+    """
+
+    def __init__(
+        self,
+        app: ASGIApp,
+        limiters: Optional[Dict[str, ConcurrencyLimiter]] = None,
+        retry_after: Optional[int] = None
+    ):
+        self.app = app
+        self.limiters = limiters if limiters is not None else default_limiters()
+        self.retry_after = retry_after or settings.ADMISSION_RETRY_AFTER_SECONDS
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        limiter = self.limiters.get(scope.get("path", "").rstrip("/")) if scope["type"] == "http" else None
+        if limiter is None:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await limiter.acquire()
+        except AdmissionRejected as e:
+            ADMISSION_REJECTED.labels(route=limiter.name, reason=e.reason).inc()
+            logger.warning(
+                f"🚦 Rejected {scope['path']} ({e.reason}; "
+                f"in flight: {limiter.in_flight}, queued: {limiter.queued})"
+            )
+            response = JSONResponse(
+                {"detail": "Server busy, retry later", "reason": e.reason},
+                status_code=429,
+                headers={"Retry-After": str(self.retry_after)}
+            )
+            await response(scope, receive, send)
+            return
+
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            limiter.release()
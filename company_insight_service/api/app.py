@@ -2,13 +2,34 @@
 FastAPI application initialization
 """
 import logging
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 
-from company_insight_service.api.routes import company, health
+from company_insight_service.api.admission import AdmissionControlMiddleware
+from company_insight_service.api.request_metrics import RequestMetricsMiddleware
+from company_insight_service.api.serialization import FastJSONResponse
+from company_insight_service.api.routes import company, health, insights, jobs, metrics
 
 logger = logging.getLogger(__name__)
 
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Application startup/shutdown hooks"""
+    yield
+    
+    from company_insight_service.core.executors import shutdown_pools
+    from company_insight_service.core.jobs import job_runner
+    from company_insight_service.core.notifier import shutdown_notifier
+    from company_insight_service.monitoring.metrics import mark_process_dead
+    from company_insight_service.workers.publisher import shutdown_publisher
+    job_runner.shutdown(wait=False)
+    shutdown_pools(wait=False)
+    shutdown_publisher()
+    shutdown_notifier()
+    mark_process_dead()
+
+
 def create_app() -> FastAPI:
     """
     Create and configure the FastAPI application
@@ -16,12 +37,24 @@ def create_app() -> FastAPI:
     app = FastAPI(
         title="Company Intelligence API",
         description="Deep insights into companies using LangGraph, scraping, and sentiment analysis.",
-        version="2.0.0"
+        version="2.0.0",
+        lifespan=lifespan,
+        default_response_class=FastJSONResponse
     )
     
+    # Bound concurrent work on expensive routes (429 + Retry-After when saturated)
+    app.add_middleware(AdmissionControlMiddleware)
+    
     # Include routers
-    app.include_router(health.router)
-    app.include_router(company.router)
+    routers = [health.router, company.router, jobs.router, insights.router, metrics.router]
+    for router in routers:
+        app.include_router(router)
+    
+    # Outermost: per-route latency and in-flight requests, including 429s
+    app.add_middleware(
+        RequestMetricsMiddleware,
+        routes=[route for router in routers for route in router.routes]
+    )
     
     # Import signals for DB monitoring (registers event listeners)
     try:
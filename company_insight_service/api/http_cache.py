@@ -0,0 +1,90 @@
+"""
+HTTP caching helpers: strong ETags, conditional GETs and Cache-Control
+"""
+import calendar
+import hashlib
+from datetime import datetime, timezone
+from typing import Any, Optional
+
+from fastapi import Request, Response
+
+from company_insight_service.api.serialization import FastJSONResponse
+from company_insight_service.config.settings import settings
+
+# Conditional requests only short-circuit safe methods
+CONDITIONAL_METHODS = ("GET", "HEAD")
+
+_MONTHS = {name.lower(): i for i, name in enumerate(calendar.month_name) if name}
+_MONTHS.update({abbr.lower(): i for i, abbr in enumerate(calendar.month_abbr) if abbr})
+
+
+def compute_etag(body: bytes) -> str:
+    """Strong ETag (quoted sha256 of the exact response body)"""
+    return f'"{hashlib.sha256(body).hexdigest()}"'
+
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """
+    Whether an If-None-Match header matches an ETag
+
+    Uses weak comparison as RFC 9110 requires for If-None-Match, so a
+    `W/` prefix added by an intermediary still matches.
+    """
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    candidates = (tag.strip() for tag in if_none_match.split(","))
+    return any(tag.removeprefix("W/") == etag for tag in candidates)
+
+
+def cache_control(max_age: int) -> str:
+    """Cache-Control value for shared, cacheable responses"""
+    return f"public, max-age={max_age}"
+
+
+def cacheable_json(request: Request, content: Any, max_age: int) -> Response:
+    """
+    Serialize content as JSON with an ETag and Cache-Control
+
+    Args:
+        request: Incoming request (its If-None-Match header is honored for GET/HEAD)
+        content: Response payload
+        max_age: Seconds clients and CDNs may reuse the response
+
+    Returns:
+        A 304 without a body if the client already has this representation,
+        otherwise a 200 JSON response
+    """
+    response = FastJSONResponse(content)
+    etag = compute_etag(response.body)
+    headers = {"ETag": etag, "Cache-Control": cache_control(max_age)}
+
+    if request.method in CONDITIONAL_METHODS and etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    response.headers.update(headers)
+    return response
+
+
+def parse_month(month: str) -> Optional[int]:
+    """Month number (1-12) from a name, abbreviation or number, or None"""
+    value = month.strip().lower()
+    if value.isdigit():
+        number = int(value)
+        return number if 1 <= number <= 12 else None
+    return _MONTHS.get(value)
+
+
+def monthly_events_max_age(month: str, year: int, now: Optional[datetime] = None) -> int:
+    """
+    Cache lifetime for a month's events
+
+    Months that have ended no longer gain news, so they are cached far
+    longer than the current (or an unrecognized / future) month.
+    """
+    now = now or datetime.now(timezone.utc)
+    month_number = parse_month(month)
+    if month_number is not None and (year, month_number) < (now.year, now.month):
+        return settings.MONTHLY_EVENTS_PAST_MAX_AGE
+    return settings.MONTHLY_EVENTS_CURRENT_MAX_AGE
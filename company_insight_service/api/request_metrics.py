@@ -0,0 +1,77 @@
+"""
+Per-route request latency and in-flight metrics
+"""
+import time
+from typing import Sequence
+
+from starlette.routing import BaseRoute, Match
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from company_insight_service.monitoring.metrics import (
+    HTTP_REQUEST_SECONDS,
+    HTTP_REQUESTS_IN_FLIGHT
+)
+
+UNMATCHED = "unmatched"
+
+
+def route_template(scope: Scope, routes: Sequence[BaseRoute]) -> str:
+    """
+    Route path template for a request (e.g. /company/deep_search/jobs/{job_id})
+
+    Labels use the template rather than the raw path to keep the number of
+    time series bounded.
+    """
+    partial = None
+    for route in routes:
+        match, _ = route.matches(scope)
+        if match == Match.FULL:
+            return route.path
+        if match == Match.PARTIAL and partial is None:
+            partial = route.path  # Path matches, method does not (405)
+    return partial or UNMATCHED
+
+
+class RequestMetricsMiddleware:
+    """
+    ASGI middleware recording request latency and in-flight requests
+
+    Latency runs until the response body has been sent, so streaming
+    responses are measured end to end. Added last, it wraps admission
+    control and therefore also counts queue waits and 429s.
+
+    Args:
+        app: ASGI app to wrap
+        routes: Routes to resolve path templates against (the API routers'
+            routes, which carry their full prefixed paths)
+    """
+
+    def __init__(self, app: ASGIApp, routes: Sequence[BaseRoute] = ()):
+        self.app = app
+        self.routes = list(routes)
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        method = scope["method"]
+        route = route_template(scope, self.routes)
+        status = "500"
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = str(message["status"])
+            await send(message)
+
+        in_flight = HTTP_REQUESTS_IN_FLIGHT.labels(method=method, route=route)
+        in_flight.inc()
+        started = time.perf_counter()
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            in_flight.dec()
+            HTTP_REQUEST_SECONDS.labels(method=method, route=route, status=status).observe(
+                time.perf_counter() - started
+            )
@@ -1,6 +1,6 @@
 """
 API routes package
 """
-from company_insight_service.api.routes import company, health
+from company_insight_service.api.routes import company, health, insights, jobs, metrics
 
-__all__ = ['company', 'health']
+__all__ = ['company', 'health', 'insights', 'jobs', 'metrics']
@@ -1,28 +1,92 @@
 """
 Company-related API routes
 """
-import json
-import asyncio
 import logging
-from fastapi import APIRouter, HTTPException
-from fastapi.responses import StreamingResponse
-from pydantic import BaseModel
+from fastapi import APIRouter, HTTPException, Header, Query, Request
+from pydantic import BaseModel, Field
 from typing import Optional, List, Dict
 
 from company_insight_service.services import (
     get_monthly_events,
     find_ticker,
-    get_stock_data_analysis
+    fetch_close_prices,
+    summarize_close_prices
+)
+from company_insight_service.api.http_cache import cacheable_json, monthly_events_max_age
+from company_insight_service.api.streaming import event_stream_response, SSE
+from company_insight_service.config.settings import settings
+from company_insight_service.core.cache import StaleWhileRevalidateCache, MISS, STALE
+from company_insight_service.core.executors import run_cpu, run_deep_search, run_network
+from company_insight_service.services.deadline import Deadline
+from company_insight_service.workflows.runner import (
+    stream_workflow,
+    get_run_company,
+    run_workflow,
+    apply_update,
+    result_from_state
 )
-from company_insight_service.workflows.company_research import app_flow
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter(prefix="/company", tags=["company"])
 
+# Final deep search results per company (see deep_search_company)
+deep_search_cache = StaleWhileRevalidateCache(
+    fresh_ttl=settings.DEEP_SEARCH_CACHE_FRESH_TTL,
+    stale_ttl=settings.DEEP_SEARCH_CACHE_STALE_TTL,
+    max_entries=settings.DEEP_SEARCH_CACHE_MAX_ENTRIES,
+    name="deep_search"
+)
+
+
+def _cache_key(company_name: str) -> str:
+    return company_name.strip().lower()
+
+
+def _request_deadline(body_seconds: Optional[float], header_value: Optional[str]) -> Deadline:
+    """
+    Resolve the deadline for a deep search
+    
+    The tighter of the body field and the X-Request-Deadline header wins;
+    without either the configured default applies. Capped at the maximum.
+    """
+    candidates = [settings.DEEP_SEARCH_MAX_DEADLINE_SECONDS]
+    if body_seconds is not None:
+        candidates.append(body_seconds)
+    if header_value is not None:
+        try:
+            header_seconds = float(header_value)
+        except ValueError:
+            header_seconds = 0
+        if header_seconds <= 0:
+            raise HTTPException(
+                status_code=400,
+                detail="X-Request-Deadline must be a positive number of seconds"
+            )
+        candidates.append(header_seconds)
+    if body_seconds is None and header_value is None:
+        candidates.append(settings.DEEP_SEARCH_DEADLINE_SECONDS)
+    
+    return Deadline.after(min(candidates))
+
+
+def _refresh_deep_search(company_name: str) -> Optional[Dict]:
+    """
+    Recompute a deep search result for the cache
+
+    Bounded by the default request deadline, so a hung upstream cannot pin
+    the refresh thread (and block later refreshes of the key).
+    """
+    state = run_workflow(company_name, deadline=Deadline.after(settings.DEEP_SEARCH_DEADLINE_SECONDS))
+    if state.get("errors") or any((state.get("timed_out") or {}).values()):
+        return None
+    return result_from_state(state)
+
 
 class CompanyRequest(BaseModel):
     company_name: str
+    run_id: Optional[str] = None  # Resume a previous (interrupted) run
+    deadline_seconds: Optional[float] = Field(None, gt=0)  # End-to-end budget for the run
 
 
 class MonthlyEventRequest(BaseModel):
@@ -36,42 +100,38 @@ class StockTrendRequest(BaseModel):
     years: int = 3
 
 
-@router.post("/monthly_events")
-async def company_monthly_events(request: MonthlyEventRequest):
-    """
-    Get news and events for a company during a specific month and year
-    """
-    if not request.company_name or not request.month or not request.year:
+async def _monthly_events_payload(company_name: str, month: str, year: int) -> Dict:
+    if not company_name or not month or not year:
         raise HTTPException(
             status_code=400,
             detail="All fields (company_name, month, year) are required"
         )
     
-    events = get_monthly_events(request.company_name, request.month, request.year)
+    events = await run_network(get_monthly_events, company_name, month, year)
     
     return {
-        "company": request.company_name,
-        "period": f"{request.month} {request.year}",
+        "company": company_name,
+        "period": f"{month} {year}",
         "events": events
     }
 
 
-@router.post("/stock_trends")
-async def company_stock_trends(request: StockTrendRequest):
-    """
-    Analyze stock trends (dip/peak months) over a specified number of years
-    """
-    if not request.company_name:
+async def _stock_trends_payload(company_name: str, years: int) -> Dict:
+    if not company_name:
         raise HTTPException(status_code=400, detail="company_name is required")
         
-    ticker = find_ticker(request.company_name)
+    ticker = await run_network(find_ticker, company_name)
     if not ticker:
         raise HTTPException(
             status_code=404,
-            detail=f"Ticker not found for {request.company_name}"
+            detail=f"Ticker not found for {company_name}"
         )
         
-    analysis = get_stock_data_analysis(ticker, years=request.years)
+    # Download on the network pool, analyze on the CPU pool
+    close_prices = await run_network(fetch_close_prices, ticker, years)
+    analysis = None
+    if close_prices is not None:
+        analysis = await run_cpu(summarize_close_prices, ticker, years, close_prices)
     if not analysis:
         raise HTTPException(
             status_code=500,
@@ -79,51 +139,200 @@ async def company_stock_trends(request: StockTrendRequest):
         )
         
     return {
-        "company": request.company_name,
+        "company": company_name,
         "ticker": ticker,
         "analysis": analysis
     }
 
 
+@router.get("/monthly_events")
+async def get_company_monthly_events(
+    request: Request,
+    company_name: str,
+    month: str,
+    year: int
+):
+    """
+    Get news and events for a company during a specific month and year
+    
+    Cacheable: carries an ETag (If-None-Match returns 304) and a
+    Cache-Control max-age that is much longer for months that have ended.
+    """
+    payload = await _monthly_events_payload(company_name, month, year)
+    return cacheable_json(request, payload, monthly_events_max_age(month, year))
+
+
+@router.post("/monthly_events")
+async def company_monthly_events(request: Request, body: MonthlyEventRequest):
+    """
+    Get news and events for a company during a specific month and year
+    
+    Prefer the GET variant, which CDNs and clients can cache.
+    """
+    payload = await _monthly_events_payload(body.company_name, body.month, body.year)
+    return cacheable_json(request, payload, monthly_events_max_age(body.month, body.year))
+
+
+@router.get("/stock_trends")
+async def get_company_stock_trends(request: Request, company_name: str, years: int = 3):
+    """
+    Analyze stock trends (dip/peak months) over a specified number of years
+    
+    Cacheable: carries an ETag (If-None-Match returns 304) and a
+    Cache-Control max-age.
+    """
+    payload = await _stock_trends_payload(company_name, years)
+    return cacheable_json(request, payload, settings.STOCK_TRENDS_MAX_AGE)
+
+
+@router.post("/stock_trends")
+async def company_stock_trends(request: Request, body: StockTrendRequest):
+    """
+    Analyze stock trends (dip/peak months) over a specified number of years
+    
+    Prefer the GET variant, which CDNs and clients can cache.
+    """
+    payload = await _stock_trends_payload(body.company_name, body.years)
+    return cacheable_json(request, payload, settings.STOCK_TRENDS_MAX_AGE)
+
+
 @router.post("/deep_search")
-async def deep_search_company(request: CompanyRequest):
+async def deep_search_company(
+    request: Request,
+    body: CompanyRequest,
+    x_request_deadline: Optional[str] = Header(None)
+):
     """
     Trigger the deep analysis workflow (LangGraph) and stream progress
+    
+    Every run is checkpointed under a run ID (returned in the first `run`
+    event). Passing that `run_id` back resumes the run: completed nodes are
+    replayed from the checkpoint and only pending nodes are executed.
+    
+    Final results are cached per company. A fresh hit is streamed back as a
+    single `cached` event; a stale hit is streamed the same way while a
+    background refresh recomputes it. The `Age` and `X-Cache` headers (and
+    the `cached` event) state the freshness of the result.
+    
+    The run is bounded by an end-to-end deadline (`deadline_seconds` or the
+    `X-Request-Deadline` header, in seconds). Work still running when it
+    passes is abandoned and the partial state is returned, with cut-short
+    fields flagged in `timed_out`.
+    
+    Events are sent as NDJSON, or as Server-Sent Events with
+    `Accept: text/event-stream`, gzip/zstd compressed per Accept-Encoding.
     """
-    if not request.company_name:
+    return _deep_search_stream(request, body, x_request_deadline)
+
+
+@router.get("/deep_search/events")
+async def deep_search_company_events(
+    request: Request,
+    company_name: str,
+    run_id: Optional[str] = None,
+    deadline_seconds: Optional[float] = Query(None, gt=0),
+    x_request_deadline: Optional[str] = Header(None)
+):
+    """
+    Server-Sent Events variant of /company/deep_search for EventSource clients
+    
+    Same events, caching and deadlines as the POST endpoint; each event is
+    sent with its `event` field as the SSE event name.
+    """
+    body = CompanyRequest(company_name=company_name, run_id=run_id, deadline_seconds=deadline_seconds)
+    return _deep_search_stream(request, body, x_request_deadline, fmt=SSE)
+
+
+def _deep_search_stream(
+    request: Request,
+    body: CompanyRequest,
+    x_request_deadline: Optional[str],
+    fmt: Optional[str] = None
+):
+    if not body.company_name:
         raise HTTPException(status_code=400, detail="Company name is required")
     
-    async def event_generator():
-        initial_state = {
-            "company_name": request.company_name,
-            "ticker": None,
-            "news": [],
-            "product_sentiment": [],
-            "stock_analysis": None,
-            "financials": None,
-            "errors": []
-        }
+    deadline = _request_deadline(body.deadline_seconds, x_request_deadline)
+    
+    if body.run_id:
+        run_company = get_run_company(body.run_id)
+        if run_company and run_company != body.company_name:
+            raise HTTPException(
+                status_code=409,
+                detail=f"Run {body.run_id} belongs to a different company"
+            )
+    
+    cache_key = _cache_key(body.company_name)
+    
+    # Resumed runs always go through the workflow
+    lookup = deep_search_cache.get(cache_key) if not body.run_id else None
+    
+    if lookup and lookup.status != MISS:
+        if lookup.status == STALE:
+            deep_search_cache.refresh(
+                cache_key, lambda: _refresh_deep_search(body.company_name)
+            )
+        
+        async def cached_events():
+            yield {
+                "event": "cached",
+                "freshness": lookup.status,
+                "age_seconds": round(lookup.age, 1),
+                "refreshing": deep_search_cache.is_refreshing(cache_key),
+                "data": lookup.value
+            }
+            yield {
+                "event": "complete",
+                "message": "Served from cache."
+            }
+        
+        return event_stream_response(
+            request,
+            cached_events(),
+            headers={"Age": str(int(lookup.age)), "X-Cache": f"HIT-{lookup.status.upper()}"},
+            fmt=fmt
+        )
+    
+    async def workflow_events():
+        run_id = body.run_id
+        final_state = {}
         
         try:
-            # Stream events from LangGraph
-            for event in app_flow.stream(initial_state):
-                for node_name, updates in event.items():
-                    chunk = {
-                        "event": "update",
-                        "node": node_name,
-                        "data": updates
-                    }
-                    yield json.dumps(chunk) + "\n"
-                    await asyncio.sleep(0.1)
+            # Stream events from LangGraph, advancing the (blocking) workflow on its own pool
+            events = stream_workflow(body.company_name, run_id=run_id, deadline=deadline)
+            while True:
+                chunk = await run_deep_search(next, events, None)
+                if chunk is None:
+                    break
+                
+                if chunk["event"] == "run":
+                    run_id = chunk["run_id"]
+                elif chunk["event"] == "update" and chunk["data"]:
+                    apply_update(final_state, chunk["data"])
+                yield chunk
+            
+            timed_out = [field for field, flag in final_state.get("timed_out", {}).items() if flag]
+            if not final_state.get("errors") and not timed_out:
+                deep_search_cache.set(cache_key, result_from_state(final_state))
             
-            yield json.dumps({
+            yield {
                 "event": "complete",
-                "message": "Workflow finished. Data queued for saving."
-            }) + "\n"
+                "run_id": run_id,
+                "timed_out": timed_out,
+                "message": (
+                    f"Deadline reached; partial results for: {', '.join(timed_out)}."
+                    if timed_out else "Workflow finished. Data queued for saving."
+                )
+            }
             
         except Exception as e:
             import traceback
             traceback.print_exc()
-            yield json.dumps({"event": "error", "message": str(e)}) + "\n"
+            yield {"event": "error", "run_id": run_id, "message": str(e)}
 
-    return StreamingResponse(event_generator(), media_type="application/x-ndjson")
+    return event_stream_response(
+        request,
+        workflow_events(),
+        headers={"Age": "0", "X-Cache": "MISS"},
+        fmt=fmt
+    )
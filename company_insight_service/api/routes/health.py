@@ -15,8 +15,11 @@ async def root():
         "docs": "/docs",
         "endpoints": {
             "deep_search": "POST /company/deep_search",
+            "deep_search_jobs": "POST /company/deep_search/jobs",
             "stock_trends": "POST /company/stock_trends",
-            "monthly_events": "POST /company/monthly_events"
+            "monthly_events": "POST /company/monthly_events",
+            "insights": "GET /insights/{company_name}/sentiments",
+            "metrics": "GET /metrics"
         }
     }
 
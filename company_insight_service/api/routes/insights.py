@@ -0,0 +1,172 @@
+"""
+Stored insight routes
+
+Serve what the workers already stored, straight from the database, so
+clients do not have to rerun a deep search to see earlier results.
+"""
+import logging
+from datetime import datetime, timedelta
+from typing import Optional
+
+from fastapi import APIRouter, Depends, HTTPException, Query
+
+from company_insight_service.config.settings import settings
+from company_insight_service.database.insights import (
+    InvalidQuery,
+    SCREEN_FIELDS,
+    SENTIMENT_FIELDS,
+    STOCK_ANALYSIS_FIELDS,
+    company_exists_query,
+    history_queries,
+    page_query,
+    parse_fields,
+    screen_query,
+    to_history_page,
+    to_page
+)
+from company_insight_service.database.models import ProductSentiment, StockAnalysis
+from company_insight_service.database.rollups import to_trend, trend_query
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/insights", tags=["insights"])
+
+
+async def get_session():
+    """Async database session for one request"""
+    # Imported on first use so the rest of the API runs without the asyncio DB extras
+    from company_insight_service.database.async_engine import AsyncSessionLocal
+
+    async with AsyncSessionLocal() as session:
+        yield session
+
+
+def _page_size(limit: Optional[int]) -> int:
+    return min(limit or settings.INSIGHTS_PAGE_SIZE, settings.INSIGHTS_MAX_PAGE_SIZE)
+
+
+async def _page_response(session, company_name: str, items, next_cursor, cursor) -> dict:
+    # An empty first page is either no data yet or an unknown company
+    if not items and not cursor and (await session.execute(company_exists_query(company_name))).first() is None:
+        raise HTTPException(status_code=404, detail=f"No stored insights for {company_name}")
+    return {"company_name": company_name, "items": items, "next_cursor": next_cursor}
+
+
+async def _resource_page(session, model, allowed, company_name, fields, limit, cursor) -> dict:
+    limit = _page_size(limit)
+    try:
+        columns = parse_fields(fields, allowed)
+        stmt = page_query(model, company_name, columns, limit, cursor)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = (await session.execute(stmt)).all()
+    items, next_cursor = to_page(rows, columns, limit)
+    return await _page_response(session, company_name, items, next_cursor, cursor)
+
+
+@router.get("/screen")
+async def screen_stocks(
+    min_change: Optional[float] = Query(None, description="Minimum overall_change_percent"),
+    max_change: Optional[float] = Query(None, description="Maximum overall_change_percent"),
+    dip_month: Optional[str] = Query(None, description="typical_dip_month, e.g. September"),
+    peak_month: Optional[str] = Query(None, description="typical_peak_month"),
+    min_price: Optional[float] = Query(None, description="Minimum latest_price"),
+    max_price: Optional[float] = Query(None, description="Maximum latest_price"),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session=Depends(get_session)
+):
+    """
+    Screen the latest stock analysis of every company and ticker, newest first
+    """
+    limit = _page_size(limit)
+    try:
+        stmt = screen_query(
+            limit, cursor, min_change=min_change, max_change=max_change, dip_month=dip_month,
+            peak_month=peak_month, min_price=min_price, max_price=max_price
+        )
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    rows = (await session.execute(stmt)).all()
+    items, next_cursor = to_page(rows, SCREEN_FIELDS, limit)
+    return {"items": items, "next_cursor": next_cursor}
+
+
+@router.get("/{company_name}/sentiments")
+async def get_sentiments(
+    company_name: str,
+    fields: Optional[str] = Query(None, description=f"Comma separated subset of: {', '.join(SENTIMENT_FIELDS)}"),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session=Depends(get_session)
+):
+    """
+    A company's stored product sentiments, newest first
+    """
+    return await _resource_page(
+        session, ProductSentiment, SENTIMENT_FIELDS, company_name, fields, limit, cursor
+    )
+
+
+@router.get("/{company_name}/stock_analyses")
+async def get_stock_analyses(
+    company_name: str,
+    fields: Optional[str] = Query(None, description=f"Comma separated subset of: {', '.join(STOCK_ANALYSIS_FIELDS)}"),
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session=Depends(get_session)
+):
+    """
+    A company's stored stock analyses, newest first
+    """
+    return await _resource_page(
+        session, StockAnalysis, STOCK_ANALYSIS_FIELDS, company_name, fields, limit, cursor
+    )
+
+
+@router.get("/{company_name}/history")
+async def get_history(
+    company_name: str,
+    limit: Optional[int] = Query(None, ge=1),
+    cursor: Optional[str] = Query(None, description="next_cursor from the previous page"),
+    session=Depends(get_session)
+):
+    """
+    Everything stored for a company (sentiments and stock analyses), newest first
+
+    Items carry a `type` of product_sentiment or stock_analysis.
+    """
+    limit = _page_size(limit)
+    try:
+        queries = history_queries(company_name, limit, cursor)
+    except InvalidQuery as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+    results = {kind: (await session.execute(stmt)).all() for kind, stmt in queries}
+    items, next_cursor = to_history_page(results, limit)
+    return await _page_response(session, company_name, items, next_cursor, cursor)
+
+
+@router.get("/{company_name}/sentiment_trend")
+async def get_sentiment_trend(
+    company_name: str,
+    days: Optional[int] = Query(None, ge=1, description="Days back from today (UTC), including today"),
+    session=Depends(get_session)
+):
+    """
+    A company's product sentiment per day, from the daily rollups
+
+    Reads one rollup row per day with data, however many raw rows there are.
+    Days without stored sentiments are left out.
+    """
+    days = min(days or settings.SENTIMENT_TREND_DAYS, settings.SENTIMENT_TREND_MAX_DAYS)
+    first = datetime.utcnow().date() - timedelta(days=days - 1)
+
+    rollups = (await session.execute(trend_query(company_name, first))).scalars().all()
+    if not rollups and (await session.execute(company_exists_query(company_name))).first() is None:
+        raise HTTPException(status_code=404, detail=f"No stored insights for {company_name}")
+
+    buckets, summary = to_trend(rollups)
+    return {"company_name": company_name, "since": first.isoformat(), "days": buckets, "summary": summary}
@@ -0,0 +1,124 @@
+"""
+Background deep search job routes
+"""
+import asyncio
+import logging
+from fastapi import APIRouter, HTTPException, Request
+from pydantic import BaseModel, Field
+from typing import Optional
+
+from company_insight_service.api.streaming import event_stream_response
+from company_insight_service.config.settings import settings
+from company_insight_service.core.jobs import (
+    job_store,
+    job_runner,
+    job_summary,
+    jobs_unavailable_reason,
+    JobQueueFull,
+    FINISHED_STATUSES
+)
+
+logger = logging.getLogger(__name__)
+
+router = APIRouter(prefix="/company/deep_search/jobs", tags=["jobs"])
+
+
+class JobRequest(BaseModel):
+    company_name: str
+    deadline_seconds: Optional[float] = Field(None, gt=0)  # Budget once the job starts
+
+
+def _get_job_or_404(job_id: str):
+    job = job_store.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail=f"Job {job_id} not found")
+    return job
+
+
+@router.post("", status_code=202)
+async def create_deep_search_job(request: JobRequest):
+    """
+    Start a deep search in the background and return its job ID immediately
+
+    The job ID is also the workflow run ID, so a failed job can be resumed
+    with POST /company/deep_search and `run_id=<job_id>`.
+
+    Jobs get the default deep search deadline unless `deadline_seconds`
+    asks for more (up to DEEP_SEARCH_MAX_DEADLINE_SECONDS). Returns 503
+    when the job store is process-local and the API runs several workers.
+    """
+    if not request.company_name:
+        raise HTTPException(status_code=400, detail="Company name is required")
+
+    unavailable = jobs_unavailable_reason()
+    if unavailable:
+        logger.error(f"Refusing deep search job for {request.company_name}: {unavailable}")
+        raise HTTPException(status_code=503, detail=unavailable)
+
+    deadline_seconds = min(
+        request.deadline_seconds or settings.DEEP_SEARCH_DEADLINE_SECONDS,
+        settings.DEEP_SEARCH_MAX_DEADLINE_SECONDS
+    )
+
+    try:
+        job = job_runner.submit(request.company_name, deadline_seconds=deadline_seconds)
+    except JobQueueFull as e:
+        logger.warning(f"Rejecting deep search job for {request.company_name}: {e}")
+        raise HTTPException(
+            status_code=429,
+            detail="Too many deep search jobs in progress, try again later",
+            headers={"Retry-After": "5"}
+        )
+
+    job_id = job["job_id"]
+    return {
+        "job_id": job_id,
+        "status": job["status"],
+        "links": {
+            "status": f"{router.prefix}/{job_id}",
+            "stream": f"{router.prefix}/{job_id}/stream"
+        }
+    }
+
+
+@router.get("/{job_id}")
+async def get_deep_search_job(job_id: str):
+    """
+    Get a job's status and its partial (or final) result
+    """
+    return job_summary(_get_job_or_404(job_id))
+
+
+@router.get("/{job_id}/stream")
+async def stream_deep_search_job(request: Request, job_id: str):
+    """
+    Attach to a job's progress
+
+    Replays the events recorded so far, then follows the job live until it
+    finishes. Ends with a `complete` (or `error`) event carrying the summary.
+    Sent as NDJSON or SSE (Accept: text/event-stream), compressed per
+    Accept-Encoding.
+    """
+    _get_job_or_404(job_id)
+
+    async def event_generator():
+        offset = 0
+        while True:
+            # Read the status before the events so none are missed at the end
+            job = job_store.get(job_id)
+            if job is None:
+                yield {"event": "error", "message": f"Job {job_id} expired"}
+                return
+
+            events = job_store.events_since(job_id, offset)
+            offset += len(events)
+            for event in events:
+                yield event
+
+            if job["status"] in FINISHED_STATUSES:
+                break
+            await asyncio.sleep(settings.JOB_STREAM_POLL_SECONDS)
+
+        yield {"event": "complete", "job": job_summary(job)}
+
+    return event_stream_response(request, event_generator())
@@ -0,0 +1,15 @@
+"""
+Prometheus metrics exposition route
+"""
+from fastapi import APIRouter, Response
+
+from company_insight_service.monitoring.metrics import render_metrics
+
+router = APIRouter(tags=["monitoring"])
+
+
+@router.get("/metrics")
+async def metrics():
+    """Expose latency histograms in the Prometheus text format"""
+    payload, content_type = render_metrics()
+    return Response(content=payload, media_type=content_type)
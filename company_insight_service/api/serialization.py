@@ -0,0 +1,59 @@
+"""
+Fast JSON serialization for API responses and event streams
+
+Uses orjson when it is installed and falls back to the standard library
+otherwise; both produce compact UTF-8 JSON.
+"""
+from typing import Any
+
+from fastapi.encoders import jsonable_encoder
+from fastapi.responses import JSONResponse
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+    import json
+
+
+def _default(obj: Any) -> Any:
+    """Fallback for types neither serializer handles natively"""
+    if hasattr(obj, "item"):  # numpy / pandas scalars
+        return obj.item()
+    return jsonable_encoder(obj)
+
+
+if orjson is not None:
+    _ORJSON_OPTIONS = orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_NON_STR_KEYS
+
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact JSON bytes"""
+        return orjson.dumps(obj, default=_default, option=_ORJSON_OPTIONS)
+else:
+    def dumps(obj: Any) -> bytes:
+        """Serialize to compact JSON bytes"""
+        return json.dumps(
+            obj, default=_default, ensure_ascii=False, separators=(",", ":")
+        ).encode("utf-8")
+
+
+class FastJSONResponse(JSONResponse):
+    """JSONResponse rendered with `dumps`"""
+
+    def render(self, content: Any) -> bytes:
+        return dumps(content)
+
+
+def ndjson_line(event: dict) -> bytes:
+    """One NDJSON record"""
+    return dumps(event) + b"\n"
+
+
+def sse_message(event: dict) -> bytes:
+    """
+    One Server-Sent Events message
+
+    The SSE event name is the event's `event` field (e.g. `update`), so
+    browsers can subscribe with EventSource.addEventListener.
+    """
+    return b"event: " + str(event.get("event", "message")).encode() + b"\ndata: " + dumps(event) + b"\n\n"
@@ -0,0 +1,160 @@
+"""
+Event stream responses: NDJSON or Server-Sent Events, optionally compressed
+
+Compression is negotiated from Accept-Encoding (zstd when available, then
+gzip). Each event is flushed through the compressor as soon as it is
+written, so clients still receive progress event by event.
+"""
+import zlib
+from typing import AsyncIterator, Dict, Optional
+
+from fastapi import Request
+from fastapi.responses import StreamingResponse
+
+from company_insight_service.api.serialization import ndjson_line, sse_message
+from company_insight_service.config.settings import settings
+
+try:
+    import zstandard
+except ImportError:
+    zstandard = None
+
+NDJSON = "ndjson"
+SSE = "sse"
+
+MEDIA_TYPES = {
+    NDJSON: "application/x-ndjson",
+    SSE: "text/event-stream",
+}
+
+GZIP = "gzip"
+ZSTD = "zstd"
+
+
+def supported_encodings() -> tuple:
+    """Content codings this server can produce, most preferred first"""
+    return (ZSTD, GZIP) if zstandard is not None else (GZIP,)
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """
+    Pick a content coding from an Accept-Encoding header
+
+    Returns:
+        "zstd", "gzip" or None (identity). Ties on q-value go to the
+        server's preference order.
+    """
+    if not accept_encoding:
+        return None
+
+    weights: Dict[str, float] = {}
+    for part in accept_encoding.split(","):
+        coding, _, params = part.strip().partition(";")
+        coding = coding.strip().lower()
+        q = 1.0
+        params = params.strip()
+        if params.startswith("q="):
+            try:
+                q = float(params[2:])
+            except ValueError:
+                q = 0.0
+        if coding:
+            weights[coding] = q
+
+    best, best_q = None, 0.0
+    for coding in supported_encodings():
+        q = weights.get(coding, weights.get("*", 0.0))
+        if q > best_q:
+            best, best_q = coding, q
+    return best
+
+
+def negotiate_format(request: Request) -> str:
+    """SSE if the client asks for text/event-stream, NDJSON otherwise"""
+    return SSE if "text/event-stream" in request.headers.get("accept", "") else NDJSON
+
+
+class _GzipStream:
+    def __init__(self, level: int):
+        self._compressor = zlib.compressobj(level, zlib.DEFLATED, 16 + zlib.MAX_WBITS)
+
+    def compress(self, data: bytes) -> bytes:
+        # Sync flush ends the chunk on a byte boundary the client can decode
+        return self._compressor.compress(data) + self._compressor.flush(zlib.Z_SYNC_FLUSH)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+class _ZstdStream:
+    def __init__(self, level: int):
+        self._compressor = zstandard.ZstdCompressor(level=level).compressobj()
+
+    def compress(self, data: bytes) -> bytes:
+        return self._compressor.compress(data) + self._compressor.flush(zstandard.COMPRESSOBJ_FLUSH_BLOCK)
+
+    def finish(self) -> bytes:
+        return self._compressor.flush()
+
+
+def stream_compressor(encoding: str):
+    """Per-response compressor that flushes on every write"""
+    if encoding == ZSTD:
+        return _ZstdStream(settings.STREAM_ZSTD_LEVEL)
+    return _GzipStream(settings.STREAM_GZIP_LEVEL)
+
+
+async def encode_events(
+    events: AsyncIterator[Dict],
+    fmt: str = NDJSON,
+    encoding: Optional[str] = None
+) -> AsyncIterator[bytes]:
+    """
+    Serialize (and compress) events, one chunk per event
+
+    Args:
+        events: Event dicts to send
+        fmt: NDJSON or SSE
+        encoding: Content coding from negotiate_encoding (None = identity)
+    """
+    serialize = sse_message if fmt == SSE else ndjson_line
+    compressor = stream_compressor(encoding) if encoding else None
+
+    async for event in events:
+        data = serialize(event)
+        yield compressor.compress(data) if compressor else data
+
+    if compressor:
+        yield compressor.finish()
+
+
+def event_stream_response(
+    request: Request,
+    events: AsyncIterator[Dict],
+    headers: Optional[Dict[str, str]] = None,
+    fmt: Optional[str] = None
+) -> StreamingResponse:
+    """
+    Stream events in the format and content coding the client negotiated
+
+    Args:
+        request: Incoming request (Accept / Accept-Encoding are read)
+        events: Async iterator of event dicts
+        headers: Extra response headers
+        fmt: Force NDJSON or SSE instead of negotiating from Accept
+    """
+    fmt = fmt or negotiate_format(request)
+    encoding = negotiate_encoding(request.headers.get("accept-encoding"))
+
+    response_headers = {"Vary": "Accept, Accept-Encoding", **(headers or {})}
+    if encoding:
+        response_headers["Content-Encoding"] = encoding
+    if fmt == SSE:
+        response_headers["Cache-Control"] = "no-cache"
+        response_headers["X-Accel-Buffering"] = "no"  # Don't let nginx buffer the stream
+
+    return StreamingResponse(
+        encode_events(events, fmt, encoding),
+        media_type=MEDIA_TYPES[fmt],
+        headers=response_headers
+    )
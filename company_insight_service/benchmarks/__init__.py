@@ -0,0 +1,6 @@
+"""
+Micro-benchmarks for performance-sensitive paths
+
+Run a benchmark as a module, e.g.:
+    python -m company_insight_service.benchmarks.stream_encoding
+"""
@@ -0,0 +1,301 @@
+"""
+Queue publish throughput benchmark
+
+Every path waits for a publisher confirm before a publish returns, so all
+three give the same durability guarantee:
+
+- per-message conn: the old publish path (new connection, queue declare,
+  confirm mode and close per message)
+- sync confirms: a persistent BlockingConnection per thread with
+  confirm_delivery(), which waits for each message's confirm in turn
+- QueuePublisher: one persistent channel, many messages in flight and the
+  broker acking them in batches
+
+The broker stand-in charges a network round trip for every synchronous
+AMQP method, extra round trips for the connection handshake, and an fsync
+before it confirms. It has one disk for all channels and group-commits:
+each fsync covers every message (from any channel) that had arrived when
+it started, so the sync path also benefits from concurrent publishers.
+
+    python -m company_insight_service.benchmarks.publish_throughput
+"""
+import heapq
+import json
+import queue
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from types import SimpleNamespace
+
+from pika.spec import Basic
+
+from company_insight_service.workers.publisher import QueuePublisher
+
+# Round trip to a local broker, and round trips for TCP + AMQP connection setup
+RTT_SECONDS = 0.0005
+HANDSHAKE_ROUND_TRIPS = 7
+# Broker-side cost of making messages durable (fsync), paid once per confirm batch
+FSYNC_SECONDS = 0.001
+
+
+class Network:
+    """Delivers callbacks after a delay, on one scheduler thread"""
+
+    def __init__(self):
+        self._due = []
+        self._seq = 0
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def later(self, delay: float, callback):
+        with self._cond:
+            self._seq += 1
+            heapq.heappush(self._due, (time.perf_counter() + delay, self._seq, callback))
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._due or self._due[0][0] > time.perf_counter():
+                    self._cond.wait(self._due[0][0] - time.perf_counter() if self._due else None)
+                _, _, callback = heapq.heappop(self._due)
+            callback()
+
+
+class Disk:
+    """
+    Group commit: each fsync covers every waiter registered before it starts
+
+    `join` takes a function called when the fsync starts; it returns the
+    callback to run once the fsync is done.
+    """
+
+    def __init__(self):
+        self._waiting = []
+        self._cond = threading.Condition()
+        threading.Thread(target=self._run, daemon=True).start()
+
+    def join(self, on_start):
+        with self._cond:
+            self._waiting.append(on_start)
+            self._cond.notify()
+
+    def _run(self):
+        while True:
+            with self._cond:
+                while not self._waiting:
+                    self._cond.wait()
+                batch, self._waiting = self._waiting, []
+            done = [on_start() for on_start in batch]
+            time.sleep(FSYNC_SECONDS)
+            for callback in done:
+                callback()
+
+
+class FakeBroker:
+    """Counts delivered messages and opened connections; one disk for every channel"""
+
+    def __init__(self):
+        self.delivered = 0
+        self.connections = 0
+        self.network = Network()
+        self.disk = Disk()
+        self._lock = threading.Lock()
+
+    def confirm(self, count: int):
+        with self._lock:
+            self.delivered += count
+
+    def connect_blocking(self) -> "BlockingConnection":
+        return BlockingConnection(self)
+
+    def connect_select(self, on_open, on_open_error, on_close) -> "SelectConnection":
+        return SelectConnection(self, on_open, on_close)
+
+
+class BlockingChannel:
+    """pika BlockingChannel in confirm mode: every publish waits for its confirm"""
+
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+
+    def queue_declare(self, queue, durable=False):
+        time.sleep(RTT_SECONDS)
+
+    def confirm_delivery(self):
+        time.sleep(RTT_SECONDS)
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        synced = threading.Event()
+        time.sleep(RTT_SECONDS / 2)
+        self.broker.disk.join(lambda: synced.set)
+        synced.wait()
+        time.sleep(RTT_SECONDS / 2)
+        self.broker.confirm(1)
+
+
+class BlockingConnection:
+    def __init__(self, broker: FakeBroker):
+        self.broker = broker
+        time.sleep(RTT_SECONDS * HANDSHAKE_ROUND_TRIPS)
+        broker.connections += 1
+
+    def channel(self) -> BlockingChannel:
+        time.sleep(RTT_SECONDS)
+        return BlockingChannel(self.broker)
+
+    def close(self):
+        time.sleep(RTT_SECONDS)
+
+
+class IOLoop:
+    def __init__(self, network: Network):
+        self.network = network
+        self.callbacks = queue.Queue()
+        self.stopped = False
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def call_later(self, delay, callback):
+        self.network.later(delay, lambda: self.add_callback_threadsafe(callback))
+
+    def start(self):
+        while not self.stopped:
+            self.callbacks.get()()
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        pass
+
+
+class SelectChannel:
+    """Asynchronous confirm-mode channel: publishes never wait"""
+
+    def __init__(self, connection: "SelectConnection"):
+        self.connection = connection
+        self.broker = connection.broker
+        self.ioloop = connection.ioloop
+        self.published = 0
+        self.confirmed = 0
+        self.arrived = 0
+        self.registered = False
+        self.lock = threading.Lock()
+        self.on_confirm = None
+
+    def add_on_close_callback(self, callback):
+        pass
+
+    def queue_declare(self, queue, durable=False, callback=None):
+        self.ioloop.call_later(RTT_SECONDS, lambda: callback(None))
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.on_confirm = ack_nack_callback
+        self.ioloop.call_later(RTT_SECONDS, lambda: callback(None))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.published += 1
+        tag = self.published
+        # The message reaches the broker half a round trip later
+        self.broker.network.later(RTT_SECONDS / 2, lambda: self._arrive(tag))
+
+    def _arrive(self, tag: int):
+        with self.lock:
+            self.arrived = tag
+            if self.registered:
+                return
+            self.registered = True
+        self.broker.disk.join(self._fsync_started)
+
+    def _fsync_started(self):
+        with self.lock:
+            upto, self.registered = self.arrived, False
+        # One multiple-ack for everything covered, half a round trip later
+        return lambda: self.ioloop.call_later(RTT_SECONDS / 2, lambda: self._ack(upto))
+
+    def _ack(self, upto: int):
+        self.broker.confirm(upto - self.confirmed)
+        self.confirmed = upto
+        self.on_confirm(SimpleNamespace(method=Basic.Ack(delivery_tag=upto, multiple=True)))
+
+
+class SelectConnection:
+    def __init__(self, broker: FakeBroker, on_open, on_close):
+        self.broker = broker
+        self.on_close = on_close
+        self.ioloop = IOLoop(broker.network)
+        self.is_open = True
+        broker.connections += 1
+        self.ioloop.call_later(RTT_SECONDS * HANDSHAKE_ROUND_TRIPS, lambda: on_open(self))
+
+    def channel(self, on_open_callback=None):
+        channel = SelectChannel(self)
+        self.ioloop.call_later(RTT_SECONDS, lambda: on_open_callback(channel))
+        return channel
+
+    def close(self):
+        self.is_open = False
+        self.ioloop.call_later(RTT_SECONDS, lambda: self.on_close(self, "closed"))
+
+
+def per_message_publish(broker: FakeBroker, data: dict):
+    """The previous publish_to_queue, with a confirm: one connection per message"""
+    connection = broker.connect_blocking()
+    channel = connection.channel()
+    channel.queue_declare(queue="bench", durable=True)
+    channel.confirm_delivery()
+    channel.basic_publish(exchange='', routing_key="bench", body=json.dumps(data))
+    connection.close()
+
+
+def sync_confirm_publisher(broker: FakeBroker):
+    """Persistent blocking channel per thread, waiting for every confirm"""
+    local = threading.local()
+
+    def publish(data: dict):
+        if not hasattr(local, "channel"):
+            local.channel = broker.connect_blocking().channel()
+            local.channel.queue_declare(queue="bench", durable=True)
+            local.channel.confirm_delivery()
+        local.channel.basic_publish(exchange='', routing_key="bench", body=json.dumps(data))
+    return publish
+
+
+def run(publish, messages: int, threads: int) -> float:
+    """Messages per second for `threads` concurrent publishers"""
+    payload = {"company_name": "Bench Co", "news": [{"title": "x" * 200}] * 5}
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=threads) as pool:
+        list(pool.map(lambda _: publish(payload), range(messages)))
+    return messages / (time.perf_counter() - started)
+
+
+def main(messages: int = 2000):
+    print(f"Broker stand-in: RTT {RTT_SECONDS * 1000:.1f} ms, "
+          f"handshake {HANDSHAKE_ROUND_TRIPS} RTTs, fsync {FSYNC_SECONDS * 1000:.1f} ms\n")
+    print(f"{'threads':>7}  {'per-message conn':>17}  {'sync confirms':>20}  {'QueuePublisher':>20}")
+
+    for threads in (1, 8, 32):
+        broker = FakeBroker()
+        per_message = run(lambda data: per_message_publish(broker, data), messages, threads)
+        assert broker.delivered == messages
+
+        broker = FakeBroker()
+        sync = run(sync_confirm_publisher(broker), messages, threads)
+        assert broker.delivered == messages
+        sync_connections = broker.connections
+
+        broker = FakeBroker()
+        publisher = QueuePublisher("bench", connection_factory=broker.connect_select)
+        batched = run(lambda data: publisher.publish(json.dumps(data).encode()), messages, threads)
+        publisher.close()
+        assert broker.delivered == messages
+
+        print(f"{threads:>7}  {per_message:>13.0f} m/s  {sync:>8.0f} m/s ({sync_connections:>2} conn)  "
+              f"{batched:>8.0f} m/s ({broker.connections:>2} conn)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""
+Deep search stream encoding benchmark
+
+Compares stdlib json with the fast serializer, and the bytes on the wire
+for a representative deep search stream as NDJSON / SSE, uncompressed,
+gzip and zstd (flushed per event, as the API sends them).
+
+    python -m company_insight_service.benchmarks.stream_encoding
+"""
+import asyncio
+import json
+import random
+import time
+from typing import Dict, List
+
+from company_insight_service.api.serialization import dumps, orjson
+from company_insight_service.api.streaming import NDJSON, SSE, GZIP, ZSTD, encode_events, zstandard
+
+WORDS = (
+    "revenue growth product launch battery quarterly earnings supply chain analyst "
+    "guidance margin customers review performance price market share launch delays "
+    "software update reliability design camera display competition outlook"
+).split()
+
+
+def _text(rng: random.Random, words: int) -> str:
+    return " ".join(rng.choice(WORDS) for _ in range(words)).capitalize() + "."
+
+
+def sample_events(products: int = 20, news: int = 20, seed: int = 7) -> List[Dict]:
+    """A deep search stream shaped like a real run"""
+    rng = random.Random(seed)
+    product_rows = [{
+        "title": f"{_text(rng, 6)} review",
+        "link": f"https://example.com/reviews/{i}",
+        "sentiment_score": round(rng.uniform(-1, 1), 3),
+        "sentiment_label": rng.choice(["Positive", "Neutral", "Negative"]),
+        "similarity_score": round(rng.random(), 3),
+        "summary": _text(rng, 40)
+    } for i in range(products)]
+    news_rows = [{
+        "title": _text(rng, 10),
+        "link": f"https://example.com/news/{i}",
+        "snippet": _text(rng, 45)
+    } for i in range(news)]
+    monthly = {f"2024-{m:02d}": round(rng.uniform(-10, 10), 2) for m in range(1, 13)}
+
+    events = [{"event": "run", "run_id": "9f1c2e", "resumed": False}]
+    events += [{"event": "product", "node": "research", "data": row} for row in product_rows]
+    events.append({"event": "update", "node": "research", "data": {
+        "news": news_rows, "product_sentiment": product_rows,
+        "timed_out": {"news": False, "product_sentiment": False}
+    }})
+    events.append({"event": "update", "node": "financials", "data": {
+        "ticker": "TSLA",
+        "stock_analysis": {"ticker": "TSLA", "overall_change_percent": 42.1, "monthly_returns": monthly},
+        "timed_out": {"ticker": False, "stock_analysis": False}
+    }})
+    events.append({"event": "update", "node": "save", "data": None})
+    events.append({"event": "complete", "run_id": "9f1c2e", "timed_out": [], "message": "Workflow finished."})
+    return events
+
+
+def bench_serializers(events: List[Dict], rounds: int = 2000) -> Dict[str, float]:
+    """Microseconds to serialize the whole stream once"""
+    def stdlib(event):
+        return (json.dumps(event) + "\n").encode()
+
+    results = {}
+    for name, func in (("json.dumps", stdlib), ("fast dumps", lambda e: dumps(e) + b"\n")):
+        start = time.perf_counter()
+        for _ in range(rounds):
+            for event in events:
+                func(event)
+        results[name] = (time.perf_counter() - start) / rounds * 1e6
+    return results
+
+
+async def _wire_bytes(events: List[Dict], fmt: str, encoding) -> int:
+    async def source():
+        for event in events:
+            yield event
+    return sum([len(chunk) async for chunk in encode_events(source(), fmt, encoding)])
+
+
+def bench_wire_sizes(events: List[Dict]) -> Dict[str, int]:
+    """Bytes on the wire per format/encoding"""
+    baseline = sum(len((json.dumps(event) + "\n").encode()) for event in events)
+    results = {"ndjson json.dumps (before)": baseline}
+    encodings = [None, GZIP] + ([ZSTD] if zstandard is not None else [])
+    for fmt in (NDJSON, SSE):
+        for encoding in encodings:
+            results[f"{fmt} {encoding or 'identity'}"] = asyncio.run(_wire_bytes(events, fmt, encoding))
+    return results
+
+
+def main():
+    events = sample_events()
+    print(f"Deep search stream: {len(events)} events (serializer: {'orjson' if orjson else 'stdlib json'})\n")
+
+    print("Serialization (whole stream)")
+    for name, micros in bench_serializers(events).items():
+        print(f"  {name:<12} {micros:9.1f} us")
+
+    print("\nBytes on the wire (compressed streams flush per event)")
+    sizes = bench_wire_sizes(events)
+    baseline = sizes["ndjson json.dumps (before)"]
+    for name, size in sizes.items():
+        print(f"  {name:<28} {size:8d} B  {size / baseline:6.1%}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,144 @@
+"""
+In-process result caching with stale-while-revalidate semantics
+"""
+import logging
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Hashable, NamedTuple, Optional
+
+from company_insight_service.monitoring.metrics import CACHE_LOOKUPS
+
+logger = logging.getLogger(__name__)
+
+FRESH = "fresh"
+STALE = "stale"
+MISS = "miss"
+
+
+class CacheLookup(NamedTuple):
+    status: str  # fresh, stale or miss
+    value: Any
+    age: float  # Seconds since the value was stored (0 on miss)
+
+
+class StaleWhileRevalidateCache:
+    """
+    Bounded LRU cache whose entries go stale before they expire
+
+    Entries younger than `fresh_ttl` are served as-is. Entries between
+    `fresh_ttl` and `stale_ttl` are still served, but the caller should
+    trigger `refresh()` to recompute them in the background. Older entries
+    are treated as misses. Refreshes are deduplicated per key. Lookups are
+    counted per `name` in the cache_lookups metric.
+
+    The cache is per process; each uvicorn worker keeps its own copy.
+    """
+
+    def __init__(
+        self,
+        fresh_ttl: float,
+        stale_ttl: float,
+        max_entries: int = 512,
+        refresh_workers: int = 2,
+        clock: Callable[[], float] = time.monotonic,
+        name: str = "default",
+    ):
+        self.name = name
+        self.fresh_ttl = fresh_ttl
+        self.stale_ttl = max(stale_ttl, fresh_ttl)
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[Hashable, tuple]" = OrderedDict()
+        self._refreshing = set()
+        self._lock = threading.Lock()
+        self._refresh_workers = refresh_workers
+        self._executor: Optional[ThreadPoolExecutor] = None
+
+    def get(self, key: Hashable) -> CacheLookup:
+        """Look up a key and classify it as fresh, stale or miss"""
+        lookup = self._lookup(key)
+        CACHE_LOOKUPS.labels(cache=self.name, result=lookup.status).inc()
+        return lookup
+
+    def _lookup(self, key: Hashable) -> CacheLookup:
+        now = self._clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return CacheLookup(MISS, None, 0.0)
+
+            value, stored_at = entry
+            age = now - stored_at
+            if age >= self.stale_ttl:
+                del self._entries[key]
+                return CacheLookup(MISS, None, 0.0)
+
+            self._entries.move_to_end(key)
+            status = FRESH if age < self.fresh_ttl else STALE
+            return CacheLookup(status, value, age)
+
+    def set(self, key: Hashable, value: Any):
+        """Store a value, evicting the least recently used entry if full"""
+        with self._lock:
+            self._entries[key] = (value, self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key: Hashable):
+        """Drop a key from the cache"""
+        with self._lock:
+            self._entries.pop(key, None)
+
+    def is_refreshing(self, key: Hashable) -> bool:
+        """Whether a background refresh is in flight for the key"""
+        with self._lock:
+            return key in self._refreshing
+
+    def refresh(self, key: Hashable, compute: Callable[[], Any]) -> bool:
+        """
+        Recompute a key in the background
+
+        Args:
+            key: Cache key to refresh
+            compute: Callable returning the new value; returning None
+                leaves the current entry untouched
+
+        Returns:
+            True if a refresh was scheduled, False if one is already running
+        """
+        with self._lock:
+            if key in self._refreshing:
+                return False
+            self._refreshing.add(key)
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(
+                    max_workers=self._refresh_workers,
+                    thread_name_prefix="cache-refresh"
+                )
+
+        def _run():
+            try:
+                value = compute()
+                if value is not None:
+                    self.set(key, value)
+            except Exception as e:
+                logger.warning(f"Background refresh failed for {key!r}: {e}")
+            finally:
+                with self._lock:
+                    self._refreshing.discard(key)
+
+        try:
+            self._executor.submit(_run)
+        except Exception:
+            with self._lock:
+                self._refreshing.discard(key)
+            raise
+        return True
+
+    def clear(self):
+        """Remove every entry"""
+        with self._lock:
+            self._entries.clear()
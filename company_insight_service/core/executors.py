@@ -0,0 +1,89 @@
+"""
+Sized executor pools for running blocking work from async routes
+
+Network-bound calls (search, scraping, yfinance downloads) and CPU-bound
+work (pandas analysis) get separate pools, so slow I/O cannot starve CPU
+work and vice versa. Deep search streams hold a thread for a whole
+workflow node, so they get a pool of their own and cannot starve the
+short network calls of the other routes. Every task records its queue
+wait and run time.
+"""
+import asyncio
+import contextvars
+import functools
+import logging
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable
+
+from company_insight_service.config.settings import settings
+from company_insight_service.monitoring.metrics import (
+    EXECUTOR_QUEUE_WAIT_SECONDS,
+    EXECUTOR_RUN_SECONDS
+)
+
+logger = logging.getLogger(__name__)
+
+
+class InstrumentedExecutor:
+    """Thread pool that reports queue-wait and execution-time metrics"""
+
+    def __init__(self, name: str, max_workers: int):
+        self.name = name
+        self.max_workers = max_workers
+        self._executor = ThreadPoolExecutor(
+            max_workers=max_workers,
+            thread_name_prefix=f"{name}-pool"
+        )
+
+    async def run(self, func: Callable, *args, **kwargs) -> Any:
+        """
+        Run a blocking function in the pool and await its result
+
+        The caller's context (deadline, timing collector) is copied into
+        the worker thread.
+        """
+        loop = asyncio.get_running_loop()
+        context = contextvars.copy_context()
+        submitted = time.perf_counter()
+
+        def _call():
+            started = time.perf_counter()
+            EXECUTOR_QUEUE_WAIT_SECONDS.labels(pool=self.name).observe(started - submitted)
+            try:
+                return context.run(functools.partial(func, *args, **kwargs))
+            finally:
+                EXECUTOR_RUN_SECONDS.labels(pool=self.name).observe(time.perf_counter() - started)
+
+        return await loop.run_in_executor(self._executor, _call)
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+network_pool = InstrumentedExecutor("network", settings.NETWORK_POOL_WORKERS)
+cpu_pool = InstrumentedExecutor("cpu", settings.CPU_POOL_WORKERS)
+deep_search_pool = InstrumentedExecutor("deep_search", settings.DEEP_SEARCH_POOL_WORKERS)
+
+
+async def run_network(func: Callable, *args, **kwargs) -> Any:
+    """Run a blocking network-bound call off the event loop"""
+    return await network_pool.run(func, *args, **kwargs)
+
+
+async def run_cpu(func: Callable, *args, **kwargs) -> Any:
+    """Run CPU-bound work off the event loop"""
+    return await cpu_pool.run(func, *args, **kwargs)
+
+
+async def run_deep_search(func: Callable, *args, **kwargs) -> Any:
+    """Run a long deep search step (a whole workflow node) off the event loop"""
+    return await deep_search_pool.run(func, *args, **kwargs)
+
+
+def shutdown_pools(wait: bool = True):
+    """Stop every pool (called on application shutdown)"""
+    logger.info("Shutting down executor pools...")
+    network_pool.shutdown(wait=wait)
+    cpu_pool.shutdown(wait=wait)
+    deep_search_pool.shutdown(wait=wait)
@@ -0,0 +1,231 @@
+"""
+Background deep search jobs
+
+A job runs the research workflow in a bounded background executor and
+records its progress (events and partial state) in a pluggable JobStore,
+so clients can poll or attach to it instead of holding a connection open
+for the whole run.
+
+The default store is process-local: with more than one API worker a job
+would only be visible to the worker that created it, so new jobs are
+refused unless API_WORKERS is 1 or the store is shared.
+"""
+import logging
+import threading
+import time
+import uuid
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, Optional
+
+from company_insight_service.config.settings import settings
+from company_insight_service.services.deadline import Deadline
+from company_insight_service.workflows.runner import (
+    stream_workflow,
+    apply_update,
+    result_from_state
+)
+
+logger = logging.getLogger(__name__)
+
+QUEUED = "queued"
+RUNNING = "running"
+SUCCEEDED = "succeeded"
+FAILED = "failed"
+FINISHED_STATUSES = (SUCCEEDED, FAILED)
+
+
+class JobQueueFull(Exception):
+    """Raised when no more jobs can be accepted"""
+
+
+class JobStore(ABC):
+    """Storage for job status, events and partial state"""
+
+    # Whether every API worker process sees the same jobs
+    shared: bool = False
+
+    @abstractmethod
+    def create(self, company_name: str) -> Dict:
+        """Create a queued job and return it"""
+
+    @abstractmethod
+    def get(self, job_id: str) -> Optional[Dict]:
+        """Return a job (without its events) or None if unknown"""
+
+    @abstractmethod
+    def update(self, job_id: str, **fields):
+        """Set top-level job fields (status, error, timestamps...)"""
+
+    @abstractmethod
+    def append_event(self, job_id: str, event: Dict):
+        """Record a workflow event and fold any state update into the job"""
+
+    @abstractmethod
+    def events_since(self, job_id: str, offset: int) -> List[Dict]:
+        """Return the job's events starting at `offset`"""
+
+
+class InMemoryJobStore(JobStore):
+    """
+    Process-local JobStore
+
+    Holds at most `max_jobs` jobs; the oldest finished jobs are evicted
+    first. Jobs are only visible to the API worker that created them.
+    """
+
+    def __init__(self, max_jobs: int = 1000):
+        self.max_jobs = max_jobs
+        self._jobs: "OrderedDict[str, Dict]" = OrderedDict()
+        self._events: Dict[str, List[Dict]] = {}
+        self._lock = threading.Lock()
+
+    def create(self, company_name: str) -> Dict:
+        job = {
+            "job_id": uuid.uuid4().hex,
+            "company_name": company_name,
+            "status": QUEUED,
+            "created_at": time.time(),
+            "started_at": None,
+            "finished_at": None,
+            "error": None,
+            "state": {},
+            "event_count": 0
+        }
+        with self._lock:
+            self._jobs[job["job_id"]] = job
+            self._events[job["job_id"]] = []
+            self._evict()
+            return dict(job)
+
+    def get(self, job_id: str) -> Optional[Dict]:
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return None
+            return {**job, "state": dict(job["state"])}
+
+    def update(self, job_id: str, **fields):
+        with self._lock:
+            if job_id in self._jobs:
+                self._jobs[job_id].update(fields)
+
+    def append_event(self, job_id: str, event: Dict):
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is None:
+                return
+            self._events[job_id].append(event)
+            job["event_count"] += 1
+            if event.get("event") == "update" and event.get("data"):
+                apply_update(job["state"], event["data"])
+
+    def events_since(self, job_id: str, offset: int) -> List[Dict]:
+        with self._lock:
+            return list(self._events.get(job_id, [])[offset:])
+
+    def _evict(self):
+        """Drop the oldest finished jobs while over capacity (lock held)"""
+        if len(self._jobs) <= self.max_jobs:
+            return
+        for job_id in list(self._jobs):
+            if len(self._jobs) <= self.max_jobs:
+                break
+            if self._jobs[job_id]["status"] in FINISHED_STATUSES:
+                del self._jobs[job_id]
+                self._events.pop(job_id, None)
+
+
+class JobRunner:
+    """Runs deep search jobs on a bounded executor"""
+
+    def __init__(self, store: JobStore, max_workers: int, max_pending: int):
+        self.store = store
+        self.max_pending = max_pending
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="job")
+        self._pending = 0
+        self._lock = threading.Lock()
+
+    @property
+    def pending(self) -> int:
+        """Jobs queued or running"""
+        with self._lock:
+            return self._pending
+
+    def submit(self, company_name: str, deadline_seconds: Optional[float] = None) -> Dict:
+        """
+        Create a job and schedule it
+
+        Raises:
+            JobQueueFull: If `max_pending` jobs are already queued or running
+        """
+        with self._lock:
+            if self._pending >= self.max_pending:
+                raise JobQueueFull(f"{self._pending} jobs already pending")
+            self._pending += 1
+
+        try:
+            job = self.store.create(company_name)
+            self._executor.submit(self._run, job["job_id"], company_name, deadline_seconds)
+        except Exception:
+            with self._lock:
+                self._pending -= 1
+            raise
+        return job
+
+    def _run(self, job_id: str, company_name: str, deadline_seconds: Optional[float]):
+        # The deadline starts when the job starts, not when it was queued
+        deadline = Deadline.after(deadline_seconds) if deadline_seconds else None
+        self.store.update(job_id, status=RUNNING, started_at=time.time())
+        try:
+            # The job ID doubles as the workflow run ID, so a failed job can
+            # be resumed through /company/deep_search with run_id=<job_id>
+            for event in stream_workflow(company_name, run_id=job_id, deadline=deadline):
+                self.store.append_event(job_id, event)
+            self.store.update(job_id, status=SUCCEEDED, finished_at=time.time())
+        except Exception as e:
+            logger.error(f"Job {job_id} failed: {e}", exc_info=True)
+            self.store.append_event(job_id, {"event": "error", "message": str(e)})
+            self.store.update(job_id, status=FAILED, error=str(e), finished_at=time.time())
+        finally:
+            with self._lock:
+                self._pending -= 1
+
+    def shutdown(self, wait: bool = True):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+
+def jobs_unavailable_reason() -> Optional[str]:
+    """Why this deployment cannot serve jobs, or None if it can"""
+    if settings.API_WORKERS > 1 and not job_store.shared:
+        return (
+            f"Background jobs need API_WORKERS=1 (currently {settings.API_WORKERS}) "
+            f"or a job store shared between workers; {type(job_store).__name__} is process-local"
+        )
+    return None
+
+
+def job_summary(job: Dict) -> Dict:
+    """Public view of a job: status plus the partial (or final) result"""
+    state = job.get("state", {})
+    return {
+        "job_id": job["job_id"],
+        "company_name": job["company_name"],
+        "status": job["status"],
+        "created_at": job["created_at"],
+        "started_at": job["started_at"],
+        "finished_at": job["finished_at"],
+        "error": job["error"],
+        "event_count": job["event_count"],
+        "result": result_from_state(state),
+        "timed_out": [field for field, flag in state.get("timed_out", {}).items() if flag]
+    }
+
+
+job_store: JobStore = InMemoryJobStore(max_jobs=settings.JOB_STORE_MAX_JOBS)
+job_runner = JobRunner(
+    job_store,
+    max_workers=settings.JOB_WORKERS,
+    max_pending=settings.JOB_QUEUE_LIMIT
+)
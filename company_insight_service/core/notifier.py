@@ -0,0 +1,260 @@
+"""
+Long-lived Telegram notifier
+
+One background thread owns one asyncio event loop and one Bot (and with
+it one pooled HTTP connection to the Bot API); callers on any thread hand
+messages over through a bounded queue and never wait for Telegram.
+
+Messages that arrive within `window` seconds of each other go out as one
+digest, and digests are spaced at least `min_interval` seconds apart per
+chat (Telegram allows about 20 messages a minute in a group), so while a
+send is held back more messages pile into the next digest. When the queue
+is full new messages are dropped and counted; the next digest says how
+many. A digest longer than `max_parts` Telegram messages is cut short the
+same way.
+"""
+import asyncio
+import atexit
+import logging
+import queue
+import threading
+import time
+from typing import Awaitable, Callable, List, Optional
+
+from telegram import Bot
+from telegram.error import Forbidden, RetryAfter, TelegramError
+
+from company_insight_service.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+# Telegram's limit per message (characters)
+MAX_MESSAGE_CHARS = 4096
+
+_STOP = object()
+
+
+def _seconds(value) -> float:
+    return value.total_seconds() if hasattr(value, "total_seconds") else float(value)
+
+
+def format_digest(messages: List[str], dropped: int = 0, max_parts: int = 3,
+                  max_chars: int = MAX_MESSAGE_CHARS) -> List[str]:
+    """
+    Pack messages into at most `max_parts` Telegram messages
+
+    A single message is sent as is; several get a count header. Messages
+    that do not fit are summarized in a closing line, with `dropped`.
+    """
+    if len(messages) == 1 and not dropped:
+        return [messages[0][:max_chars]]
+
+    # Room kept in the last part for the "not shown" line
+    budget = max_chars - 100
+    parts: List[str] = []
+    current = f"🗂 *{len(messages)} database signals*" if messages else ""
+    left_out = dropped
+    for i, message in enumerate(messages):
+        message = message[:budget]
+        if current and len(current) + 2 + len(message) > budget:
+            if len(parts) + 1 >= max_parts:
+                left_out += len(messages) - i
+                break
+            parts.append(current)
+            current = ""
+        current = f"{current}\n\n{message}" if current else message
+
+    if left_out:
+        note = f"⚠️ {left_out} more notifications not shown"
+        current = f"{current}\n\n{note}" if current else note
+    parts.append(current)
+    return parts
+
+
+class TelegramNotifier:
+    """
+    Thread-safe, non-blocking Telegram sender with coalescing and rate limiting
+
+    Args:
+        token: Bot token
+        chat_id: Chat to send to
+        queue_size: Messages waiting before new ones are dropped
+        window: Seconds to wait for more messages before sending a digest
+        min_interval: Least seconds between two sends to the chat
+        max_parts: Most Telegram messages per digest
+        prepare: Coroutine run once before the first send; False disables the notifier
+        bot_factory: Callable returning a python-telegram-bot compatible Bot
+    """
+
+    def __init__(
+        self,
+        token: str,
+        chat_id: str,
+        queue_size: int = 1000,
+        window: float = 2.0,
+        min_interval: float = 3.0,
+        max_parts: int = 3,
+        prepare: Optional[Callable[[], Awaitable[bool]]] = None,
+        bot_factory: Callable = Bot
+    ):
+        self.token = token
+        self.chat_id = chat_id
+        self.window = window
+        self.min_interval = min_interval
+        self.max_parts = max_parts
+        self.prepare = prepare
+        self.bot_factory = bot_factory
+        self._pending: "queue.Queue" = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        self._closed = False
+        self._disabled = False
+        self._dropped = 0
+        self._next_send = 0.0
+
+    def notify(self, text: str) -> bool:
+        """
+        Queue a message
+
+        Returns:
+            True if queued, False if it was dropped (queue full, closed or disabled)
+        """
+        if self._closed or self._disabled:
+            return False
+        self._ensure_started()
+        try:
+            self._pending.put_nowait(text)
+            return True
+        except queue.Full:
+            with self._lock:
+                self._dropped += 1
+            return False
+
+    def close(self, timeout: Optional[float] = 10):
+        """Send what is already queued, then stop the thread"""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            thread = self._thread
+        if thread is None:
+            return
+        try:
+            self._pending.put(_STOP, timeout=timeout)
+        except queue.Full:
+            logger.warning("Telegram queue still full at shutdown; pending notifications are lost")
+            return
+        thread.join(timeout)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None or self._closed:
+                return
+            self._thread = threading.Thread(target=self._run, name="telegram-notifier", daemon=True)
+            self._thread.start()
+
+    def _next_digest(self) -> tuple:
+        """Block for a message, then gather more until it is time to send; returns (messages, stop)"""
+        first = self._pending.get()
+        if first is _STOP:
+            return [], True
+        messages = [first]
+        send_at = max(time.monotonic() + self.window, self._next_send)
+        while True:
+            remaining = send_at - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                item = self._pending.get(timeout=remaining)
+            except queue.Empty:
+                break
+            if item is _STOP:
+                return messages, True
+            messages.append(item)
+        return messages, False
+
+    def _run(self):
+        loop = asyncio.new_event_loop()
+        bot = None
+        try:
+            bot = self.bot_factory(token=self.token)
+            loop.run_until_complete(bot.initialize())
+            if self.prepare is not None and not loop.run_until_complete(self.prepare()):
+                self._disabled = True
+                logger.error("Telegram notifications disabled")
+            while True:
+                messages, stop = self._next_digest()
+                with self._lock:
+                    dropped, self._dropped = self._dropped, 0
+                if (messages or dropped) and not self._disabled:
+                    for text in format_digest(messages, dropped, self.max_parts):
+                        loop.run_until_complete(self._send(bot, text))
+                if stop:
+                    break
+        except Exception as e:
+            self._disabled = True
+            logger.error(f"Telegram notifier stopped: {e}", exc_info=True)
+        finally:
+            if bot is not None:
+                try:
+                    loop.run_until_complete(bot.shutdown())
+                except Exception:
+                    pass
+            loop.close()
+
+    async def _send(self, bot, text: str):
+        for attempt in range(2):
+            wait = self._next_send - time.monotonic()
+            if wait > 0:
+                await asyncio.sleep(wait)
+            self._next_send = time.monotonic() + self.min_interval
+            try:
+                await bot.send_message(chat_id=self.chat_id, text=text, parse_mode="Markdown")
+                logger.info(f"✉️ Telegram notification sent: {text[:50]}...")
+                return
+            except RetryAfter as e:
+                # Flood control: hold every send back as long as Telegram asks
+                self._next_send = time.monotonic() + _seconds(e.retry_after)
+                logger.warning(f"Telegram rate limit hit; retrying in {_seconds(e.retry_after):.0f}s")
+            except Forbidden:
+                logger.error("Bot doesn't have permission to send messages. Check if bot is still in the chat/channel.")
+                return
+            except TelegramError as e:
+                logger.error(f"Telegram API error: {e}")
+                return
+        logger.error("Telegram notification dropped after hitting the rate limit twice")
+
+
+_notifier: Optional[TelegramNotifier] = None
+_notifier_lock = threading.Lock()
+
+
+def get_notifier() -> TelegramNotifier:
+    """The process-wide notifier for the configured chat (created on first use)"""
+    global _notifier
+    with _notifier_lock:
+        if _notifier is None:
+            from company_insight_service.core.signals import validate_telegram_credentials
+
+            _notifier = TelegramNotifier(
+                settings.TELEGRAM_BOT_TOKEN,
+                settings.TELEGRAM_CHAT_ID,
+                queue_size=settings.TELEGRAM_QUEUE_SIZE,
+                window=settings.TELEGRAM_COALESCE_SECONDS,
+                min_interval=settings.TELEGRAM_MIN_INTERVAL_SECONDS,
+                max_parts=settings.TELEGRAM_DIGEST_MAX_PARTS,
+                prepare=validate_telegram_credentials
+            )
+        return _notifier
+
+
+def shutdown_notifier(timeout: Optional[float] = 5):
+    """Send what is queued and stop the process-wide notifier"""
+    global _notifier
+    with _notifier_lock:
+        notifier, _notifier = _notifier, None
+    if notifier is not None:
+        notifier.close(timeout)
+
+
+atexit.register(shutdown_notifier)
@@ -1,18 +1,33 @@
 import requests
 import json
 import logging
-from sqlalchemy import event
-from sqlalchemy.orm import Session
+from sqlalchemy import event, select
+from sqlalchemy.orm import Session, object_session
 from company_insight_service.database.models import Company, ProductSentiment, StockAnalysis, FinancialReport
 from company_insight_service.config.settings import settings
 from telegram import Bot
-from telegram.error import TelegramError, InvalidToken
+from telegram.error import Forbidden, TelegramError, InvalidToken
 import asyncio
-import threading
-from typing import Optional
+from typing import Dict, Optional
 
 logger = logging.getLogger(__name__)
 
+# Session.info keys for the open transaction's signals
+PENDING_SIGNALS = 'pending_signals'  # {(company_id, table, operation): rows}
+SIGNAL_COMPANY_NAMES = 'signal_company_names'  # {company_id: name}
+
+# Table -> (singular, plural) in transaction summaries
+TABLE_LABELS = {
+    "product_sentiments": ("product sentiment", "product sentiments"),
+    "stock_analyses": ("stock analysis", "stock analyses"),
+    "financial_reports": ("financial report", "financial reports"),
+}
+COMPANY_EVENTS = {
+    "companies:INSERT": "new company",
+    "companies:UPDATE": "company updated",
+    "companies:UPSERT": "company updated",
+}
+
 # Global flag to track if credentials are valid
 _credentials_validated = False
 _credentials_valid = False
@@ -56,7 +71,7 @@ async def validate_telegram_credentials() -> bool:
         try:
             chat = await bot.get_chat(chat_id=chat_id)
             logger.info(f"✅ Chat ID valid. Chat title: {chat.title if chat.title else 'Private chat'}")
-        except Unauthorized:
+        except Forbidden:
             logger.error(f"❌ Bot is not a member of chat {chat_id} or doesn't have permission to access it.")
             logger.error("Solution: Add the bot to your channel/group and make sure it has posting permissions.")
             _credentials_validated = True
@@ -92,8 +107,9 @@ async def validate_telegram_credentials() -> bool:
 
 def send_telegram_message(text: str):
     """
-    Sends a message to a Telegram channel/chat using the Bot API asynchronously.
-    This function is non-blocking and runs in a separate thread.
+    Queues a message for the Telegram channel/chat.
+    Non-blocking: the process-wide notifier (core.notifier) sends it from its
+    own thread, coalesced with other messages and rate limited.
     """
     token = settings.TELEGRAM_BOT_TOKEN
     chat_id = settings.TELEGRAM_CHAT_ID
@@ -107,85 +123,91 @@ def send_telegram_message(text: str):
         logger.debug("Skipping Telegram notification - credentials invalid")
         return
     
-    async def _send():
-        try:
-            # Validate credentials on first use
-            if not _credentials_validated:
-                is_valid = await validate_telegram_credentials()
-                if not is_valid:
-                    logger.error("Telegram credentials validation failed. Notification skipped.")
-                    return
-            
-            bot = Bot(token=token)
-            await bot.send_message(chat_id=chat_id, text=text, parse_mode="Markdown")
-            logger.info(f"✉️ Telegram notification sent: {text[:50]}...")
-            
-        except Unauthorized:
-            logger.error("Bot doesn't have permission to send messages. Check if bot is still in the chat/channel.")
-        except TelegramError as e:
-            logger.error(f"Telegram API error: {e}")
-        except Exception as e:
-            logger.error(f"Failed to send Telegram notification: {e}", exc_info=True)
+    from company_insight_service.core.notifier import get_notifier
     
-    def run_async():
-        """
-        Runs the async function in a new event loop within a separate thread.
-        """
-        try:
-            # Create new event loop for this thread
-            loop = asyncio.new_event_loop()
-            asyncio.set_event_loop(loop)
-            try:
-                loop.run_until_complete(_send())
-            finally:
-                loop.close()
-        except Exception as e:
-            logger.error(f"Error in async loop: {e}", exc_info=True)
-    
-    # Start thread as daemon so it doesn't block application shutdown
-    thread = threading.Thread(target=run_async, daemon=True)
-    thread.start()
+    if not get_notifier().notify(text):
+        logger.debug("Telegram notification dropped (notifier queue full or stopped)")
 
 
-def format_model_notification(target, operation: str) -> str:
+def record_signal(session: Optional[Session], table: str, operation: str, company_id: Optional[int], count: int = 1):
     """
-    Formatted message for database operations.
+    Counts a written row towards the session's transaction summary.
+    Cheap on purpose: it runs in the flush/write path.
     """
-    table_name = target.__tablename__
-    details = ""
-    
+    if session is None:
+        return
+    pending = session.info.setdefault(PENDING_SIGNALS, {})
+    key = (company_id, table, operation)
+    pending[key] = pending.get(key, 0) + count
+
+
+def name_companies(session: Optional[Session], names: Dict[str, int]):
+    """
+    Remembers company names ({name: id}) for the transaction summary,
+    so it needs no lookup at commit.
+    """
+    if session is not None and names:
+        session.info.setdefault(SIGNAL_COMPANY_NAMES, {}).update({i: n for n, i in names.items()})
+
+
+def _record_target(target, operation: str):
+    session = object_session(target)
+    if isinstance(target, Company):
+        name_companies(session, {target.name: target.id})
+        company_id = target.id
+    else:
+        company_id = getattr(target, 'company_id', None)
+    record_signal(session, target.__tablename__, operation, company_id)
+
+
+def _lookup_company_names(session: Session, company_ids) -> Dict[int, str]:
+    """Names of companies no write in the transaction named (reads committed data)"""
     try:
-        if isinstance(target, Company):
-            details = f"*Company:* {target.name}"
-        elif isinstance(target, ProductSentiment):
-            details = f"*Product:* {target.product_name}\n*Sentiment:* {target.sentiment_label} ({target.sentiment_score})"
-        elif isinstance(target, StockAnalysis):
-            details = f"*Ticker:* {target.ticker}\n*Trend:* {target.analysis_text}"
-        elif isinstance(target, FinancialReport):
-            details = f"*Period:* {target.period}"
+        with session.get_bind().connect() as connection:
+            return dict(connection.execute(
+                select(Company.id, Company.name).where(Company.id.in_(company_ids))
+            ).all())
+    except Exception as e:
+        logger.warning(f"Could not look up company names for notification: {e}")
+        return {}
+
+
+def format_transaction_summary(pending: Dict[tuple, int], names: Dict[int, str]) -> str:
+    """
+    One message for everything a transaction wrote, a line per company
+    (e.g. "Acme: new company, 5 product sentiments, 1 stock analysis").
+    """
+    per_company: Dict[Optional[int], Dict[str, int]] = {}
+    for (company_id, table, operation), count in pending.items():
+        label = f"{table}:{operation}" if table == Company.__tablename__ else table
+        tables = per_company.setdefault(company_id, {})
+        tables[label] = tables.get(label, 0) + count
+
+    lines = []
+    for company_id, tables in sorted(per_company.items(), key=lambda item: str(names.get(item[0], item[0]))):
+        parts = []
+        for label, count in tables.items():
+            if label in COMPANY_EVENTS:
+                parts.append(COMPANY_EVENTS[label])
+            else:
+                singular, plural = TABLE_LABELS.get(label, (label, label))
+                parts.append(f"{count} {singular if count == 1 else plural}")
+        if company_id is None:
+            company = "No company"
         else:
-            details = f"*ID:* {getattr(target, 'id', 'N/A')}"
-    except AttributeError as e:
-        logger.warning(f"Error accessing attributes for notification: {e}")
-        details = "*Details unavailable*"
-    
-    return (
-        f"🚨 *Database Signal*\n\n"
-        f"📦 *Table:* `{table_name}`\n"
-        f"⚙️ *Operation:* {operation}\n"
-        f"📝 *Details:*\n{details}"
-    )
+            company = names.get(company_id, f"Company #{company_id}")
+        lines.append(f"🏢 *{company}:* {', '.join(parts)}")
+
+    return "🚨 *Database Signal*\n\n" + "\n".join(lines)
 
 
 def after_insert_listener(mapper, connection, target):
     """
     SQLAlchemy event listener for INSERT operations.
-    Triggered after insert but before commit.
+    Only counts the row; the summary goes out after commit.
     """
     try:
-        logger.debug(f"📥 INSERT detected: {target.__tablename__}")
-        message = format_model_notification(target, "INSERT")
-        send_telegram_message(message)
+        _record_target(target, "INSERT")
     except Exception as e:
         logger.error(f"Error in after_insert_listener: {e}", exc_info=True)
 
@@ -193,16 +215,54 @@ def after_insert_listener(mapper, connection, target):
 def after_update_listener(mapper, connection, target):
     """
     SQLAlchemy event listener for UPDATE operations.
-    Triggered after update but before commit.
+    Only counts the row; the summary goes out after commit.
     """
     try:
-        logger.debug(f"📝 UPDATE detected: {target.__tablename__}")
-        message = format_model_notification(target, "UPDATE")
-        send_telegram_message(message)
+        _record_target(target, "UPDATE")
     except Exception as e:
         logger.error(f"Error in after_update_listener: {e}", exc_info=True)
 
 
+def notify_rows(session: Optional[Session], model, rows, operation: str):
+    """
+    Counts rows written with Core statements towards the transaction summary.
+    Bulk INSERT/UPSERT statements bypass the mapper events above.
+    """
+    if model is Company:
+        name_companies(session, {row['name']: row['id'] for row in rows})
+    counts: Dict[Optional[int], int] = {}
+    for row in rows:
+        company_id = row.get('id') if model is Company else row.get('company_id')
+        counts[company_id] = counts.get(company_id, 0) + 1
+    for company_id, count in counts.items():
+        record_signal(session, model.__tablename__, operation, company_id, count)
+
+
+def after_commit_listener(session: Session):
+    """
+    Session event listener: sends one summary of the committed transaction.
+    """
+    pending = session.info.pop(PENDING_SIGNALS, None)
+    names = session.info.pop(SIGNAL_COMPANY_NAMES, {})
+    if not pending:
+        return
+    try:
+        unnamed = {company_id for company_id, _, _ in pending if company_id is not None and company_id not in names}
+        if unnamed:
+            names = {**names, **_lookup_company_names(session, unnamed)}
+        send_telegram_message(format_transaction_summary(pending, names))
+    except Exception as e:
+        logger.error(f"Error in after_commit_listener: {e}", exc_info=True)
+
+
+def after_rollback_listener(session: Session):
+    """
+    Session event listener: rolled back rows are never announced.
+    """
+    session.info.pop(PENDING_SIGNALS, None)
+    session.info.pop(SIGNAL_COMPANY_NAMES, None)
+
+
 def register_signals():
     """
     Registers SQLAlchemy event listeners for database operations.
@@ -220,6 +280,10 @@ def register_signals():
         except Exception as e:
             logger.error(f"Failed to register signals for {model.__name__}: {e}")
     
+    # Collected per session, sent once per committed transaction
+    event.listen(Session, 'after_commit', after_commit_listener)
+    event.listen(Session, 'after_rollback', after_rollback_listener)
+    
     logger.info("🎯 Database signal registration complete")
 
 
@@ -3,6 +3,7 @@ from company_insight_service.database.models import (
     ProductSentiment,
     StockAnalysis,
     FinancialReport,
+    SentimentDailyRollup,
 )
 
-__all__ = ['Company', 'ProductSentiment', 'StockAnalysis', 'FinancialReport']
\ No newline at end of file
+__all__ = ['Company', 'ProductSentiment', 'StockAnalysis', 'FinancialReport', 'SentimentDailyRollup']
@@ -0,0 +1,33 @@
+"""
+Asyncio engine and sessions
+
+Kept apart from models.py so the sync code paths import without the
+asyncio extras (greenlet). Both engines share the pool settings.
+"""
+from sqlalchemy.ext.asyncio import async_sessionmaker, create_async_engine
+
+from company_insight_service.database.models import (
+    Base,
+    DATABASE_URL,
+    async_database_url,
+    pool_options
+)
+
+try:
+    async_engine = create_async_engine(async_database_url(DATABASE_URL), **pool_options(DATABASE_URL))
+except ModuleNotFoundError as e:
+    raise RuntimeError(
+        f"The asyncio driver for {DATABASE_URL.partition('://')[0]} is not installed ({e.name}); "
+        f"install it or run the worker with WORKER_MODE=blocking"
+    ) from e
+AsyncSessionLocal = async_sessionmaker(async_engine, expire_on_commit=False)
+
+
+async def init_async_db():
+    """Create and upgrade the tables through the async engine"""
+    from company_insight_service.database.migrations import lock_schema, upgrade
+
+    async with async_engine.begin() as connection:
+        await connection.run_sync(lock_schema)
+        await connection.run_sync(Base.metadata.create_all)
+        await connection.run_sync(upgrade)
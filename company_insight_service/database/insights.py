@@ -0,0 +1,233 @@
+"""
+Queries over stored insights
+
+Statements only (no sessions), so the async API and sync callers share
+them. Pages are keyset paginated newest first on (created_at, id), which
+the (company_id, created_at, id) indexes serve directly, and select only
+the requested columns.
+"""
+import base64
+import calendar
+import json
+from datetime import datetime
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from sqlalchemy import Select, exists, select, tuple_
+from sqlalchemy.orm import aliased
+
+from company_insight_service.database.models import Company, ProductSentiment, StockAnalysis
+
+# Columns clients may request per resource
+SENTIMENT_FIELDS = (
+    "id", "product_name", "sentiment_score", "sentiment_label", "similarity_score",
+    "summary", "source_url", "created_at", "updated_at"
+)
+STOCK_ANALYSIS_FIELDS = (
+    "id", "ticker", "analysis_text", "three_year_trend", "overall_change_percent", "typical_dip_month",
+    "typical_peak_month", "latest_price", "analysis_date", "created_at", "updated_at"
+)
+
+# Columns of a stock screen result
+SCREEN_FIELDS = (
+    "id", "company_name", "ticker", "overall_change_percent", "typical_dip_month", "typical_peak_month",
+    "latest_price", "analysis_date", "created_at"
+)
+
+# History merges both tables; the rank breaks created_at ties between them
+HISTORY_SOURCES = (
+    ("stock_analysis", StockAnalysis, ("ticker", "analysis_text")),
+    ("product_sentiment", ProductSentiment, ("product_name", "sentiment_score", "sentiment_label", "source_url")),
+)
+
+
+class InvalidQuery(ValueError):
+    """Raised for unknown fields or malformed cursors"""
+
+
+def encode_cursor(*position) -> str:
+    """Opaque cursor for a page position (datetimes become ISO strings)"""
+    values = [value.isoformat() if isinstance(value, datetime) else value for value in position]
+    return base64.urlsafe_b64encode(json.dumps(values).encode()).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str, size: int) -> list:
+    """
+    Decode a cursor made by encode_cursor
+
+    Raises:
+        InvalidQuery: If the cursor is malformed
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4)))
+        if not isinstance(values, list) or len(values) != size:
+            raise ValueError("wrong size")
+        if not all(isinstance(value, int) for value in values[1:]):
+            raise ValueError("bad position")
+        values[0] = datetime.fromisoformat(values[0])
+        return values
+    except (ValueError, TypeError) as e:
+        raise InvalidQuery(f"Invalid cursor: {e}")
+
+
+def parse_fields(fields: Optional[str], allowed: Sequence[str]) -> List[str]:
+    """
+    Columns to select from a comma separated `fields` parameter
+
+    Raises:
+        InvalidQuery: If a field is unknown
+    """
+    if not fields:
+        return list(allowed)
+    requested = [field.strip() for field in fields.split(",") if field.strip()]
+    unknown = [field for field in requested if field not in allowed]
+    if unknown:
+        raise InvalidQuery(f"Unknown fields: {', '.join(unknown)} (allowed: {', '.join(allowed)})")
+    return list(dict.fromkeys(requested))
+
+
+def _company_id(company_name: str):
+    return select(Company.id).where(Company.name == company_name).scalar_subquery()
+
+
+def page_query(model, company_name: str, fields: Iterable[str], limit: int, cursor: Optional[str] = None) -> Select:
+    """
+    One page of a company's rows, newest first
+
+    Selects `limit + 1` rows so the caller can tell whether another page
+    follows. created_at and id are always selected (they make the cursor).
+    """
+    columns = list(dict.fromkeys([*fields, "created_at", "id"]))
+    stmt = (
+        select(*(getattr(model, column) for column in columns))
+        .where(model.company_id == _company_id(company_name))
+        .order_by(model.created_at.desc(), model.id.desc())
+        .limit(limit + 1)
+    )
+    if cursor:
+        created_at, row_id = decode_cursor(cursor, 2)
+        stmt = stmt.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+    return stmt
+
+
+def to_page(rows: Sequence, fields: Sequence[str], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Shape rows from page_query into (items, next_cursor)"""
+    items = [{field: row._mapping[field] for field in fields} for row in rows[:limit]]
+    next_cursor = None
+    if len(rows) > limit:
+        last = rows[limit - 1]._mapping
+        next_cursor = encode_cursor(last["created_at"], last["id"])
+    return items, next_cursor
+
+
+def history_queries(company_name: str, limit: int, cursor: Optional[str] = None) -> List[Tuple[str, Select]]:
+    """
+    Per-table pages for a merged history, ordered by (created_at, rank, id)
+
+    Each table contributes at most `limit + 1` rows past the cursor; merge
+    them with `to_history_page`.
+    """
+    position = decode_cursor(cursor, 3) if cursor else None
+    queries = []
+    for rank, (kind, model, columns) in enumerate(HISTORY_SOURCES):
+        stmt = page_query(model, company_name, columns, limit)
+        if position:
+            created_at, cursor_rank, row_id = position
+            if rank < cursor_rank:
+                stmt = stmt.where(model.created_at <= created_at)
+            elif rank == cursor_rank:
+                stmt = stmt.where(tuple_(model.created_at, model.id) < tuple_(created_at, row_id))
+            else:
+                stmt = stmt.where(model.created_at < created_at)
+        queries.append((kind, stmt))
+    return queries
+
+
+def to_history_page(results: Dict[str, Sequence], limit: int) -> Tuple[List[Dict], Optional[str]]:
+    """Merge per-table rows from history_queries into (items, next_cursor)"""
+    ranks = {kind: rank for rank, (kind, _, _) in enumerate(HISTORY_SOURCES)}
+    entries = [
+        (row._mapping["created_at"], ranks[kind], row._mapping["id"], {"type": kind, **row._mapping})
+        for kind, rows in results.items()
+        for row in rows
+    ]
+    entries.sort(key=lambda entry: entry[:3], reverse=True)
+
+    next_cursor = None
+    if len(entries) > limit:
+        next_cursor = encode_cursor(*entries[limit - 1][:3])
+    return [entry[3] for entry in entries[:limit]], next_cursor
+
+
+def company_exists_query(company_name: str) -> Select:
+    return select(Company.id).where(Company.name == company_name)
+
+
+def parse_month(month: Optional[str]) -> Optional[str]:
+    """
+    Normalize a month name ("september" -> "September")
+
+    Raises:
+        InvalidQuery: If it is not an English month name
+    """
+    if not month:
+        return None
+    names = {name.lower(): name for name in calendar.month_name if name}
+    try:
+        return names[month.strip().lower()]
+    except KeyError:
+        raise InvalidQuery(f"Unknown month: {month}")
+
+
+def screen_query(
+    limit: int,
+    cursor: Optional[str] = None,
+    min_change: Optional[float] = None,
+    max_change: Optional[float] = None,
+    dip_month: Optional[str] = None,
+    peak_month: Optional[str] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None
+) -> Select:
+    """
+    Latest stock analysis per company and ticker matching the filters, newest first
+
+    Filters use the promoted columns and their indexes; the latest-analysis
+    check is an index probe on (company_id, ticker, analysis_date).
+    Paginate with to_page like page_query.
+
+    Raises:
+        InvalidQuery: For unknown months or a malformed cursor
+    """
+    newer = aliased(StockAnalysis)
+    conditions = [
+        ~exists().where(
+            newer.company_id == StockAnalysis.company_id,
+            newer.ticker == StockAnalysis.ticker,
+            newer.analysis_date > StockAnalysis.analysis_date
+        )
+    ]
+    if min_change is not None:
+        conditions.append(StockAnalysis.overall_change_percent >= min_change)
+    if max_change is not None:
+        conditions.append(StockAnalysis.overall_change_percent <= max_change)
+    if dip_month:
+        conditions.append(StockAnalysis.typical_dip_month == parse_month(dip_month))
+    if peak_month:
+        conditions.append(StockAnalysis.typical_peak_month == parse_month(peak_month))
+    if min_price is not None:
+        conditions.append(StockAnalysis.latest_price >= min_price)
+    if max_price is not None:
+        conditions.append(StockAnalysis.latest_price <= max_price)
+    if cursor:
+        created_at, row_id = decode_cursor(cursor, 2)
+        conditions.append(tuple_(StockAnalysis.created_at, StockAnalysis.id) < tuple_(created_at, row_id))
+
+    columns = [Company.name.label("company_name") if field == "company_name" else getattr(StockAnalysis, field)
+               for field in SCREEN_FIELDS]
+    return (
+        select(*columns)
+        .join(Company, Company.id == StockAnalysis.company_id)
+        .where(*conditions)
+        .order_by(StockAnalysis.created_at.desc(), StockAnalysis.id.desc())
+        .limit(limit + 1)
+    )
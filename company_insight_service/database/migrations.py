@@ -0,0 +1,291 @@
+"""
+In-place schema upgrades
+
+`create_all` only creates missing tables, so columns and indexes added to
+existing tables are brought in here. Every step checks the live schema
+first and is safe to run on each start (init_db does). On PostgreSQL the
+processes starting together (API and workers) take an advisory lock, so
+they upgrade one at a time and the later ones find nothing left to do.
+
+    python -m company_insight_service.database.migrations
+"""
+import logging
+from typing import List, Tuple
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+from company_insight_service.config.settings import settings
+from company_insight_service.database import partitioning
+from company_insight_service.database.models import FinancialReport, ProductSentiment, StockAnalysis
+
+logger = logging.getLogger(__name__)
+
+# (model, column name) added after the table was first created
+ADDED_COLUMNS: List[Tuple] = [
+    (ProductSentiment, "updated_at"),
+    (StockAnalysis, "analysis_date"),
+    (StockAnalysis, "updated_at"),
+    (StockAnalysis, "overall_change_percent"),
+    (StockAnalysis, "typical_dip_month"),
+    (StockAnalysis, "typical_peak_month"),
+    (StockAnalysis, "latest_price"),
+]
+
+# Typed columns copied out of stock_analyses.three_year_trend: (column, SQL type to cast to)
+PROMOTED_TREND_FIELDS: List[Tuple[str, str]] = [
+    ("overall_change_percent", "FLOAT"),
+    ("typical_dip_month", "TEXT"),
+    ("typical_peak_month", "TEXT"),
+    ("latest_price", "FLOAT"),
+]
+
+# JSON document columns stored as JSONB (with a GIN index) on PostgreSQL
+JSON_DOCUMENTS: List[Tuple] = [
+    (StockAnalysis, "three_year_trend", "ix_stock_analyses_trend"),
+    (FinancialReport, "data", "ix_financial_reports_data"),
+]
+
+# Unique indexes the upsert paths rely on, with the columns they cover
+UNIQUE_INDEXES: List[Tuple] = [
+    (ProductSentiment, "uq_product_sentiments_company_source", ("company_id", "source_url")),
+    (StockAnalysis, "uq_stock_analyses_company_ticker_date", ("company_id", "ticker", "analysis_date")),
+]
+
+# Composite indexes for "latest rows for a company"
+COMPANY_INDEXES: List[Tuple] = [
+    (model, f"ix_{model.__tablename__}_company_created", ("company_id", "created_at", "id"))
+    for model in (ProductSentiment, FinancialReport, StockAnalysis)
+]
+
+# Indexes for screening stock analyses across companies
+SCREENING_INDEXES: List[Tuple] = [
+    (StockAnalysis, "ix_stock_analyses_change", ("overall_change_percent",)),
+    (StockAnalysis, "ix_stock_analyses_dip_month", ("typical_dip_month", "overall_change_percent")),
+    (StockAnalysis, "ix_stock_analyses_peak_month", ("typical_peak_month", "overall_change_percent")),
+    (StockAnalysis, "ix_stock_analyses_latest_price", ("latest_price",)),
+]
+
+# Key of the PostgreSQL advisory lock serializing schema changes
+SCHEMA_LOCK_KEY = 734_261_901
+
+# Single-column indexes the composite indexes make redundant
+REDUNDANT_INDEXES: List[Tuple] = [
+    (model, f"ix_{model.__tablename__}_company_id")
+    for model in (ProductSentiment, FinancialReport, StockAnalysis)
+]
+
+
+def _add_missing_columns(connection: Connection) -> List[str]:
+    inspector = inspect(connection)
+    added = []
+    for model, name in ADDED_COLUMNS:
+        table = model.__tablename__
+        existing = {column["name"] for column in inspector.get_columns(table)}
+        if name in existing:
+            continue
+        column_type = model.__table__.c[name].type.compile(dialect=connection.dialect)
+        connection.execute(text(f"ALTER TABLE {table} ADD COLUMN {name} {column_type}"))
+        added.append(f"{table}.{name}")
+    return added
+
+
+def _backfill(connection: Connection):
+    created_date = "DATE(created_at)" if connection.dialect.name == "sqlite" else "CAST(created_at AS DATE)"
+    connection.execute(text(
+        f"UPDATE stock_analyses SET analysis_date = {created_date} WHERE analysis_date IS NULL"
+    ))
+    for table in ("product_sentiments", "stock_analyses"):
+        connection.execute(text(f"UPDATE {table} SET updated_at = created_at WHERE updated_at IS NULL"))
+    # Rows without a link used to be stored with '', which would collide
+    connection.execute(text("UPDATE product_sentiments SET source_url = NULL WHERE source_url = ''"))
+    _backfill_trend_fields(connection)
+
+
+def _trend_field(dialect: str, column: str, sql_type: str) -> str:
+    """
+    SQL reading one three_year_trend field as `sql_type`
+
+    Numbers are only cast when they look numeric (NULL otherwise, like the
+    write path's _number()), so one bad old row cannot abort the upgrade.
+    """
+    if dialect == "sqlite":
+        value = f"json_extract(three_year_trend, '$.{column}')"
+        if sql_type != "FLOAT":
+            return f"CAST({value} AS {sql_type})"
+        kind = f"json_type(three_year_trend, '$.{column}')"
+        return (
+            f"CASE WHEN {kind} IN ('integer', 'real') THEN {value} "
+            f"WHEN {kind} = 'text' AND trim({value}) <> '' "
+            f"AND trim({value}) NOT GLOB '*[^0-9.eE+-]*' THEN CAST(trim({value}) AS FLOAT) END"
+        )
+    value = f"(three_year_trend::jsonb ->> '{column}')"
+    if sql_type != "FLOAT":
+        return f"CAST({value} AS {sql_type})"
+    return (
+        f"CASE WHEN {value} ~ '^\\s*[-+]?([0-9]+\\.?[0-9]*|\\.[0-9]+)([eE][-+]?[0-9]+)?\\s*$' "
+        f"THEN CAST({value} AS FLOAT) END"
+    )
+
+
+def _backfill_trend_fields(connection: Connection):
+    """Fill the promoted columns from three_year_trend where they are still empty"""
+    assignments = [
+        f"{column} = COALESCE({column}, {_trend_field(connection.dialect.name, column, sql_type)})"
+        for column, sql_type in PROMOTED_TREND_FIELDS
+    ]
+    connection.execute(text(
+        f"UPDATE stock_analyses SET {', '.join(assignments)} "
+        f"WHERE three_year_trend IS NOT NULL AND overall_change_percent IS NULL"
+    ))
+
+
+def _deduplicate(connection: Connection, table: str, columns: Tuple[str, ...]) -> int:
+    """Keep the newest row per key (rows with a NULL key part are never duplicates)"""
+    key = ", ".join(columns)
+    not_null = " AND ".join(f"{column} IS NOT NULL" for column in columns)
+    result = connection.execute(text(
+        f"DELETE FROM {table} WHERE {not_null} AND id NOT IN ("
+        f"SELECT MAX(id) FROM {table} WHERE {not_null} GROUP BY {key})"
+    ))
+    return result.rowcount or 0
+
+
+def _upgrade_unique_keys(connection: Connection):
+    added = _add_missing_columns(connection)
+    if added:
+        logger.info(f"Added columns: {', '.join(added)}")
+
+    inspector = inspect(connection)
+    missing_indexes = [
+        (model.__tablename__, index_name, columns)
+        for model, index_name, columns in UNIQUE_INDEXES
+        # Partitioned tables cannot carry these (see partitioning)
+        if not partitioning.is_partitioned(connection, model.__tablename__)
+        and index_name not in {index["name"] for index in inspector.get_indexes(model.__tablename__)}
+    ]
+    if not added and not missing_indexes:
+        return
+
+    _backfill(connection)
+    for table, index_name, columns in missing_indexes:
+        removed = _deduplicate(connection, table, columns)
+        if removed:
+            logger.info(f"Removed {removed} duplicate rows from {table}")
+        connection.execute(text(
+            f"CREATE UNIQUE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})"
+        ))
+        logger.info(f"Created unique index {index_name}")
+
+
+def _upgrade_indexes(connection: Connection):
+    inspector = inspect(connection)
+    for model, index_name, columns in COMPANY_INDEXES + SCREENING_INDEXES:
+        table = model.__tablename__
+        if index_name in {index["name"] for index in inspector.get_indexes(table)}:
+            continue
+        connection.execute(text(f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} ({', '.join(columns)})"))
+        logger.info(f"Created index {index_name}")
+
+    for model, index_name in REDUNDANT_INDEXES:
+        if index_name in {index["name"] for index in inspector.get_indexes(model.__tablename__)}:
+            connection.execute(text(f"DROP INDEX IF EXISTS {index_name}"))
+            logger.info(f"Dropped redundant index {index_name}")
+
+
+def _upgrade_json_documents(connection: Connection):
+    """Convert JSON document columns to JSONB and index them (PostgreSQL only)"""
+    if connection.dialect.name != "postgresql":
+        return
+    inspector = inspect(connection)
+    for model, column, index_name in JSON_DOCUMENTS:
+        table = model.__tablename__
+        column_type = {c["name"]: c["type"] for c in inspector.get_columns(table)}[column]
+        if column_type.__class__.__name__ != "JSONB":
+            # Rewrites the table under an exclusive lock
+            connection.execute(text(f"ALTER TABLE {table} ALTER COLUMN {column} TYPE JSONB USING {column}::jsonb"))
+            logger.info(f"Converted {table}.{column} to JSONB")
+        if index_name not in {index["name"] for index in inspector.get_indexes(table)}:
+            connection.execute(text(
+                f"CREATE INDEX IF NOT EXISTS {index_name} ON {table} USING gin ({column} jsonb_path_ops)"
+            ))
+            logger.info(f"Created index {index_name}")
+
+
+def _upgrade_foreign_keys(connection: Connection):
+    """
+    Add the company foreign keys to existing tables
+
+    SQLite cannot add constraints to existing tables, so only PostgreSQL is
+    upgraded. Keys are added NOT VALID (enforced for new rows straight
+    away) and then validated; if old rows reference missing companies the
+    key stays NOT VALID and a warning names the table.
+    """
+    if connection.dialect.name != "postgresql":
+        return
+    inspector = inspect(connection)
+    for model in (ProductSentiment, FinancialReport, StockAnalysis):
+        table = model.__tablename__
+        name = f"fk_{table}_company_id"
+        if name in {fk["name"] for fk in inspector.get_foreign_keys(table)}:
+            continue
+        connection.execute(text(
+            f"ALTER TABLE {table} ADD CONSTRAINT {name} FOREIGN KEY (company_id) "
+            f"REFERENCES companies (id) ON DELETE CASCADE NOT VALID"
+        ))
+        try:
+            with connection.begin_nested():
+                connection.execute(text(f"ALTER TABLE {table} VALIDATE CONSTRAINT {name}"))
+            logger.info(f"Added foreign key {name}")
+        except Exception as e:
+            logger.warning(f"Foreign key {name} added but not validated (orphaned rows?): {e}")
+
+
+def _upgrade_partitioning(connection: Connection):
+    if not settings.PRODUCT_SENTIMENTS_PARTITIONED:
+        return
+    if connection.dialect.name != "postgresql":
+        logger.warning("PRODUCT_SENTIMENTS_PARTITIONED needs PostgreSQL; leaving the table as is")
+        return
+    if not partitioning.partition_table(connection, settings.PARTITION_MONTHS_AHEAD):
+        created = partitioning.ensure_partitions(connection, settings.PARTITION_MONTHS_AHEAD)
+        if created:
+            logger.info(f"Created partitions: {', '.join(created)}")
+
+
+def lock_schema(connection: Connection):
+    """
+    Wait for other processes changing the schema (PostgreSQL)
+
+    The lock is held until the caller's transaction ends; taking it again
+    in the same transaction does not block.
+    """
+    if connection.dialect.name == "postgresql":
+        connection.execute(text("SELECT pg_advisory_xact_lock(:key)"), {"key": SCHEMA_LOCK_KEY})
+
+
+def upgrade(connection: Connection):
+    """
+    Bring existing tables up to the current schema
+
+    Args:
+        connection: Connection inside a transaction (committed by the caller)
+    """
+    lock_schema(connection)
+    existing_tables = set(inspect(connection).get_table_names())
+
+    if {model.__tablename__ for model in (ProductSentiment, FinancialReport, StockAnalysis)} - existing_tables:
+        return  # Tables not created yet (create_all builds them current)
+
+    _upgrade_unique_keys(connection)
+    _upgrade_indexes(connection)
+    _upgrade_json_documents(connection)
+    _upgrade_foreign_keys(connection)
+    _upgrade_partitioning(connection)
+
+
+if __name__ == "__main__":
+    from company_insight_service.database.models import init_db
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
@@ -1,4 +1,5 @@
-from sqlalchemy import create_engine, Column, Integer, String, Float, Text, JSON, DateTime
+from sqlalchemy import create_engine, Column, Integer, String, Float, Text, JSON, DateTime, Date, Index, ForeignKey
+from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.ext.declarative import declarative_base
 from sqlalchemy.orm import sessionmaker
 from datetime import datetime
@@ -6,8 +7,24 @@ from company_insight_service.config.settings import settings
 
 DATABASE_URL = settings.DATABASE_URL
 
+# Sync driver -> asyncio driver for the same database
+ASYNC_DRIVERS = {
+    "postgresql": "postgresql+asyncpg",
+    "postgresql+psycopg2": "postgresql+asyncpg",
+    "sqlite": "sqlite+aiosqlite",
+}
+
 Base = declarative_base()
 
+# JSON documents: JSONB (binary, indexable) on PostgreSQL, plain JSON elsewhere
+JSONDocument = JSON().with_variant(JSONB(), "postgresql")
+
+
+def company_fk(table: str) -> ForeignKey:
+    """Foreign key to companies; a company's rows go with it"""
+    return ForeignKey("companies.id", name=f"fk_{table}_company_id", ondelete="CASCADE")
+
+
 class Company(Base):
     __tablename__ = "companies"
     id = Column(Integer, primary_key=True, index=True)
@@ -15,39 +32,124 @@ class Company(Base):
     description = Column(Text, nullable=True)
     updated_at = Column(DateTime, default=datetime.utcnow)
 
+
 class ProductSentiment(Base):
     __tablename__ = "product_sentiments"
+    __table_args__ = (
+        # One row per source page; re-scraping a page updates it
+        Index("uq_product_sentiments_company_source", "company_id", "source_url", unique=True),
+        # Latest rows per company (scanned backwards for ORDER BY created_at DESC, id DESC)
+        Index("ix_product_sentiments_company_created", "company_id", "created_at", "id"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    company_id = Column(Integer, index=True)
+    company_id = Column(Integer, company_fk("product_sentiments"))
     product_name = Column(String)
-    sentiment_score = Column(Float) # -1.0 to 1.0
-    sentiment_label = Column(String) # Positive, Negative, Neutral
-    similarity_score = Column(Float, nullable=True) # 0.0 to 1.0
+    sentiment_score = Column(Float)  # -1.0 to 1.0
+    sentiment_label = Column(String)  # Positive, Negative, Neutral
+    similarity_score = Column(Float, nullable=True)  # 0.0 to 1.0
     summary = Column(Text)
-    source_url = Column(String)
+    source_url = Column(String, nullable=True)
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 
 class FinancialReport(Base):
     __tablename__ = "financial_reports"
+    __table_args__ = (
+        Index("ix_financial_reports_company_created", "company_id", "created_at", "id"),
+        # Containment queries (data @> '{...}') on PostgreSQL
+        Index(
+            "ix_financial_reports_data", "data",
+            postgresql_using="gin", postgresql_ops={"data": "jsonb_path_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    company_id = Column(Integer, index=True)
-    period = Column(String) # e.g., "Q1 2024"
+    company_id = Column(Integer, company_fk("financial_reports"))
+    period = Column(String)  # e.g., "Q1 2024"
     revenue = Column(String, nullable=True)
     net_income = Column(String, nullable=True)
-    data = Column(JSON) # Store raw JSON of financials
+    data = Column(JSONDocument)  # Store raw JSON of financials
     created_at = Column(DateTime, default=datetime.utcnow)
 
+
 class StockAnalysis(Base):
     __tablename__ = "stock_analyses"
+    __table_args__ = (
+        # One analysis per ticker per day
+        Index("uq_stock_analyses_company_ticker_date", "company_id", "ticker", "analysis_date", unique=True),
+        Index("ix_stock_analyses_company_created", "company_id", "created_at", "id"),
+        # Screening across companies on the promoted trend fields
+        Index("ix_stock_analyses_change", "overall_change_percent"),
+        Index("ix_stock_analyses_dip_month", "typical_dip_month", "overall_change_percent"),
+        Index("ix_stock_analyses_peak_month", "typical_peak_month", "overall_change_percent"),
+        Index("ix_stock_analyses_latest_price", "latest_price"),
+        Index(
+            "ix_stock_analyses_trend", "three_year_trend",
+            postgresql_using="gin", postgresql_ops={"three_year_trend": "jsonb_path_ops"}
+        ).ddl_if(dialect="postgresql"),
+    )
     id = Column(Integer, primary_key=True, index=True)
-    company_id = Column(Integer, index=True)
+    company_id = Column(Integer, company_fk("stock_analyses"))
     ticker = Column(String)
     analysis_text = Column(Text)
-    three_year_trend = Column(JSON) # JSON describing dips and rises
+    three_year_trend = Column(JSONDocument)  # JSON describing dips and rises
+    # Copied out of three_year_trend so screens can use plain indexes
+    overall_change_percent = Column(Float, nullable=True)
+    typical_dip_month = Column(String, nullable=True)  # e.g. "September"
+    typical_peak_month = Column(String, nullable=True)
+    latest_price = Column(Float, nullable=True)
+    analysis_date = Column(Date, default=lambda: datetime.utcnow().date())
     created_at = Column(DateTime, default=datetime.utcnow)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
 
-engine = create_engine(DATABASE_URL)
+class SentimentDailyRollup(Base):
+    """Per company and day aggregates of product_sentiments (by created_at day)"""
+    __tablename__ = "sentiment_daily_rollups"
+    company_id = Column(Integer, company_fk("sentiment_daily_rollups"), primary_key=True)
+    day = Column(Date, primary_key=True)
+    sample_count = Column(Integer, nullable=False, default=0)
+    score_sum = Column(Float, nullable=False, default=0.0)
+    positive_count = Column(Integer, nullable=False, default=0)
+    negative_count = Column(Integer, nullable=False, default=0)
+    neutral_count = Column(Integer, nullable=False, default=0)
+    min_score = Column(Float, nullable=True)
+    max_score = Column(Float, nullable=True)
+    updated_at = Column(DateTime, default=datetime.utcnow)
+
+
+def async_database_url(url: str) -> str:
+    """Rewrite a database URL to use an asyncio driver"""
+    scheme, sep, rest = url.partition("://")
+    return f"{ASYNC_DRIVERS.get(scheme, scheme)}{sep}{rest}"
+
+
+def pool_options(url: str) -> dict:
+    """
+    Connection pool settings for an engine on `url`
+
+    SQLite uses SQLAlchemy's own single-file pools, which take none of
+    these options.
+    """
+    if url.startswith("sqlite"):
+        return {}
+    return {
+        "pool_size": settings.DB_POOL_SIZE,
+        "max_overflow": settings.DB_MAX_OVERFLOW,
+        "pool_timeout": settings.DB_POOL_TIMEOUT,
+        "pool_recycle": settings.DB_POOL_RECYCLE,
+        "pool_pre_ping": settings.DB_POOL_PRE_PING,
+    }
+
+
+engine = create_engine(DATABASE_URL, **pool_options(DATABASE_URL))
 SessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
 
+
 def init_db():
-    Base.metadata.create_all(bind=engine)
+    from company_insight_service.database.migrations import lock_schema, upgrade
+
+    with engine.begin() as connection:
+        lock_schema(connection)
+        Base.metadata.create_all(bind=connection)
+        upgrade(connection)
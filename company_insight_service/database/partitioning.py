@@ -0,0 +1,138 @@
+"""
+Monthly range partitioning of product_sentiments (PostgreSQL only)
+
+Opt in with PRODUCT_SENTIMENTS_PARTITIONED; init_db then converts the
+table in place and keeps PARTITION_MONTHS_AHEAD months of partitions
+ready. Rows outside every monthly partition land in a DEFAULT partition.
+
+PostgreSQL only enforces unique indexes on a partitioned table when they
+include the partition key, so (company_id, source_url) is a plain index
+there and the write path matches existing rows itself (writes.merge).
+"""
+import logging
+from datetime import date, datetime
+from typing import List, Optional
+
+from sqlalchemy import inspect, text
+from sqlalchemy.engine import Connection
+
+logger = logging.getLogger(__name__)
+
+TABLE = "product_sentiments"
+DEFAULT_PARTITION = f"{TABLE}_default"
+
+
+def month_start(day: date) -> date:
+    return day.replace(day=1)
+
+
+def add_months(month: date, months: int) -> date:
+    """First day of the month `months` after `month`"""
+    index = month.year * 12 + month.month - 1 + months
+    return date(index // 12, index % 12 + 1, 1)
+
+
+def partition_name(month: date) -> str:
+    return f"{TABLE}_y{month.year}m{month.month:02d}"
+
+
+def is_partitioned(connection: Connection, table: str = TABLE) -> bool:
+    """Whether `table` is a partitioned table"""
+    if connection.dialect.name != "postgresql":
+        return False
+    return bool(connection.execute(
+        text("SELECT relkind = 'p' FROM pg_class WHERE oid = to_regclass(:table)"),
+        {"table": table}
+    ).scalar())
+
+
+def ensure_partitions(connection: Connection, months_ahead: int, first: Optional[date] = None) -> List[str]:
+    """
+    Create any missing monthly partitions
+
+    Args:
+        connection: Connection inside a transaction
+        months_ahead: Months after the current one to prepare
+        first: Earliest month to cover (defaults to the current month)
+
+    Returns:
+        Names of the partitions created
+    """
+    this_month = month_start(datetime.utcnow().date())
+    month = month_start(first or this_month)
+    last = add_months(this_month, months_ahead)
+
+    created = []
+    while month <= last:
+        name = partition_name(month)
+        if connection.execute(text("SELECT to_regclass(:name)"), {"name": name}).scalar() is None:
+            # A savepoint keeps one bad range (e.g. rows already in DEFAULT) from aborting the rest
+            try:
+                with connection.begin_nested():
+                    connection.execute(text(
+                        f"CREATE TABLE {name} PARTITION OF {TABLE} "
+                        f"FOR VALUES FROM ('{month}') TO ('{add_months(month, 1)}')"
+                    ))
+                created.append(name)
+            except Exception as e:
+                logger.warning(f"Could not create partition {name}: {e}")
+        month = add_months(month, 1)
+    return created
+
+
+def partition_table(connection: Connection, months_ahead: int) -> bool:
+    """
+    Convert the plain table into a monthly partitioned one, keeping its rows
+
+    The rows are copied inside the caller's transaction, so the table is
+    locked for the duration; run it in a maintenance window on large tables.
+    Every row must reference an existing company (the foreign key is
+    validated on the new table), otherwise the conversion rolls back.
+
+    Returns:
+        True if the table was converted, False if there was nothing to do
+    """
+    if connection.dialect.name != "postgresql" or is_partitioned(connection):
+        return False
+
+    legacy = f"{TABLE}_unpartitioned"
+    columns = [column["name"] for column in inspect(connection).get_columns(TABLE)]
+    sequence = connection.execute(text(f"SELECT pg_get_serial_sequence('{TABLE}', 'id')")).scalar()
+    first = connection.execute(text(f"SELECT MIN(created_at) FROM {TABLE}")).scalar()
+
+    connection.execute(text(f"ALTER TABLE {TABLE} RENAME TO {legacy}"))
+    connection.execute(text(
+        f"CREATE TABLE {TABLE} (LIKE {legacy} INCLUDING DEFAULTS) PARTITION BY RANGE (created_at)"
+    ))
+    connection.execute(text(f"ALTER TABLE {TABLE} ALTER COLUMN created_at SET NOT NULL"))
+    connection.execute(text(f"ALTER TABLE {TABLE} ADD PRIMARY KEY (id, created_at)"))
+    connection.execute(text(f"CREATE TABLE {DEFAULT_PARTITION} PARTITION OF {TABLE} DEFAULT"))
+    ensure_partitions(connection, months_ahead, first=first.date() if first else None)
+
+    select_list = ", ".join(
+        "COALESCE(created_at, updated_at, now())" if column == "created_at" else column
+        for column in columns
+    )
+    copied = connection.execute(text(
+        f"INSERT INTO {TABLE} ({', '.join(columns)}) SELECT {select_list} FROM {legacy}"
+    )).rowcount
+
+    # The id sequence belongs to the old table; keep it for the new one
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY NONE"))
+    connection.execute(text(f"DROP TABLE {legacy}"))
+    if sequence:
+        connection.execute(text(f"ALTER SEQUENCE {sequence} OWNED BY {TABLE}.id"))
+
+    connection.execute(text(
+        f"CREATE INDEX ix_{TABLE}_company_created ON {TABLE} (company_id, created_at, id)"
+    ))
+    connection.execute(text(
+        f"CREATE INDEX ix_{TABLE}_company_source ON {TABLE} (company_id, source_url)"
+    ))
+    connection.execute(text(
+        f"ALTER TABLE {TABLE} ADD CONSTRAINT fk_{TABLE}_company_id "
+        f"FOREIGN KEY (company_id) REFERENCES companies (id) ON DELETE CASCADE"
+    ))
+    logger.info(f"Partitioned {TABLE} by month ({copied} rows copied)")
+    return True
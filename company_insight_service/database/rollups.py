@@ -0,0 +1,196 @@
+"""
+Per company daily sentiment rollups
+
+sentiment_daily_rollups holds, per company and created_at day, the count,
+score sum, label counts and score range of product_sentiments. The
+consumers refresh the days a batch touched in the batch's own transaction
+(writes.refresh_rollups), so trends are read from one row per day instead
+of scanning raw rows.
+
+A bucket is always recomputed from the raw rows rather than incremented:
+re-scraped pages update their existing row (and keep its created_at), so
+an increment would count them twice. Rebuild everything, e.g. after
+upgrading a database that already had rows, with
+
+    python -m company_insight_service.database.rollups [--since YYYY-MM-DD] [--until YYYY-MM-DD]
+
+Rollups outlive raw rows: days before `--since` (or before the oldest raw
+row) are left alone.
+"""
+import argparse
+import logging
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from sqlalchemy import Date, Select, and_, case, cast, delete, func, insert, literal, or_, select
+from sqlalchemy.engine import Engine
+
+from company_insight_service.database.models import (
+    Company,
+    ProductSentiment,
+    SentimentDailyRollup,
+    engine,
+    init_db
+)
+from company_insight_service.database.partitioning import add_months, month_start
+
+logger = logging.getLogger(__name__)
+
+ROLLUP_KEY = ('company_id', 'day')
+
+# Rollup column -> aggregate over product_sentiments
+AGGREGATES = {
+    'sample_count': func.count(),
+    'score_sum': func.coalesce(func.sum(ProductSentiment.sentiment_score), 0.0),
+    'positive_count': func.sum(case((ProductSentiment.sentiment_label == 'Positive', 1), else_=0)),
+    'negative_count': func.sum(case((ProductSentiment.sentiment_label == 'Negative', 1), else_=0)),
+    'neutral_count': func.sum(case((ProductSentiment.sentiment_label == 'Neutral', 1), else_=0)),
+    'min_score': func.min(ProductSentiment.sentiment_score),
+    'max_score': func.max(ProductSentiment.sentiment_score),
+}
+
+
+def created_day(dialect: str):
+    """created_at truncated to its date (SQLite has no DATE cast)"""
+    if dialect == 'sqlite':
+        return func.date(ProductSentiment.created_at, type_=Date)
+    return cast(ProductSentiment.created_at, Date)
+
+
+def day_range(first: date, last: date):
+    """Condition on created_at for the days first..last (index friendly, no function on the column)"""
+    return and_(
+        ProductSentiment.created_at >= datetime.combine(first, datetime.min.time()),
+        ProductSentiment.created_at < datetime.combine(last + timedelta(days=1), datetime.min.time())
+    )
+
+
+def aggregate_query(dialect: str, *conditions) -> Select:
+    """Rollup rows (company_id, day, aggregates...) for the product sentiments matching `conditions`"""
+    day = created_day(dialect)
+    return (
+        select(
+            ProductSentiment.company_id.label('company_id'),
+            day.label('day'),
+            *(aggregate.label(column) for column, aggregate in AGGREGATES.items())
+        )
+        .where(ProductSentiment.company_id.is_not(None), *conditions)
+        .group_by(ProductSentiment.company_id, day)
+    )
+
+
+def bucket_query(dialect: str, buckets: Iterable[Tuple[int, date]]) -> Select:
+    """aggregate_query for specific (company_id, day) buckets"""
+    return aggregate_query(dialect, or_(*(
+        and_(ProductSentiment.company_id == company_id, day_range(day, day))
+        for company_id, day in buckets
+    )))
+
+
+def rebuild_rollups(engine: Engine, since: Optional[date] = None, until: Optional[date] = None) -> int:
+    """
+    Recompute the rollups for a range of days from the raw rows
+
+    Works a month at a time, each in its own transaction, so a large table
+    is not locked or held in one statement.
+
+    Args:
+        engine: Engine for the database
+        since: First day (defaults to the day of the oldest raw row)
+        until: Last day (defaults to today, UTC)
+
+    Returns:
+        Number of rollup rows written
+    """
+    with engine.connect() as connection:
+        if since is None:
+            oldest = connection.execute(select(func.min(ProductSentiment.created_at))).scalar()
+            if oldest is None:
+                logger.info("No product sentiments to roll up")
+                return 0
+            since = oldest.date()
+    until = until or datetime.utcnow().date()
+
+    written = 0
+    month = month_start(since)
+    while month <= until:
+        first = max(month, since)
+        last = min(add_months(month, 1) - timedelta(days=1), until)
+        with engine.begin() as connection:
+            aggregates = aggregate_query(connection.dialect.name, day_range(first, last)).add_columns(
+                literal(datetime.utcnow(), SentimentDailyRollup.updated_at.type).label('updated_at')
+            )
+            connection.execute(delete(SentimentDailyRollup).where(
+                SentimentDailyRollup.day >= first, SentimentDailyRollup.day <= last
+            ))
+            rows = connection.execute(
+                insert(SentimentDailyRollup).from_select(
+                    [column.name for column in aggregates.selected_columns], aggregates
+                )
+            ).rowcount
+        written += max(rows, 0)
+        logger.info(f"Rolled up {first} to {last}: {rows} company days")
+        month = add_months(month, 1)
+    return written
+
+
+def trend_query(company_name: str, first: date) -> Select:
+    """A company's rollups from `first` on, oldest first"""
+    company_id = select(Company.id).where(Company.name == company_name).scalar_subquery()
+    return (
+        select(SentimentDailyRollup)
+        .where(SentimentDailyRollup.company_id == company_id, SentimentDailyRollup.day >= first)
+        .order_by(SentimentDailyRollup.day)
+    )
+
+
+def _bucket(count: int, score_sum: float, positive: int, negative: int, neutral: int,
+            min_score, max_score) -> Dict:
+    return {
+        "count": count,
+        "average_score": round(score_sum / count, 4) if count else None,
+        "positive": positive,
+        "negative": negative,
+        "neutral": neutral,
+        "min_score": min_score,
+        "max_score": max_score,
+    }
+
+
+def to_trend(rollups: List[SentimentDailyRollup]) -> Tuple[List[Dict], Dict]:
+    """Shape rollups from trend_query into (per-day buckets, summary over all of them)"""
+    days = [
+        {"day": r.day.isoformat(), **_bucket(
+            r.sample_count, r.score_sum, r.positive_count, r.negative_count, r.neutral_count,
+            r.min_score, r.max_score
+        )}
+        for r in rollups
+    ]
+    mins = [r.min_score for r in rollups if r.min_score is not None]
+    maxes = [r.max_score for r in rollups if r.max_score is not None]
+    summary = _bucket(
+        sum(r.sample_count for r in rollups),
+        sum(r.score_sum for r in rollups),
+        sum(r.positive_count for r in rollups),
+        sum(r.negative_count for r in rollups),
+        sum(r.neutral_count for r in rollups),
+        min(mins) if mins else None,
+        max(maxes) if maxes else None,
+    )
+    return days, summary
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Rebuild daily sentiment rollups from product_sentiments")
+    parser.add_argument("--since", type=date.fromisoformat, help="First day (default: oldest raw row)")
+    parser.add_argument("--until", type=date.fromisoformat, help="Last day (default: today)")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(level=logging.INFO)
+    init_db()
+    written = rebuild_rollups(engine, args.since, args.until)
+    print(f"Wrote {written} rollup rows")
+
+
+if __name__ == "__main__":
+    main()
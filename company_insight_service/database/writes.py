@@ -0,0 +1,389 @@
+"""
+Batched writes of deep search results
+
+Shared by the queue consumers: `write_batch` stores any number of queued
+payloads using one company lookup, bulk upserts and no commits of its
+own, so the caller decides the transaction boundary.
+"""
+import logging
+from datetime import date, datetime, timezone
+from typing import Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import event, insert, select, tuple_, update
+from sqlalchemy.dialects import postgresql, sqlite
+from sqlalchemy.orm import Session
+
+from company_insight_service.config.settings import settings
+from company_insight_service.core import signals
+from company_insight_service.core.cache import MISS, StaleWhileRevalidateCache
+from company_insight_service.database import rollups
+from company_insight_service.database.models import Company, ProductSentiment, SentimentDailyRollup, StockAnalysis
+
+logger = logging.getLogger(__name__)
+
+# Unique keys (see the models' unique indexes)
+PRODUCT_SENTIMENT_KEY = ('company_id', 'source_url')
+STOCK_ANALYSIS_KEY = ('company_id', 'ticker', 'analysis_date')
+
+# Dialect-specific INSERTs that support ON CONFLICT
+UPSERT_INSERTS = {
+    'postgresql': postgresql.insert,
+    'sqlite': sqlite.insert,
+}
+
+# Rows per statement (keeps bind parameters well under driver limits)
+UPSERT_CHUNK_ROWS = 1000
+
+# Rollup buckets recomputed per statement
+ROLLUP_CHUNK_BUCKETS = 200
+
+# Session.info key for companies created in the session's open transaction
+PENDING_COMPANY_IDS = 'pending_company_ids'
+
+# Company name -> ID (companies are never renamed, so entries never expire)
+company_ids = StaleWhileRevalidateCache(
+    fresh_ttl=float('inf'),
+    stale_ttl=float('inf'),
+    max_entries=settings.COMPANY_ID_CACHE_SIZE,
+    name="company_ids"
+)
+
+
+def _dialect_insert(session: Session):
+    dialect = session.get_bind().dialect.name
+    dialect_insert = UPSERT_INSERTS.get(dialect)
+    if dialect_insert is None:
+        raise NotImplementedError(f"Upserts are not supported on {dialect}")
+    return dialect_insert
+
+
+def resolve_companies(session: Session, names: Iterable[str]) -> Dict[str, int]:
+    """
+    Map company names to IDs, creating missing companies
+
+    Known names are served from the process-wide `company_ids` cache, so
+    the common path makes no queries. Unknown names are looked up in one
+    query; those still missing are created with INSERT ... ON CONFLICT DO
+    NOTHING RETURNING, and any a concurrent consumer created first are
+    read back, so racing consumers always agree on one row.
+
+    IDs of companies created here are only cached once the session
+    commits, so a rolled back transaction never leaves a dangling ID.
+
+    Args:
+        session: Open session (not committed)
+        names: Company names
+
+    Returns:
+        Dict of {name: company_id}
+    """
+    ids = {}
+    unknown = set()
+    for name in set(names):
+        lookup = company_ids.get(name)
+        if lookup.status == MISS:
+            unknown.add(name)
+        else:
+            ids[name] = lookup.value
+    if not unknown:
+        return ids
+
+    found = dict(session.execute(select(Company.name, Company.id).where(Company.name.in_(unknown))).all())
+    for name, company_id in found.items():
+        company_ids.set(name, company_id)
+    ids.update(found)
+
+    missing = sorted(unknown - found.keys())
+    if not missing:
+        return ids
+
+    dialect_insert = _dialect_insert(session)
+    now = datetime.utcnow()
+    stmt = (
+        dialect_insert(Company)
+        .values([{'name': name, 'updated_at': now} for name in missing])
+        .on_conflict_do_nothing(index_elements=['name'])
+        .returning(Company.name, Company.id)
+    )
+    created = dict(session.execute(stmt).all())
+    session.info.setdefault(PENDING_COMPANY_IDS, {}).update(created)
+    ids.update(created)
+    if created:
+        signals.notify_rows(
+            session, Company, [{'id': company_id, 'name': name} for name, company_id in created.items()], "INSERT"
+        )
+
+    raced = set(missing) - created.keys()
+    if raced:
+        ids.update(session.execute(select(Company.name, Company.id).where(Company.name.in_(raced))).all())
+    return ids
+
+
+@event.listens_for(Session, "after_commit")
+def _cache_committed_companies(session: Session):
+    for name, company_id in session.info.pop(PENDING_COMPANY_IDS, {}).items():
+        company_ids.set(name, company_id)
+
+
+@event.listens_for(Session, "after_rollback")
+def _forget_rolled_back_companies(session: Session):
+    session.info.pop(PENDING_COMPANY_IDS, None)
+
+
+def payload_time(payload: Dict, default: datetime) -> datetime:
+    """
+    When a payload's rows were produced
+
+    Live queue messages carry no timestamp and are stamped on write;
+    replayed archives (see workers.backfill) may carry their original
+    `created_at` (ISO 8601, UTC).
+    """
+    created_at = payload.get('created_at')
+    if not created_at:
+        return default
+    try:
+        parsed = datetime.fromisoformat(str(created_at))
+    except ValueError:
+        logger.warning(f"Ignoring invalid created_at {created_at!r} for {payload.get('company_name')}")
+        return default
+    if parsed.tzinfo is not None:
+        parsed = parsed.astimezone(timezone.utc).replace(tzinfo=None)
+    return parsed
+
+
+def product_rows(payload: Dict, company_id: int, now: datetime) -> List[Dict]:
+    """ProductSentiment rows for one queued deep search payload"""
+    return [
+        {
+            'company_id': company_id,
+            'product_name': prod.get('title', 'Unknown'),
+            'sentiment_score': prod.get('sentiment_score', 0.0),
+            'sentiment_label': prod.get('sentiment_label', 'Neutral'),
+            'similarity_score': prod.get('similarity_score', None),
+            'summary': prod.get('summary', ''),
+            'source_url': prod.get('link') or None,  # No link: nothing to deduplicate on
+            'created_at': now,
+            'updated_at': now
+        }
+        for prod in payload.get('product_sentiment') or []
+    ]
+
+
+def _number(value) -> Optional[float]:
+    try:
+        return float(value) if value is not None else None
+    except (TypeError, ValueError):
+        return None
+
+
+def stock_rows(payload: Dict, company_id: int, now: datetime) -> List[Dict]:
+    """StockAnalysis rows (at most one) for one queued deep search payload"""
+    stock_analysis = payload.get('stock_analysis')
+    if not stock_analysis:
+        return []
+    return [{
+        'company_id': company_id,
+        'ticker': payload.get('ticker'),
+        'analysis_text': f"Trend: {stock_analysis.get('overall_change_percent', 0)}%",
+        'three_year_trend': stock_analysis,
+        'overall_change_percent': _number(stock_analysis.get('overall_change_percent')),
+        'typical_dip_month': stock_analysis.get('typical_dip_month'),
+        'typical_peak_month': stock_analysis.get('typical_peak_month'),
+        'latest_price': _number(stock_analysis.get('latest_price')),
+        'analysis_date': now.date(),
+        'created_at': now,
+        'updated_at': now
+    }]
+
+
+def _last_per_key(rows: List[Dict], key: Tuple[str, ...]) -> List[Dict]:
+    """
+    Drop earlier rows that share a key with a later one
+
+    One INSERT ... ON CONFLICT statement may not touch the same row twice,
+    so duplicates inside a batch are resolved here (the latest wins).
+    """
+    unique: Dict[tuple, Dict] = {}
+    for i, row in enumerate(rows):
+        values = tuple(row[column] for column in key)
+        # NULLs never conflict, so such rows are all kept
+        unique[(i,) if None in values else values] = row
+    return list(unique.values())
+
+
+def upsert(session: Session, model, rows: List[Dict], key: Tuple[str, ...], notify: bool = True) -> int:
+    """
+    Insert rows, updating the existing row where `key` already exists
+
+    Args:
+        session: Open session (the statement joins its transaction)
+        model: Mapped class with a unique index on `key`
+        rows: Column dicts
+        key: Columns of the unique index
+        notify: Send row notifications (off for derived tables)
+
+    Returns:
+        Number of rows inserted or updated
+
+    Raises:
+        NotImplementedError: If the database has no ON CONFLICT support here
+    """
+    rows = _last_per_key(rows, key)
+    if not rows:
+        return 0
+
+    dialect_insert = _dialect_insert(session)
+
+    # created_at keeps the first time a row was seen
+    updated = [column for column in rows[0] if column not in key and column != 'created_at']
+    for start in range(0, len(rows), UPSERT_CHUNK_ROWS):
+        stmt = dialect_insert(model).values(rows[start:start + UPSERT_CHUNK_ROWS])
+        stmt = stmt.on_conflict_do_update(
+            index_elements=list(key),
+            set_={column: stmt.excluded[column] for column in updated}
+        )
+        session.execute(stmt)
+
+    # Core statements bypass the ORM's mapper events
+    if notify:
+        signals.notify_rows(session, model, rows, "UPSERT")
+    return len(rows)
+
+
+def merge(session: Session, model, rows: List[Dict], key: Tuple[str, ...]) -> int:
+    """
+    Update rows whose key exists and insert the rest, without ON CONFLICT
+
+    For tables that cannot carry a unique index on `key` (partitioned
+    product_sentiments). Existing rows are found with one lookup, then
+    updated and inserted with one executemany each. Unlike `upsert` this
+    does not serialize concurrent writers; the async consumer's
+    per-company lanes keep one process from racing itself.
+
+    Args:
+        session: Open session
+        model: Mapped class
+        rows: Column dicts
+        key: Columns identifying a row
+
+    Returns:
+        Number of rows inserted or updated
+    """
+    rows = _last_per_key(rows, key)
+    if not rows:
+        return 0
+
+    key_columns = [getattr(model, column) for column in key]
+    keys = [tuple(row[column] for column in key) for row in rows]
+    lookup = [values for values in keys if None not in values]
+    existing = {}
+    for start in range(0, len(lookup), UPSERT_CHUNK_ROWS):
+        result = session.execute(
+            select(*key_columns, model.id).where(tuple_(*key_columns).in_(lookup[start:start + UPSERT_CHUNK_ROWS]))
+        )
+        existing.update({tuple(found[:-1]): found[-1] for found in result})
+
+    updates, inserts = [], []
+    for values, row in zip(keys, rows):
+        row_id = existing.get(values)
+        if row_id is None:
+            inserts.append(row)
+        else:
+            updates.append({**{c: v for c, v in row.items() if c != 'created_at'}, 'id': row_id})
+    if updates:
+        session.execute(update(model), updates)
+    if inserts:
+        session.execute(insert(model), inserts)
+
+    signals.notify_rows(session, model, rows, "UPSERT")
+    return len(rows)
+
+
+def written_buckets(session: Session, rows: List[Dict]) -> Set[Tuple[int, date]]:
+    """
+    (company_id, created_at day) of product sentiment rows just written
+
+    Rows that updated an existing page keep its created_at, so their day is
+    read back through the (company_id, source_url) key; rows without a
+    source_url are always new and belong to today.
+    """
+    dialect = session.get_bind().dialect.name
+    day = rollups.created_day(dialect)
+    key_columns = [getattr(ProductSentiment, column) for column in PRODUCT_SENTIMENT_KEY]
+    keys = list({
+        tuple(row[column] for column in PRODUCT_SENTIMENT_KEY) for row in rows if row['source_url'] is not None
+    })
+
+    buckets = {(row['company_id'], row['created_at'].date()) for row in rows if row['source_url'] is None}
+    for start in range(0, len(keys), UPSERT_CHUNK_ROWS):
+        result = session.execute(
+            select(ProductSentiment.company_id, day).distinct()
+            .where(tuple_(*key_columns).in_(keys[start:start + UPSERT_CHUNK_ROWS]))
+        )
+        buckets.update((company_id, found_day) for company_id, found_day in result)
+    return buckets
+
+
+def refresh_rollups(session: Session, buckets: Set[Tuple[int, date]]) -> int:
+    """
+    Recompute the daily sentiment rollups for (company_id, day) buckets
+
+    Args:
+        session: Open session (runs in its transaction, after the raw rows were written)
+        buckets: Buckets to recompute
+
+    Returns:
+        Number of rollup rows written
+    """
+    buckets = sorted(buckets)
+    now = datetime.utcnow()
+    written = 0
+    # Each bucket adds a few bind parameters to the OR; keep statements small
+    for start in range(0, len(buckets), ROLLUP_CHUNK_BUCKETS):
+        stmt = rollups.bucket_query(session.get_bind().dialect.name, buckets[start:start + ROLLUP_CHUNK_BUCKETS])
+        rows = [{**row._mapping, 'updated_at': now} for row in session.execute(stmt)]
+        written += upsert(session, SentimentDailyRollup, rows, rollups.ROLLUP_KEY, notify=False)
+    return written
+
+
+def write_batch(session: Session, payloads: List[Dict]) -> int:
+    """
+    Upsert the rows for a batch of payloads in the session
+
+    Rows for all payloads go out as one multi-row INSERT ... ON CONFLICT DO
+    UPDATE per table, so redelivered messages and pages scraped again
+    update the stored rows instead of duplicating them. The daily sentiment
+    rollups of the days touched are refreshed in the same transaction. The
+    caller commits.
+
+    Args:
+        session: Open session
+        payloads: Deep search payloads (as published by the save node)
+
+    Returns:
+        Number of rows written
+
+    Raises:
+        ValueError: If a payload has no company_name
+    """
+    for payload in payloads:
+        if not payload.get('company_name'):
+            raise ValueError("No company_name in message")
+
+    company_ids = resolve_companies(session, (p['company_name'] for p in payloads))
+    signals.name_companies(session, company_ids)
+
+    now = datetime.utcnow()
+    products, stocks = [], []
+    for payload in payloads:
+        company_id = company_ids[payload['company_name']]
+        written_at = payload_time(payload, now)
+        products.extend(product_rows(payload, company_id, written_at))
+        stocks.extend(stock_rows(payload, company_id, written_at))
+
+    # A partitioned product_sentiments has no unique index to conflict on
+    write_products = merge if settings.PRODUCT_SENTIMENTS_PARTITIONED else upsert
+    written = write_products(session, ProductSentiment, products, PRODUCT_SENTIMENT_KEY)
+    if products:
+        refresh_rollups(session, written_buckets(session, products))
+    return written + upsert(session, StockAnalysis, stocks, STOCK_ANALYSIS_KEY)
@@ -0,0 +1,11 @@
+"""
+Monitoring package - latency spans and Prometheus metrics
+"""
+from company_insight_service.monitoring.timing import (
+    span,
+    timed,
+    collect_timings,
+    summarize_timings
+)
+
+__all__ = ['span', 'timed', 'collect_timings', 'summarize_timings']
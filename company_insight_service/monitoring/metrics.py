@@ -0,0 +1,175 @@
+"""
+Prometheus metric definitions shared across the service
+
+Under multi-worker uvicorn every worker process writes its samples to
+PROMETHEUS_MULTIPROC_DIR (set up by run_api before the workers start) and
+/metrics aggregates all of them, whichever worker serves the scrape.
+"""
+import logging
+import os
+
+from prometheus_client import (
+    CollectorRegistry,
+    Counter,
+    Gauge,
+    Histogram,
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    generate_latest,
+    multiprocess,
+    start_http_server
+)
+
+logger = logging.getLogger(__name__)
+
+# Latency buckets (seconds) sized for network calls and multi-step workflows
+LATENCY_BUCKETS = (0.01, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 20.0, 30.0, 60.0, 120.0)
+
+WORKFLOW_NODE_SECONDS = Histogram(
+    "workflow_node_duration_seconds",
+    "Time spent executing a research workflow node",
+    ["node"],
+    buckets=LATENCY_BUCKETS
+)
+
+SERVICE_CALL_SECONDS = Histogram(
+    "service_call_duration_seconds",
+    "Time spent in calls to external services",
+    ["service", "operation"],
+    buckets=LATENCY_BUCKETS
+)
+
+SERVICE_CALL_ERRORS = Counter(
+    "service_call_errors",
+    "Failed calls to external services",
+    ["service", "operation"]
+)
+
+HTTP_REQUEST_SECONDS = Histogram(
+    "http_request_duration_seconds",
+    "Time to serve an HTTP request, until the response body is sent",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS
+)
+
+HTTP_REQUESTS_IN_FLIGHT = Gauge(
+    "http_requests_in_flight",
+    "HTTP requests currently being served",
+    ["method", "route"],
+    multiprocess_mode="livesum"
+)
+
+CACHE_LOOKUPS = Counter(
+    "cache_lookups",
+    "Cache lookups by result (fresh, stale or miss)",
+    ["cache", "result"]
+)
+
+QUEUE_PUBLISH_SECONDS = Histogram(
+    "queue_publish_duration_seconds",
+    "Time to publish a message to RabbitMQ",
+    ["queue"],
+    buckets=LATENCY_BUCKETS
+)
+
+WORKER_MESSAGE_SECONDS = Histogram(
+    "worker_message_processing_seconds",
+    "Time the consumer spent processing a queue message",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS
+)
+
+WORKER_DB_WRITE_SECONDS = Histogram(
+    "worker_db_write_seconds",
+    "Time the consumer spent writing a message's data to the database",
+    ["outcome"],
+    buckets=LATENCY_BUCKETS
+)
+
+EXECUTOR_QUEUE_WAIT_SECONDS = Histogram(
+    "executor_queue_wait_seconds",
+    "Time a task waited in an executor queue before starting",
+    ["pool"],
+    buckets=LATENCY_BUCKETS
+)
+
+EXECUTOR_RUN_SECONDS = Histogram(
+    "executor_run_duration_seconds",
+    "Time a task spent executing in an executor pool",
+    ["pool"],
+    buckets=LATENCY_BUCKETS
+)
+
+ADMISSION_IN_FLIGHT = Gauge(
+    "admission_in_flight_requests",
+    "Requests admitted and currently being served per limited route",
+    ["route"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_QUEUED = Gauge(
+    "admission_queued_requests",
+    "Requests waiting for a slot per limited route",
+    ["route"],
+    multiprocess_mode="livesum"
+)
+
+ADMISSION_REJECTED = Counter(
+    "admission_rejected_requests",
+    "Requests rejected with 429 by admission control",
+    ["route", "reason"]
+)
+
+
+def multiprocess_enabled() -> bool:
+    """Whether samples are shared between processes through PROMETHEUS_MULTIPROC_DIR"""
+    return bool(os.environ.get("PROMETHEUS_MULTIPROC_DIR"))
+
+
+def render_metrics() -> tuple:
+    """
+    Render all registered metrics in the Prometheus text format
+
+    In multiprocess mode the samples of every live worker are aggregated.
+
+    Returns:
+        Tuple of (payload bytes, content type)
+    """
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry), CONTENT_TYPE_LATEST
+    return generate_latest(REGISTRY), CONTENT_TYPE_LATEST
+
+
+def mark_process_dead(pid: int = None):
+    """Drop a stopped worker's live gauges (no-op outside multiprocess mode)"""
+    if multiprocess_enabled():
+        multiprocess.mark_process_dead(pid or os.getpid())
+
+
+def start_metrics_server(port: int) -> bool:
+    """
+    Serve /metrics on a separate port (for processes without an HTTP app)
+
+    In multiprocess mode the exporter aggregates every process writing to
+    PROMETHEUS_MULTIPROC_DIR, so workers sharing the directory need only
+    one exporter: the first to bind the port serves the samples of all.
+
+    Returns:
+        True if the exporter started, False if the port was unavailable
+    """
+    registry = REGISTRY
+    if multiprocess_enabled():
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    try:
+        start_http_server(port, registry=registry)
+    except OSError as e:
+        if multiprocess_enabled():
+            logger.info(f"Metrics port {port} already bound; its exporter includes this process's samples")
+        else:
+            logger.warning(f"Could not start metrics exporter on port {port}: {e}")
+        return False
+    logger.info(f"Metrics exporter listening on port {port}")
+    return True
@@ -0,0 +1,135 @@
+"""
+Timing spans for workflow nodes and service calls
+
+Every span is observed into a Prometheus histogram, and failed service
+calls are counted. Spans are also appended to the active collector (see
+`collect_timings`) so callers can attach a per-step timing breakdown to
+what they return.
+"""
+import functools
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Dict, List, Optional
+
+from company_insight_service.monitoring.metrics import (
+    WORKFLOW_NODE_SECONDS,
+    SERVICE_CALL_SECONDS,
+    SERVICE_CALL_ERRORS
+)
+
+NODE = "node"
+
+_collector: ContextVar[Optional[List[Dict]]] = ContextVar("timing_collector", default=None)
+
+
+class Span:
+    """A single timed operation"""
+
+    def __init__(self, service: str, operation: str):
+        self.service = service
+        self.operation = operation
+        self.error = False
+        self.seconds = 0.0
+
+    def to_dict(self) -> Dict:
+        data = {
+            "service": self.service,
+            "operation": self.operation,
+            "ms": round(self.seconds * 1000, 1)
+        }
+        if self.error:
+            data["error"] = True
+        return data
+
+
+@contextmanager
+def span(service: str, operation: str):
+    """
+    Time a block of code
+
+    Args:
+        service: Service being called (e.g. "duckduckgo", "yfinance"),
+            or "node" for a workflow node
+        operation: Operation within the service, or the node name
+
+    Yields:
+        The Span; set `span.error = True` to flag a handled failure
+    """
+    current = Span(service, operation)
+    start = time.perf_counter()
+    try:
+        yield current
+    except BaseException:
+        current.error = True
+        raise
+    finally:
+        current.seconds = time.perf_counter() - start
+        if service == NODE:
+            WORKFLOW_NODE_SECONDS.labels(node=operation).observe(current.seconds)
+        else:
+            SERVICE_CALL_SECONDS.labels(service=service, operation=operation).observe(current.seconds)
+            if current.error:
+                SERVICE_CALL_ERRORS.labels(service=service, operation=operation).inc()
+
+        collector = _collector.get()
+        if collector is not None:
+            collector.append(current.to_dict())
+
+
+def timed(service: str, operation: str):
+    """Decorator form of `span`"""
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with span(service, operation):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+
+@contextmanager
+def collect_timings(collected: Optional[List[Dict]] = None):
+    """
+    Collect the spans finished inside the block
+
+    The collector is carried by a context variable, so spans recorded in
+    threads started with a copied context (LangGraph node executors,
+    `contextvars.copy_context().run`) are collected as well.
+
+    Args:
+        collected: Existing list to keep appending to (a new one by default)
+
+    Yields:
+        List the finished spans are appended to (as dicts)
+    """
+    if collected is None:
+        collected = []
+    token = _collector.set(collected)
+    try:
+        yield collected
+    finally:
+        _collector.reset(token)
+
+
+def summarize_timings(spans: List[Dict]) -> Dict:
+    """
+    Build a timing breakdown from collected spans
+
+    Returns:
+        Dict with the node time, per-service totals and the raw spans
+    """
+    node_ms = sum(s["ms"] for s in spans if s["service"] == NODE)
+    by_service: Dict[str, Dict] = {}
+    for s in spans:
+        if s["service"] == NODE:
+            continue
+        totals = by_service.setdefault(s["service"], {"count": 0, "ms": 0.0})
+        totals["count"] += 1
+        totals["ms"] = round(totals["ms"] + s["ms"], 1)
+
+    return {
+        "node_ms": round(node_ms, 1),
+        "by_service": by_service,
+        "spans": [s for s in spans if s["service"] != NODE]
+    }
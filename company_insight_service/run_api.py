@@ -2,13 +2,34 @@
 """
 API server entry point
 """
+import os
+import shutil
+import tempfile
+
 import uvicorn
 from company_insight_service.config.settings import settings
 
 
+def prepare_metrics_dir():
+    """
+    Set up a shared Prometheus directory for multi-worker runs
+
+    Must run before the workers import prometheus_client. Samples left by
+    a previous run are removed.
+    """
+    path = settings.PROMETHEUS_MULTIPROC_DIR or os.path.join(
+        tempfile.gettempdir(), "company_insight_prometheus"
+    )
+    shutil.rmtree(path, ignore_errors=True)
+    os.makedirs(path, exist_ok=True)
+    os.environ["PROMETHEUS_MULTIPROC_DIR"] = path
+
+
 def main():
     """Start the API server"""
     use_reload = settings.API_WORKERS == 1
+    if not use_reload:
+        prepare_metrics_dir()
     
     uvicorn.run(
         "company_insight_service.api.app:app",
@@ -1,8 +1,14 @@
 #!/usr/bin/env python
 """
 Worker entry point
+
+Runs the asyncio consumer; WORKER_MODE=blocking runs the pika one instead.
 """
-from company_insight_service.workers.consumer import main
+from company_insight_service.config.settings import settings
 
 if __name__ == "__main__":
+    if settings.WORKER_MODE == "blocking":
+        from company_insight_service.workers.consumer import main
+    else:
+        from company_insight_service.workers.async_consumer import main
     main()
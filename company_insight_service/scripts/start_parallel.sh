@@ -27,8 +27,15 @@ echo ""
 echo "2️⃣ Starting background workers..."
 NUM_WORKERS=${1:-4}
 
+# Workers share one Prometheus directory, so whichever binds
+# WORKER_METRICS_PORT exports the samples of all of them
+WORKER_METRICS_DIR="${TMPDIR:-/tmp}/company_insight_worker_prometheus"
+rm -rf "$WORKER_METRICS_DIR"
+mkdir -p "$WORKER_METRICS_DIR"
+
 for i in $(seq 1 $NUM_WORKERS); do
-    PYTHONPATH="$PYTHONPATH" python -m company_insight_service.run_worker > "logs/worker_$i.log" 2>&1 &
+    PROMETHEUS_MULTIPROC_DIR="$WORKER_METRICS_DIR" PYTHONPATH="$PYTHONPATH" \
+        python -m company_insight_service.run_worker > "logs/worker_$i.log" 2>&1 &
     echo "   Started worker $i with PID $!"
 done
 
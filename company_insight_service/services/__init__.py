@@ -15,11 +15,14 @@ from company_insight_service.services.scraping import scrape_url_content
 from company_insight_service.services.sentiment import (
     analyze_sentiment,
     analyze_with_gemini,
-    analyze_products
+    analyze_products,
+    iter_product_analyses
 )
 
 from company_insight_service.services.stock import (
     get_stock_data_analysis,
+    fetch_close_prices,
+    summarize_close_prices,
     find_ticker
 )
 
@@ -41,9 +44,12 @@ __all__ = [
     'analyze_sentiment',
     'analyze_with_gemini',
     'analyze_products',
+    'iter_product_analyses',
     
     # Stock
     'get_stock_data_analysis',
+    'fetch_close_prices',
+    'summarize_close_prices',
     'find_ticker',
     
     # Company
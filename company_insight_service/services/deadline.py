@@ -0,0 +1,137 @@
+"""
+Request deadlines propagated into service calls
+
+A deadline is activated with `deadline_scope` and read by services through
+a context variable, so it follows the work into LangGraph node threads and
+any thread started with a copied context.
+"""
+import concurrent.futures
+import contextvars
+import logging
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+_current: ContextVar[Optional["Deadline"]] = ContextVar("request_deadline", default=None)
+
+# Threads for calls that must return by the deadline; a call that overruns
+# is abandoned and finishes on its own (every call also has a socket timeout)
+_deadline_executor = concurrent.futures.ThreadPoolExecutor(
+    max_workers=32,
+    thread_name_prefix="deadline-call"
+)
+
+
+class DeadlineExceeded(TimeoutError):
+    """Raised when the request deadline has passed"""
+
+
+class Deadline:
+    """An absolute point in time (epoch seconds) by which work must finish"""
+
+    def __init__(self, expires_at: float):
+        self.expires_at = expires_at
+
+    @classmethod
+    def after(cls, seconds: float) -> "Deadline":
+        """Deadline `seconds` from now"""
+        return cls(time.time() + seconds)
+
+    def remaining(self) -> float:
+        """Seconds left (never negative)"""
+        return max(0.0, self.expires_at - time.time())
+
+    @property
+    def expired(self) -> bool:
+        return time.time() >= self.expires_at
+
+    def __repr__(self) -> str:
+        return f"Deadline(remaining={self.remaining():.1f}s)"
+
+
+def current_deadline() -> Optional[Deadline]:
+    """The deadline active in this context, if any"""
+    return _current.get()
+
+
+@contextmanager
+def deadline_scope(deadline: Optional[Deadline]):
+    """Activate a deadline for the calls made inside the block"""
+    token = _current.set(deadline)
+    try:
+        yield deadline
+    finally:
+        _current.reset(token)
+
+
+def deadline_expired() -> bool:
+    """Whether the active deadline (if any) has passed"""
+    deadline = _current.get()
+    return deadline is not None and deadline.expired
+
+
+def remaining_time() -> Optional[float]:
+    """Seconds left before the active deadline, or None without one"""
+    deadline = _current.get()
+    return deadline.remaining() if deadline is not None else None
+
+
+def check_deadline():
+    """
+    Raise if the active deadline has passed
+
+    Raises:
+        DeadlineExceeded: If the active deadline has already passed
+    """
+    if deadline_expired():
+        raise DeadlineExceeded("Request deadline exceeded")
+
+
+def time_budget(default: float) -> float:
+    """
+    Timeout to use for a single call
+
+    Args:
+        default: Timeout to use without a deadline (or if it is shorter)
+
+    Returns:
+        min(default, remaining time)
+
+    Raises:
+        DeadlineExceeded: If the active deadline has already passed
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return default
+    if deadline.expired:
+        raise DeadlineExceeded("Request deadline exceeded")
+    return min(default, deadline.remaining())
+
+
+def call_with_deadline(func: Callable, *args, **kwargs) -> Any:
+    """
+    Call a function, giving up when the active deadline passes
+
+    Without a deadline the function is simply called. Otherwise it runs in
+    a worker thread (with a copy of the current context) and the caller
+    stops waiting once the budget is exhausted.
+
+    Raises:
+        DeadlineExceeded: If the deadline passed before the call returned
+    """
+    deadline = _current.get()
+    if deadline is None:
+        return func(*args, **kwargs)
+    if deadline.expired:
+        raise DeadlineExceeded(f"No time left for {getattr(func, '__name__', func)}")
+
+    future = _deadline_executor.submit(contextvars.copy_context().run, func, *args, **kwargs)
+    try:
+        return future.result(timeout=deadline.remaining())
+    except concurrent.futures.TimeoutError:
+        future.cancel()
+        logger.warning(f"⏱️ Deadline exceeded waiting for {getattr(func, '__name__', func)}")
+        raise DeadlineExceeded(f"Deadline exceeded in {getattr(func, '__name__', func)}")
@@ -6,6 +6,8 @@ import requests
 from bs4 import BeautifulSoup
 
 from company_insight_service.config.settings import settings
+from company_insight_service.monitoring.timing import span
+from company_insight_service.services.deadline import time_budget
 
 logger = logging.getLogger(__name__)
 
@@ -28,7 +30,9 @@ def scrape_url_content(url: str) -> str:
             'Accept-Language': 'en-US,en;q=0.9',
         }
         
-        response = requests.get(url, headers=headers, timeout=settings.SCRAPE_TIMEOUT)
+        with span("scrape", "fetch") as call:
+            response = requests.get(url, headers=headers, timeout=time_budget(settings.SCRAPE_TIMEOUT))
+            call.error = response.status_code != 200
         
         if response.status_code == 200:
             soup = BeautifulSoup(response.text, 'html.parser')
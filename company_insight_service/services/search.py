@@ -10,6 +10,8 @@ except ImportError:
     from duckduckgo_search import DDGS
 
 from company_insight_service.config.settings import settings
+from company_insight_service.monitoring.timing import span
+from company_insight_service.services.deadline import remaining_time
 
 logger = logging.getLogger(__name__)
 
@@ -31,17 +33,25 @@ def search_web(query: str, max_results: int = None) -> List[Dict]:
     results = []
     logger.info(f"Searching web for: {query}")
     
-    try:
-        with DDGS() as ddgs:
-            search_results = list(ddgs.text(query, max_results=max_results))
-            for r in search_results:
-                results.append({
-                    "title": r.get("title"),
-                    "link": r.get("href"),
-                    "snippet": r.get("body")
-                })
-    except Exception as e:
-        logger.error(f"Error searching for {query}: {e}")
+    with span("duckduckgo", "search") as call:
+        try:
+            # Bound the search by the request deadline, if one is active
+            remaining = remaining_time()
+            ddgs_kwargs = {"timeout": max(1, int(remaining))} if remaining is not None else {}
+            if remaining == 0:
+                raise TimeoutError("Request deadline exceeded")
+            
+            with DDGS(**ddgs_kwargs) as ddgs:
+                search_results = list(ddgs.text(query, max_results=max_results))
+                for r in search_results:
+                    results.append({
+                        "title": r.get("title"),
+                        "link": r.get("href"),
+                        "snippet": r.get("body")
+                    })
+        except Exception as e:
+            call.error = True
+            logger.error(f"Error searching for {query}: {e}")
         
     return results
 
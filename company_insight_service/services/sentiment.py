@@ -4,13 +4,22 @@ Sentiment analysis using TextBlob and Google Gemini
 import logging
 import json
 from textblob import TextBlob
-from typing import Tuple, Dict, Optional, List
+from typing import Tuple, Dict, Optional, List, Iterator
 import concurrent.futures
+import contextvars
 
 from google import genai
+from google.genai import types
 
 from company_insight_service.config.settings import settings
 from company_insight_service.services.scraping import scrape_url_content
+from company_insight_service.monitoring.timing import span, timed
+from company_insight_service.services.deadline import (
+    DeadlineExceeded,
+    check_deadline,
+    remaining_time,
+    time_budget
+)
 
 logger = logging.getLogger(__name__)
 
@@ -26,6 +35,15 @@ else:
     logger.warning("GEMINI_API_KEY not found. Gemini features will be disabled.")
 
 
+def gemini_request_config() -> Optional[types.GenerateContentConfig]:
+    """Request config bounding a Gemini call by the request deadline, if any"""
+    if remaining_time() is None:
+        return None
+    timeout_ms = int(time_budget(60) * 1000)
+    return types.GenerateContentConfig(http_options=types.HttpOptions(timeout=timeout_ms))
+
+
+@timed("textblob", "sentiment")
 def analyze_sentiment(text: str) -> Tuple[float, str]:
     """
     Simple sentiment analysis using TextBlob
@@ -90,10 +108,12 @@ def analyze_with_gemini(text: str, context_query: str) -> Optional[Dict]:
         }}
         """
         
-        response = gemini_client.models.generate_content(
-            model="gemini-1.5-flash",
-            contents=prompt
-        )
+        with span("gemini", "analyze"):
+            response = gemini_client.models.generate_content(
+                model="gemini-1.5-flash",
+                contents=prompt,
+                config=gemini_request_config()
+            )
         
         # Clean response to ensure it's valid JSON
         content = response.text.strip()
@@ -109,29 +129,40 @@ def analyze_with_gemini(text: str, context_query: str) -> Optional[Dict]:
         return None
 
 
-def analyze_products(company_name: str) -> List[Dict]:
+def iter_product_analyses(company_name: str) -> Iterator[Dict]:
     """
-    Search for products, scrape details, and analyze sentiment concurrently
+    Search for products, scrape details, and analyze sentiment concurrently,
+    yielding each analyzed product as soon as it is ready
     
     Args:
         company_name: Name of the company
     
-    Returns:
-        List of analyzed products with sentiment scores
+    Yields:
+        Analyzed products with sentiment scores, in completion order
+    
+    Raises:
+        DeadlineExceeded: If the request deadline passes; products yielded
+            so far are still valid and pending scrapes are cancelled
     """
     from company_insight_service.services.search import search_web
     
+    check_deadline()
     logger.info(f"Analyzing products for: {company_name}")
     search_query = f"{company_name} consumer product reviews sentiment"
     results = search_web(search_query, max_results=5)
+    check_deadline()
     
-    analyzed_products = []
-    
-    with concurrent.futures.ThreadPoolExecutor(max_workers=5) as executor:
-        # Map scrape function to urls
-        future_to_url = {executor.submit(scrape_url_content, r['link']): r for r in results}
+    # Not a `with` block: on deadline we must not wait for running scrapes
+    executor = concurrent.futures.ThreadPoolExecutor(max_workers=5)
+    try:
+        # Map scrape function to urls (copying the context keeps timing spans collected)
+        future_to_url = {
+            executor.submit(contextvars.copy_context().run, scrape_url_content, r['link']): r
+            for r in results
+        }
         
-        for future in concurrent.futures.as_completed(future_to_url):
+        for future in concurrent.futures.as_completed(future_to_url, timeout=remaining_time()):
+            check_deadline()
             r = future_to_url[future]
             content = ""
             
@@ -150,24 +181,40 @@ def analyze_products(company_name: str) -> List[Dict]:
                 gemini_result = analyze_with_gemini(content, search_query)
                 
                 if gemini_result:
-                    analyzed_products.append({
+                    yield {
                         "title": r['title'],
                         "link": r['link'],
                         "sentiment_score": gemini_result.get("sentiment_score", 0),
                         "sentiment_label": gemini_result.get("sentiment_label", "Neutral"),
                         "similarity_score": gemini_result.get("similarity_score", 0),
                         "summary": gemini_result.get("summary", content[:300] + "...")
-                    })
+                    }
                 else:
                     # Fallback to TextBlob
                     score, label = analyze_sentiment(content)
-                    analyzed_products.append({
+                    yield {
                         "title": r['title'],
                         "link": r['link'],
                         "sentiment_score": round(score, 2),
                         "sentiment_label": label,
                         "similarity_score": None,
                         "summary": (content[:300] + "...") if len(content) > 300 else content
-                    })
-                
-    return analyzed_products
+                    }
+    except concurrent.futures.TimeoutError:
+        logger.warning(f"⏱️ Deadline reached while analyzing products for {company_name}")
+        raise DeadlineExceeded("Deadline exceeded during product analysis")
+    finally:
+        executor.shutdown(wait=False, cancel_futures=True)
+
+
+def analyze_products(company_name: str) -> List[Dict]:
+    """
+    Search for products, scrape details, and analyze sentiment concurrently
+    
+    Args:
+        company_name: Name of the company
+    
+    Returns:
+        List of analyzed products with sentiment scores
+    """
+    return list(iter_product_analyses(company_name))
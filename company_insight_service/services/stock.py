@@ -14,23 +14,34 @@ import pandas as pd
 
 from company_insight_service.config.settings import settings
 from company_insight_service.services.search import search_web
-from company_insight_service.services.sentiment import gemini_client
+from company_insight_service.services.sentiment import gemini_client, gemini_request_config
+from company_insight_service.services.deadline import time_budget
+from company_insight_service.monitoring.timing import span
 
 logger = logging.getLogger(__name__)
 
-def get_stock_data_analysis(ticker: str, years: int = 3) -> Optional[Dict]:
+
+def _has_price_history(symbol: str) -> bool:
+    """Check whether yfinance returns recent price data for a symbol"""
+    with span("yfinance", "history") as call:
+        try:
+            return not yf.Ticker(symbol).history(period="1d", timeout=time_budget(10)).empty
+        except Exception:
+            call.error = True
+            return False
+
+
+def fetch_close_prices(ticker: str, years: int = 3) -> Optional[pd.Series]:
     """
-    Fetch stock data for N years and analyze trends
+    Download N years of daily closing prices (network-bound)
     
     Args:
         ticker: Stock ticker symbol
-        years: Number of years to analyze
+        years: Number of years to fetch
     
     Returns:
-        Dict with analysis results or None if failed
+        Series of closing prices indexed by date, or None if failed
     """
-    logger.info(f"Analyzing stock for ticker: {ticker} over {years} years")
-    
     if not ticker:
         return None
     logger.info(f"Fetching stock data for {ticker} from {years} years ago to now")
@@ -39,8 +50,10 @@ def get_stock_data_analysis(ticker: str, years: int = 3) -> Optional[Dict]:
     
     try:
         # Download stock data
-        data = yf.download(ticker, start=start_date, end=end_date, progress=False)
-        logger.info(f"yfinance successfully downloaded data for {ticker}. Data preview:\n{data.head()}")
+        with span("yfinance", "download"):
+            data = yf.download(
+                ticker, start=start_date, end=end_date, progress=False, timeout=time_budget(10)
+            )
         if data.empty:
             logger.warning(f"yfinance returned no data for ticker: {ticker}")
             return None
@@ -62,7 +75,27 @@ def get_stock_data_analysis(ticker: str, years: int = 3) -> Optional[Dict]:
         close_series = data['Close']
         if isinstance(close_series, pd.DataFrame):
             close_series = close_series.iloc[:, 0]
+        return close_series
+        
+    except Exception as e:
+        logger.error(f"Error fetching stock data for {ticker}: {e}")
+        logger.debug(traceback.format_exc())
+        return None
+
 
+def summarize_close_prices(ticker: str, years: int, close_series: pd.Series) -> Optional[Dict]:
+    """
+    Analyze trends (dip/peak months, overall change) in closing prices (CPU-bound)
+    
+    Args:
+        ticker: Stock ticker symbol
+        years: Number of years the prices cover
+        close_series: Closing prices from fetch_close_prices
+    
+    Returns:
+        Dict with analysis results or None if failed
+    """
+    try:
         # Analyze monthly patterns
         monthly_avg = close_series.groupby(close_series.index.month).mean()
         best_month = monthly_avg.idxmax()
@@ -98,11 +131,31 @@ def get_stock_data_analysis(ticker: str, years: int = 3) -> Optional[Dict]:
         return None
 
 
+def get_stock_data_analysis(ticker: str, years: int = 3) -> Optional[Dict]:
+    """
+    Fetch stock data for N years and analyze trends
+    
+    Args:
+        ticker: Stock ticker symbol
+        years: Number of years to analyze
+    
+    Returns:
+        Dict with analysis results or None if failed
+    """
+    logger.info(f"Analyzing stock for ticker: {ticker} over {years} years")
+    
+    close_series = fetch_close_prices(ticker, years)
+    if close_series is None:
+        return None
+    return summarize_close_prices(ticker, years, close_series)
+
+
 def find_ticker(company_name: str) -> Optional[str]:
     """
     Find stock ticker symbol for a company
     
-    Uses multiple strategies with 20-second timeout:
+    Uses multiple strategies with a 20-second timeout (shorter if the
+    request deadline is closer):
     1. Direct ticker validation
     2. Web search with regex patterns
     3. Gemini AI extraction
@@ -116,9 +169,9 @@ def find_ticker(company_name: str) -> Optional[str]:
     """
     import time
     start_time = time.time()
-    MAX_SEARCH_TIME = 20  # Maximum 20 seconds for ticker search
+    MAX_SEARCH_TIME = time_budget(20)  # Maximum 20 seconds for ticker search
     
-    logger.info(f"Finding ticker for: {company_name} (max {MAX_SEARCH_TIME}s)")
+    logger.info(f"Finding ticker for: {company_name} (max {MAX_SEARCH_TIME:.0f}s)")
     
     # Strategy 1: Check if input is already a valid ticker
     if 2 <= len(company_name) <= 12 and company_name.replace('.', '').isalnum():
@@ -132,18 +185,15 @@ def find_ticker(company_name: str) -> Optional[str]:
             ])
             
         for var in variations:
-            try:
-                if not yf.Ticker(var).history(period="1d").empty:
-                    logger.info(f"Verified direct ticker: {var}")
-                    return var
-            except:
-                pass
+            if _has_price_history(var):
+                logger.info(f"Verified direct ticker: {var}")
+                return var
 
 
     # Strategy 2: Search for ticker using web search (with timeout)
     elapsed = time.time() - start_time
     if elapsed > MAX_SEARCH_TIME:
-        logger.warning(f"⏱️ Ticker search timeout ({MAX_SEARCH_TIME}s) - stopping search")
+        logger.warning(f"⏱️ Ticker search timeout ({MAX_SEARCH_TIME:.0f}s) - stopping search")
         return None
     
     logger.info(f"Starting web search (elapsed: {elapsed:.1f}s)")
@@ -209,10 +259,12 @@ def find_ticker(company_name: str) -> Optional[str]:
             5. Return JSON format: {{"ticker": "SYMBOL"}} or {{"ticker": null}} if not found.
             """
             
-            response = gemini_client.models.generate_content(
-                model="gemini-1.5-flash",
-                contents=ticker_prompt
-            )
+            with span("gemini", "ticker"):
+                response = gemini_client.models.generate_content(
+                    model="gemini-1.5-flash",
+                    contents=ticker_prompt,
+                    config=gemini_request_config()
+                )
             
             cleaned_text = response.text.replace('```json', '').replace('```', '').strip()
             data = json.loads(cleaned_text)
@@ -225,12 +277,9 @@ def find_ticker(company_name: str) -> Optional[str]:
                 suffixes = ["", ".NS", ".BO"]
                 for suffix in suffixes:
                     trial_ticker = candidate + suffix
-                    try:
-                        if not yf.Ticker(trial_ticker).history(period="1d").empty:
-                            logger.info(f"Verified Gemini ticker: {trial_ticker}")
-                            return trial_ticker
-                    except:
-                        pass
+                    if _has_price_history(trial_ticker):
+                        logger.info(f"Verified Gemini ticker: {trial_ticker}")
+                        return trial_ticker
                         
         except Exception as e:
             logger.error(f"Gemini ticker extraction failed: {e}")
@@ -255,13 +304,9 @@ def find_ticker(company_name: str) -> Optional[str]:
                 suffixes = ["", ".NS", ".BO"]
                 for suffix in suffixes:
                     trial_ticker = candidate + suffix
-                    try:
-                        hist = yf.Ticker(trial_ticker).history(period="1d")
-                        if not hist.empty:
-                            logger.info(f"Verified ticker: {trial_ticker}")
-                            return trial_ticker
-                    except:
-                        pass
+                    if _has_price_history(trial_ticker):
+                        logger.info(f"Verified ticker: {trial_ticker}")
+                        return trial_ticker
         
     elapsed = time.time() - start_time
     logger.warning(f"❌ No valid ticker found for '{company_name}' (searched for {elapsed:.1f}s)")
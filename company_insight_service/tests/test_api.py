@@ -4,7 +4,9 @@ Tests all endpoints with various scenarios
 """
 import pytest
 import asyncio
+import json
 import logging
+import time
 from httpx import AsyncClient
 from fastapi.testclient import TestClient
 
@@ -53,6 +55,26 @@ class TestHealthEndpoints:
         assert data["status"] == "healthy"
         assert "timestamp" in data
         assert "service" in data
+    
+    def test_metrics_endpoint(self):
+        """Test Prometheus metrics exposition"""
+        response = client.get("/metrics")
+        assert response.status_code == 200
+        assert "text/plain" in response.headers["content-type"]
+        assert "workflow_node_duration_seconds" in response.text
+        assert "service_call_duration_seconds" in response.text
+    
+    def test_request_metrics_use_route_templates(self):
+        """Requests are recorded per route template with their status"""
+        client.get("/company/deep_search/jobs/some-unknown-job")
+        text = client.get("/metrics").text
+        
+        assert (
+            'http_request_duration_seconds_count{method="GET",'
+            'route="/company/deep_search/jobs/{job_id}",status="404"}'
+        ) in text
+        assert "some-unknown-job" not in text
+        assert "http_requests_in_flight" in text
 
 
 class TestCompanyMonthlyEvents:
@@ -216,6 +238,79 @@ class TestCompanyStockTrends:
         assert response.status_code in [200, 404, 500]
 
 
+class TestHttpCaching:
+    """Test ETag / Cache-Control handling on read-style endpoints"""
+    
+    def test_stock_trends_etag_and_304(self):
+        """A repeated GET with the ETag gets an empty 304"""
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        analysis = {"ticker": "TEST", "typical_peak_month": "December"}
+        with patch.object(company_routes, "find_ticker", return_value="TEST"), \
+             patch.object(company_routes, "fetch_close_prices", return_value=object()), \
+             patch.object(company_routes, "summarize_close_prices", return_value=analysis):
+            first = client.get("/company/stock_trends", params={"company_name": "Test"})
+            etag = first.headers["ETag"]
+            second = client.get(
+                "/company/stock_trends",
+                params={"company_name": "Test"},
+                headers={"If-None-Match": f'"other", W/{etag}'}
+            )
+            post = client.post(
+                "/company/stock_trends",
+                json={"company_name": "Test"},
+                headers={"If-None-Match": etag}
+            )
+        
+        assert first.status_code == 200
+        assert first.json()["analysis"] == analysis
+        assert first.headers["Cache-Control"] == "public, max-age=3600"
+        assert second.status_code == 304
+        assert second.content == b""
+        assert second.headers["ETag"] == etag
+        # Conditional requests only short-circuit GET/HEAD
+        assert post.status_code == 200
+        assert post.headers["ETag"] == etag
+    
+    def test_etag_changes_with_content(self):
+        """Different payloads get different ETags"""
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        with patch.object(company_routes, "get_monthly_events", return_value=[{"title": "A"}]):
+            first = client.get("/company/monthly_events", params={
+                "company_name": "Test", "month": "January", "year": 2020
+            })
+        with patch.object(company_routes, "get_monthly_events", return_value=[{"title": "B"}]):
+            second = client.get(
+                "/company/monthly_events",
+                params={"company_name": "Test", "month": "January", "year": 2020},
+                headers={"If-None-Match": first.headers["ETag"]}
+            )
+        
+        assert second.status_code == 200
+        assert first.headers["ETag"] != second.headers["ETag"]
+    
+    def test_monthly_events_max_age_by_month(self):
+        """Months that have ended are cached far longer than the current one"""
+        from datetime import datetime, timezone
+        from company_insight_service.api.http_cache import monthly_events_max_age
+        from company_insight_service.config.settings import settings
+        
+        now = datetime(2024, 6, 15, tzinfo=timezone.utc)
+        assert monthly_events_max_age("May", 2024, now) == settings.MONTHLY_EVENTS_PAST_MAX_AGE
+        assert monthly_events_max_age("dec", 2023, now) == settings.MONTHLY_EVENTS_PAST_MAX_AGE
+        assert monthly_events_max_age("6", 2024, now) == settings.MONTHLY_EVENTS_CURRENT_MAX_AGE
+        assert monthly_events_max_age("July", 2024, now) == settings.MONTHLY_EVENTS_CURRENT_MAX_AGE
+        assert monthly_events_max_age("Smarch", 2020, now) == settings.MONTHLY_EVENTS_CURRENT_MAX_AGE
+    
+    def test_get_requires_query_params(self):
+        """GET variants validate their query parameters"""
+        response = client.get("/company/monthly_events", params={"company_name": "Test"})
+        assert response.status_code == 422
+
+
 class TestDeepSearchCompany:
     """Test /company/deep_search endpoint (streaming)"""
     
@@ -272,6 +367,506 @@ class TestDeepSearchCompany:
         assert response.status_code in [200, 400]
 
 
+class TestDeepSearchCache:
+    """Test the stale-while-revalidate cache in front of /company/deep_search"""
+    
+    RESULT = {
+        "news": [{"title": "News 1"}],
+        "product_sentiment": [],
+        "ticker": "CACH",
+        "stock_analysis": None
+    }
+    
+    def _fake_stream(self, calls):
+        def fake_stream(company_name, run_id=None, **kwargs):
+            calls.append(company_name)
+            yield {"event": "run", "run_id": "run-cache", "resumed": False}
+            yield {"event": "update", "node": "research", "data": {
+                "news": self.RESULT["news"], "product_sentiment": []
+            }}
+            yield {"event": "update", "node": "financials", "data": {
+                "ticker": "CACH", "stock_analysis": None
+            }}
+        return fake_stream
+    
+    def test_repeat_request_served_from_cache(self):
+        """A second deep search for the same company is a fresh cache hit"""
+        import json
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        company_routes.deep_search_cache.clear()
+        calls = []
+        with patch.object(company_routes, "stream_workflow", self._fake_stream(calls)):
+            first = client.post("/company/deep_search", json={"company_name": "CacheCo"})
+            second = client.post("/company/deep_search", json={"company_name": "cacheco "})
+        
+        assert first.headers["X-Cache"] == "MISS"
+        assert second.headers["X-Cache"] == "HIT-FRESH"
+        assert "Age" in second.headers
+        assert calls == ["CacheCo"]
+        
+        cached = json.loads(second.text.strip().split("\n")[0])
+        assert cached["event"] == "cached"
+        assert cached["freshness"] == "fresh"
+        assert cached["data"] == self.RESULT
+    
+    def test_stale_hit_triggers_background_refresh(self):
+        """A stale hit is served immediately and refreshed in the background"""
+        import json
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        cache = company_routes.deep_search_cache
+        cache.clear()
+        cache.set("staleco", self.RESULT)
+        
+        with patch.object(cache, "fresh_ttl", 0), \
+             patch.object(company_routes, "_refresh_deep_search", return_value=None) as refresh:
+            response = client.post("/company/deep_search", json={"company_name": "StaleCo"})
+            for _ in range(100):
+                if not cache.is_refreshing("staleco"):
+                    break
+                time.sleep(0.01)
+        
+        assert response.headers["X-Cache"] == "HIT-STALE"
+        assert json.loads(response.text.split("\n")[0])["freshness"] == "stale"
+        refresh.assert_called_once_with("StaleCo")
+    
+    def test_resume_bypasses_cache(self):
+        """Requests with a run_id always go through the workflow"""
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        company_routes.deep_search_cache.clear()
+        company_routes.deep_search_cache.set("resumeco", self.RESULT)
+        calls = []
+        with patch.object(company_routes, "stream_workflow", self._fake_stream(calls)), \
+             patch.object(company_routes, "get_run_company", return_value=None):
+            response = client.post(
+                "/company/deep_search",
+                json={"company_name": "ResumeCo", "run_id": "run-cache"}
+            )
+        
+        assert response.headers["X-Cache"] == "MISS"
+        assert calls == ["ResumeCo"]
+
+
+class TestDeepSearchDeadline:
+    """Test deadline handling on /company/deep_search"""
+    
+    def test_invalid_deadline_header(self):
+        """A non-positive deadline header is rejected"""
+        response = client.post(
+            "/company/deep_search",
+            json={"company_name": "Tesla"},
+            headers={"X-Request-Deadline": "soon"}
+        )
+        assert response.status_code == 400
+    
+    def test_invalid_deadline_field(self):
+        """A non-positive deadline field fails validation"""
+        response = client.post(
+            "/company/deep_search",
+            json={"company_name": "Tesla", "deadline_seconds": 0}
+        )
+        assert response.status_code == 422
+    
+    def test_tightest_deadline_is_passed_to_workflow(self):
+        """The smaller of the header and body deadlines bounds the run"""
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        seen = {}
+        
+        def fake_stream(company_name, run_id=None, deadline=None, **kwargs):
+            seen["remaining"] = deadline.remaining()
+            yield {"event": "run", "run_id": "run-deadline", "resumed": False}
+            yield {"event": "update", "node": "financials", "data": {
+                "ticker": None, "stock_analysis": None,
+                "timed_out": {"ticker": True, "stock_analysis": True}
+            }}
+        
+        company_routes.deep_search_cache.clear()
+        with patch.object(company_routes, "stream_workflow", fake_stream):
+            response = client.post(
+                "/company/deep_search",
+                json={"company_name": "DeadlineCo", "deadline_seconds": 30},
+                headers={"X-Request-Deadline": "5"}
+            )
+        
+        import json
+        complete = json.loads(response.text.strip().split("\n")[-1])
+        assert seen["remaining"] <= 5
+        assert complete["timed_out"] == ["ticker", "stock_analysis"]
+        assert company_routes.deep_search_cache.get("deadlineco").status == "miss"
+
+
+class TestDeepSearchJobs:
+    """Test background deep search jobs"""
+    
+    @pytest.fixture(autouse=True)
+    def single_worker(self):
+        from unittest.mock import patch
+        from company_insight_service.config.settings import settings
+        
+        with patch.object(settings, "API_WORKERS", 1):
+            yield
+    
+    @staticmethod
+    def fake_stream(company_name, run_id=None, deadline=None, **kwargs):
+        yield {"event": "run", "run_id": run_id, "resumed": False}
+        yield {"event": "update", "node": "research", "data": {
+            "news": [{"title": "News"}], "product_sentiment": [], "timed_out": {}
+        }}
+    
+    def test_job_lifecycle(self):
+        """A job is accepted immediately, then its result can be polled and streamed"""
+        import json
+        from unittest.mock import patch
+        from company_insight_service.core import jobs
+        
+        with patch.object(jobs, "stream_workflow", self.fake_stream):
+            response = client.post("/company/deep_search/jobs", json={"company_name": "JobCo"})
+            assert response.status_code == 202
+            job_id = response.json()["job_id"]
+            
+            stream = client.get(f"/company/deep_search/jobs/{job_id}/stream")
+        
+        events = [json.loads(line) for line in stream.text.strip().split("\n")]
+        assert [e["event"] for e in events] == ["run", "update", "complete"]
+        assert events[0]["run_id"] == job_id
+        assert events[-1]["job"]["status"] == "succeeded"
+        
+        status = client.get(f"/company/deep_search/jobs/{job_id}").json()
+        assert status["status"] == "succeeded"
+        assert status["result"]["news"] == [{"title": "News"}]
+    
+    def test_unknown_job(self):
+        """Unknown job IDs return 404"""
+        assert client.get("/company/deep_search/jobs/missing").status_code == 404
+        assert client.get("/company/deep_search/jobs/missing/stream").status_code == 404
+    
+    def test_queue_full(self):
+        """Jobs are rejected with 429 when the runner is saturated"""
+        from unittest.mock import patch
+        from company_insight_service.core import jobs
+        
+        with patch.object(jobs.job_runner, "submit", side_effect=jobs.JobQueueFull("full")):
+            response = client.post("/company/deep_search/jobs", json={"company_name": "JobCo"})
+        
+        assert response.status_code == 429
+        assert response.headers["Retry-After"]
+    
+    def test_refused_with_process_local_store_on_many_workers(self):
+        """Jobs in a process-local store would be invisible to the other API workers"""
+        from unittest.mock import patch
+        from company_insight_service.config.settings import settings
+        from company_insight_service.core import jobs
+        
+        with patch.object(settings, "API_WORKERS", 4), \
+             patch.object(jobs.job_runner, "submit") as submit:
+            response = client.post("/company/deep_search/jobs", json={"company_name": "JobCo"})
+        
+        assert response.status_code == 503
+        assert "API_WORKERS=1" in response.json()["detail"]
+        submit.assert_not_called()
+    
+    def test_default_deadline(self):
+        """Jobs get the default deadline unless the client asks for more, up to the maximum"""
+        from unittest.mock import patch
+        from company_insight_service.config.settings import settings
+        from company_insight_service.core import jobs
+        
+        requested = {}
+        
+        def submit(company_name, deadline_seconds=None):
+            requested[company_name] = deadline_seconds
+            return {"job_id": company_name, "status": "queued"}
+        
+        with patch.object(jobs.job_runner, "submit", side_effect=submit):
+            client.post("/company/deep_search/jobs", json={"company_name": "Default"})
+            client.post("/company/deep_search/jobs", json={"company_name": "Longer", "deadline_seconds": 300})
+            client.post("/company/deep_search/jobs", json={"company_name": "Capped", "deadline_seconds": 1e6})
+        
+        assert requested == {
+            "Default": settings.DEEP_SEARCH_DEADLINE_SECONDS,
+            "Longer": 300,
+            "Capped": settings.DEEP_SEARCH_MAX_DEADLINE_SECONDS
+        }
+
+
+class TestStoredInsights:
+    """Test the stored insights read API"""
+    
+    class SessionAdapter:
+        """Awaitable execute() over a sync session (the async engine's interface)"""
+        
+        def __init__(self, session):
+            self.session = session
+        
+        async def execute(self, stmt):
+            return self.session.execute(stmt)
+    
+    @pytest.fixture
+    def stored(self):
+        from datetime import datetime, timedelta
+        from sqlalchemy import create_engine
+        from sqlalchemy.orm import sessionmaker
+        from sqlalchemy.pool import StaticPool
+        from company_insight_service.api.routes import insights
+        from company_insight_service.database.models import Base, Company, ProductSentiment, StockAnalysis
+        
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        session = sessionmaker(bind=engine)()
+        company = Company(name="StoredCo")
+        session.add_all([company, Company(name="EmptyCo")])
+        session.flush()
+        
+        base = datetime(2024, 5, 1, 12, 0, 0)
+        # Two sentiments share a timestamp to exercise the id tie-breaker
+        session.add_all([
+            ProductSentiment(
+                company_id=company.id, product_name=f"P{i}", sentiment_score=i / 10,
+                summary="long text", source_url=f"https://example.com/{i}",
+                created_at=base + timedelta(hours=min(i, 4))
+            )
+            for i in range(6)
+        ])
+        session.add_all([
+            StockAnalysis(
+                company_id=company.id, ticker="STC", analysis_text=f"Trend {i}",
+                analysis_date=(base - timedelta(days=1 - i)).date(),
+                created_at=base + timedelta(hours=i, minutes=30)
+            )
+            for i in range(2)
+        ])
+        session.commit()
+        
+        app.dependency_overrides[insights.get_session] = lambda: self.SessionAdapter(session)
+        yield session
+        app.dependency_overrides.pop(insights.get_session, None)
+        session.close()
+        engine.dispose()
+    
+    def _all_pages(self, url, **params):
+        pages = []
+        cursor = None
+        while True:
+            query = dict(params, **({"cursor": cursor} if cursor else {}))
+            response = client.get(url, params=query)
+            assert response.status_code == 200
+            pages.append(response.json()["items"])
+            cursor = response.json()["next_cursor"]
+            if cursor is None:
+                return pages
+    
+    def test_sentiments_paginate_newest_first(self, stored):
+        """Keyset pages cover every row once, newest first, ties broken by id"""
+        pages = self._all_pages("/insights/StoredCo/sentiments", limit=2, fields="product_name")
+        
+        assert [len(page) for page in pages] == [2, 2, 2]
+        names = [item["product_name"] for page in pages for item in page]
+        assert names == ["P5", "P4", "P3", "P2", "P1", "P0"]
+        assert set(pages[0][0]) == {"product_name"}
+    
+    def test_stock_analyses_projection(self, stored):
+        """Only the requested fields are returned"""
+        response = client.get("/insights/StoredCo/stock_analyses", params={"fields": "ticker,analysis_text"})
+        
+        assert response.status_code == 200
+        assert response.json()["items"] == [
+            {"ticker": "STC", "analysis_text": "Trend 1"},
+            {"ticker": "STC", "analysis_text": "Trend 0"},
+        ]
+        assert response.json()["next_cursor"] is None
+    
+    def test_history_merges_both_tables(self, stored):
+        """History interleaves sentiments and analyses by time across pages"""
+        pages = self._all_pages("/insights/StoredCo/history", limit=3)
+        items = [item for page in pages for item in page]
+        
+        assert len(items) == 8
+        assert [item.get("product_name") or item.get("analysis_text") for item in items] == [
+            "P5", "P4", "P3", "P2", "Trend 1", "P1", "Trend 0", "P0"
+        ]
+        stamps = [item["created_at"] for item in items]
+        assert stamps == sorted(stamps, reverse=True)
+    
+    def test_unknown_company_and_bad_input(self, stored):
+        """Unknown companies 404; known ones without data return an empty page"""
+        assert client.get("/insights/NoSuchCo/sentiments").status_code == 404
+        empty = client.get("/insights/EmptyCo/history")
+        assert empty.status_code == 200 and empty.json()["items"] == []
+        assert client.get("/insights/StoredCo/sentiments", params={"fields": "secret"}).status_code == 400
+        assert client.get("/insights/StoredCo/sentiments", params={"cursor": "garbage"}).status_code == 400
+    
+    def test_sentiment_trend_from_rollups(self, stored):
+        """Trends come from the rollup rows in the requested window, oldest first"""
+        from datetime import datetime, timedelta
+        from company_insight_service.database.models import Company, SentimentDailyRollup
+        
+        company_id = stored.query(Company.id).filter_by(name="StoredCo").scalar()
+        today = datetime.utcnow().date()
+        stored.add_all([
+            SentimentDailyRollup(
+                company_id=company_id, day=today - timedelta(days=age), sample_count=count,
+                score_sum=total, positive_count=count, negative_count=0, neutral_count=0,
+                min_score=0.1, max_score=0.9
+            )
+            for age, count, total in [(0, 2, 1.0), (3, 4, 1.0), (60, 10, 5.0)]
+        ])
+        stored.commit()
+        
+        response = client.get("/insights/StoredCo/sentiment_trend", params={"days": 7})
+        
+        assert response.status_code == 200
+        body = response.json()
+        assert [day["day"] for day in body["days"]] == [
+            (today - timedelta(days=3)).isoformat(), today.isoformat()
+        ]
+        assert [day["average_score"] for day in body["days"]] == [0.25, 0.5]
+        assert body["summary"]["count"] == 6
+        assert body["summary"]["average_score"] == round(2.0 / 6, 4)
+        assert client.get("/insights/EmptyCo/sentiment_trend").json()["days"] == []
+        assert client.get("/insights/NoSuchCo/sentiment_trend").status_code == 404
+    
+    def test_screen_latest_analyses(self, stored):
+        """Screens filter on the promoted fields and only consider each ticker's latest analysis"""
+        from datetime import date, datetime
+        from company_insight_service.database.models import Company, StockAnalysis
+        
+        companies = {name: Company(name=name) for name in ("Alpha", "Beta", "Gamma")}
+        stored.add_all(companies.values())
+        stored.flush()
+        analyses = [
+            ("Alpha", date(2024, 1, 1), 50.0, "September"),  # Superseded by the next one
+            ("Alpha", date(2024, 2, 1), 10.0, "September"),
+            ("Beta", date(2024, 2, 1), 35.0, "September"),
+            ("Gamma", date(2024, 2, 2), 40.0, "March"),
+        ]
+        stored.add_all([
+            StockAnalysis(
+                company_id=companies[name].id, ticker=name.upper(), analysis_date=day,
+                overall_change_percent=change, typical_dip_month=dip, latest_price=100.0,
+                created_at=datetime.combine(day, datetime.min.time())
+            )
+            for name, day, change, dip in analyses
+        ])
+        stored.commit()
+        
+        response = client.get("/insights/screen", params={"min_change": 20, "dip_month": "september"})
+        
+        assert response.status_code == 200
+        assert [(item["company_name"], item["overall_change_percent"]) for item in response.json()["items"]] == [
+            ("Beta", 35.0)
+        ]
+        response = client.get("/insights/screen", params={"min_change": 20})
+        names = [item["company_name"] for item in response.json()["items"]]
+        assert names == ["Gamma", "Beta"]
+        assert client.get("/insights/screen", params={"dip_month": "Smarch"}).status_code == 400
+
+
+class TestStreamEncoding:
+    """Test fast serialization, compressed streaming and the SSE variant"""
+    
+    @staticmethod
+    async def collect(chunks):
+        return [chunk async for chunk in chunks]
+    
+    @staticmethod
+    async def aiter(items):
+        for item in items:
+            yield item
+    
+    def test_negotiate_encoding(self):
+        """Highest q-value wins; zstd is preferred on ties; q=0 disables a coding"""
+        from company_insight_service.api.streaming import negotiate_encoding
+        
+        assert negotiate_encoding(None) is None
+        assert negotiate_encoding("identity") is None
+        assert negotiate_encoding("gzip, deflate") == "gzip"
+        assert negotiate_encoding("gzip, zstd") == "zstd"
+        assert negotiate_encoding("zstd;q=0.5, gzip") == "gzip"
+        assert negotiate_encoding("zstd;q=0, *") == "gzip"
+    
+    @pytest.mark.parametrize("encoding", ["gzip", "zstd"])
+    def test_every_event_is_flushed(self, encoding):
+        """Each compressed chunk decodes to the complete event on its own"""
+        import zlib
+        import zstandard
+        from company_insight_service.api.streaming import encode_events
+        
+        events = [{"event": "update", "n": i, "summary": "text " * 50} for i in range(3)]
+        chunks = asyncio.run(self.collect(encode_events(self.aiter(events), encoding=encoding)))
+        
+        if encoding == "gzip":
+            decoder = zlib.decompressobj(16 + zlib.MAX_WBITS)
+        else:
+            decoder = zstandard.ZstdDecompressor().decompressobj()
+        
+        assert len(chunks) == len(events) + 1  # One per event plus the trailer
+        for i, chunk in enumerate(chunks[:-1]):
+            line = decoder.decompress(chunk)
+            assert json.loads(line) == events[i]
+            assert line.endswith(b"\n")
+    
+    def test_serializer_handles_numpy_and_dates(self):
+        """The fast serializer copes with pandas/numpy scalars and datetimes"""
+        import numpy as np
+        from datetime import datetime
+        from company_insight_service.api.serialization import dumps
+        
+        data = json.loads(dumps({"a": np.float64(1.5), "b": np.int64(2), "c": datetime(2024, 1, 1)}))
+        assert data == {"a": 1.5, "b": 2, "c": "2024-01-01T00:00:00"}
+    
+    def test_sse_variant(self):
+        """The GET events endpoint streams Server-Sent Events"""
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        def fake_stream(company_name, run_id=None, deadline=None, **kwargs):
+            yield {"event": "run", "run_id": "run-sse", "resumed": False}
+            yield {"event": "update", "node": "research", "data": {"news": []}}
+        
+        company_routes.deep_search_cache.clear()
+        with patch.object(company_routes, "stream_workflow", fake_stream):
+            response = client.get(
+                "/company/deep_search/events",
+                params={"company_name": "SseCo"},
+                headers={"Accept-Encoding": "gzip"}
+            )
+        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert response.headers["content-encoding"] == "gzip"
+        messages = response.text.strip().split("\n\n")
+        assert [m.split("\n")[0] for m in messages] == [
+            "event: run", "event: update", "event: complete"
+        ]
+        assert json.loads(messages[0].split("\n")[1][len("data: "):])["run_id"] == "run-sse"
+    
+    def test_post_negotiates_sse(self):
+        """POST /company/deep_search honors Accept: text/event-stream"""
+        from unittest.mock import patch
+        from company_insight_service.api.routes import company as company_routes
+        
+        def fake_stream(company_name, run_id=None, deadline=None, **kwargs):
+            yield {"event": "run", "run_id": "run-sse2", "resumed": False}
+        
+        company_routes.deep_search_cache.clear()
+        with patch.object(company_routes, "stream_workflow", fake_stream):
+            response = client.post(
+                "/company/deep_search",
+                json={"company_name": "SseCo2"},
+                headers={"Accept": "text/event-stream", "Accept-Encoding": "identity"}
+            )
+        
+        assert response.headers["content-type"].startswith("text/event-stream")
+        assert "content-encoding" not in response.headers
+        assert response.text.startswith("event: run\ndata: ")
+
+
 class TestInputValidation:
     """Test input validation across all endpoints"""
     
@@ -316,7 +911,7 @@ class TestErrorHandling:
     
     def test_method_not_allowed(self):
         """Test wrong HTTP method"""
-        response = client.get("/company/monthly_events")
+        response = client.put("/company/monthly_events")
         assert response.status_code == 405
     
     def test_not_found_endpoint(self):
@@ -352,6 +947,152 @@ class TestConcurrency:
             assert all(r.status_code in [200, 400, 422] for r in responses)
 
 
+class TestBlockingRoutesOffloaded:
+    """Load test: blocking service calls must not serialize requests on one worker"""
+    
+    @pytest.mark.asyncio
+    async def test_concurrent_monthly_events_overlap(self):
+        """Concurrent requests with slow service calls run in parallel"""
+        from unittest.mock import patch
+        from httpx import ASGITransport
+        from company_insight_service.api.routes import company as company_routes
+        
+        def slow_events(company_name, month, year):
+            time.sleep(0.5)
+            return [{"title": f"{company_name} event"}]
+        
+        with patch.object(company_routes, "get_monthly_events", slow_events):
+            transport = ASGITransport(app=app)
+            async with AsyncClient(transport=transport, base_url="http://test") as ac:
+                started = time.perf_counter()
+                responses = await asyncio.gather(*[
+                    ac.post("/company/monthly_events", json={
+                        "company_name": f"Company {i}",
+                        "month": "January",
+                        "year": 2024
+                    })
+                    for i in range(8)
+                ])
+                elapsed = time.perf_counter() - started
+        
+        assert all(r.status_code == 200 for r in responses)
+        # Serialized this would take 8 x 0.5s
+        assert elapsed < 2.0
+    
+    @pytest.mark.asyncio
+    async def test_stock_trends_uses_both_pools(self):
+        """Stock trends downloads on the network pool and analyzes on the CPU pool"""
+        from unittest.mock import patch
+        from httpx import ASGITransport
+        import pandas as pd
+        from company_insight_service.api.routes import company as company_routes
+        from company_insight_service.monitoring.metrics import EXECUTOR_RUN_SECONDS
+        
+        closes = pd.Series(
+            [100.0, 110.0, 120.0],
+            index=pd.to_datetime(["2023-01-15", "2023-06-15", "2023-12-15"])
+        )
+        cpu_runs = EXECUTOR_RUN_SECONDS.labels(pool="cpu")
+        before = cpu_runs._sum.get()
+        
+        with patch.object(company_routes, "find_ticker", return_value="TEST"), \
+             patch.object(company_routes, "fetch_close_prices", return_value=closes):
+            async with AsyncClient(transport=ASGITransport(app=app), base_url="http://test") as ac:
+                response = await ac.post("/company/stock_trends", json={"company_name": "Test"})
+        
+        assert response.status_code == 200
+        assert response.json()["analysis"]["typical_peak_month"] == "December"
+        assert cpu_runs._sum.get() > before
+
+
+class TestAdmissionControl:
+    """Test per-route concurrency limits and the bounded wait queue"""
+    
+    @staticmethod
+    def limited_app(max_concurrent, max_queued, queue_timeout, work_seconds):
+        from fastapi import FastAPI
+        from company_insight_service.api.admission import (
+            AdmissionControlMiddleware, ConcurrencyLimiter
+        )
+        
+        limiter = ConcurrencyLimiter("slow", max_concurrent, max_queued, queue_timeout)
+        test_app = FastAPI()
+        test_app.add_middleware(
+            AdmissionControlMiddleware, limiters={"/slow": limiter}, retry_after=7
+        )
+        
+        @test_app.get("/slow")
+        async def slow():
+            await asyncio.sleep(work_seconds)
+            return {"ok": True}
+        
+        @test_app.get("/fast")
+        async def fast():
+            return {"ok": True}
+        
+        return test_app, limiter
+    
+    @pytest.mark.asyncio
+    async def test_rejects_when_saturated(self):
+        """Over-limit requests get a fast 429 with Retry-After"""
+        from httpx import ASGITransport
+        
+        test_app, limiter = self.limited_app(1, 1, queue_timeout=0.2, work_seconds=0.6)
+        async with AsyncClient(transport=ASGITransport(app=test_app), base_url="http://test") as ac:
+            started = time.perf_counter()
+            responses = await asyncio.gather(*[ac.get("/slow") for _ in range(3)])
+            unlimited = await ac.get("/fast")
+        
+        statuses = sorted(r.status_code for r in responses)
+        rejected = [r for r in responses if r.status_code == 429]
+        assert statuses == [200, 429, 429]
+        assert {r.json()["reason"] for r in rejected} == {"queue_full", "queue_timeout"}
+        assert all(r.headers["Retry-After"] == "7" for r in rejected)
+        assert time.perf_counter() - started < 1.0
+        assert unlimited.status_code == 200
+        assert limiter.in_flight == 0 and limiter.queued == 0
+    
+    @pytest.mark.asyncio
+    async def test_queued_requests_are_served(self):
+        """Waiters get the slot when it frees up within the timeout"""
+        from httpx import ASGITransport
+        from company_insight_service.monitoring.metrics import ADMISSION_IN_FLIGHT
+        
+        test_app, limiter = self.limited_app(1, 2, queue_timeout=2.0, work_seconds=0.1)
+        async with AsyncClient(transport=ASGITransport(app=test_app), base_url="http://test") as ac:
+            responses = await asyncio.gather(*[ac.get("/slow") for _ in range(3)])
+        
+        assert [r.status_code for r in responses] == [200, 200, 200]
+        assert ADMISSION_IN_FLIGHT.labels(route="slow")._value.get() == 0
+    
+    def test_expensive_routes_are_limited(self):
+        """deep_search, stock_trends and monthly_events get limiters"""
+        from company_insight_service.api.admission import default_limiters
+        
+        limiters = default_limiters()
+        assert set(limiters) == {
+            "/company/deep_search", "/company/deep_search/events",
+            "/company/stock_trends", "/company/monthly_events"
+        }
+        assert limiters["/company/deep_search/events"] is limiters["/company/deep_search"]
+    
+    def test_deep_search_events_share_the_limit(self):
+        """The SSE deep search is rejected with a 429 when the deep_search limiter is saturated"""
+        from unittest.mock import patch
+        from company_insight_service.api.app import create_app
+        from company_insight_service.config.settings import settings
+        
+        with patch.object(settings, "DEEP_SEARCH_MAX_CONCURRENT", 0), \
+             patch.object(settings, "DEEP_SEARCH_MAX_QUEUED", 0):
+            response = TestClient(create_app()).get(
+                "/company/deep_search/events", params={"company_name": "Acme"}
+            )
+        
+        assert response.status_code == 429
+        assert response.json()["reason"] == "queue_full"
+        assert "Retry-After" in response.headers
+
+
 class TestEdgeCases:
     """Test edge cases and boundary conditions"""
     
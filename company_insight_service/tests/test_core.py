@@ -0,0 +1,543 @@
+"""
+Core utility tests
+Tests caching and other shared building blocks
+"""
+import threading
+import time
+
+import pytest
+
+from company_insight_service.core.cache import (
+    StaleWhileRevalidateCache, FRESH, STALE, MISS
+)
+
+
+class FakeClock:
+    """Manually advanced clock"""
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+class TestStaleWhileRevalidateCache:
+    """Test the stale-while-revalidate result cache"""
+
+    @pytest.fixture
+    def clock(self):
+        return FakeClock()
+
+    @pytest.fixture
+    def cache(self, clock):
+        return StaleWhileRevalidateCache(fresh_ttl=60, stale_ttl=300, clock=clock)
+
+    def test_fresh_stale_and_expired(self, cache, clock):
+        """Entries move from fresh to stale to miss as they age"""
+        assert cache.get("tesla").status == MISS
+
+        cache.set("tesla", {"ticker": "TSLA"})
+        clock.now += 10
+        lookup = cache.get("tesla")
+        assert lookup.status == FRESH
+        assert lookup.value == {"ticker": "TSLA"}
+        assert lookup.age == 10
+
+        clock.now += 100
+        assert cache.get("tesla").status == STALE
+
+        clock.now += 300
+        assert cache.get("tesla").status == MISS
+
+    def test_lru_eviction(self, clock):
+        """The least recently used entry is evicted when full"""
+        cache = StaleWhileRevalidateCache(60, 300, max_entries=2, clock=clock)
+        cache.set("a", 1)
+        cache.set("b", 2)
+        cache.get("a")
+        cache.set("c", 3)
+
+        assert cache.get("b").status == MISS
+        assert cache.get("a").value == 1
+        assert cache.get("c").value == 3
+
+    def test_refresh_is_deduplicated(self, cache):
+        """Concurrent refreshes of the same key run the computation once"""
+        release = threading.Event()
+        calls = []
+
+        def compute():
+            calls.append(1)
+            release.wait(2)
+            return "new"
+
+        assert cache.refresh("tesla", compute) is True
+        assert cache.refresh("tesla", compute) is False
+        assert cache.is_refreshing("tesla")
+
+        release.set()
+        for _ in range(100):
+            if not cache.is_refreshing("tesla"):
+                break
+            time.sleep(0.01)
+
+        assert len(calls) == 1
+        assert cache.get("tesla").value == "new"
+
+    def test_refresh_returning_none_keeps_entry(self, cache):
+        """A refresh that yields nothing leaves the old value in place"""
+        cache.set("tesla", "old")
+        cache.refresh("tesla", lambda: None)
+        for _ in range(100):
+            if not cache.is_refreshing("tesla"):
+                break
+            time.sleep(0.01)
+
+        assert cache.get("tesla").value == "old"
+
+    def test_lookups_are_counted(self, clock):
+        """Lookups are counted per cache name and result"""
+        from company_insight_service.monitoring.metrics import CACHE_LOOKUPS
+
+        cache = StaleWhileRevalidateCache(fresh_ttl=10, stale_ttl=60, clock=clock, name="counted")
+        hits = CACHE_LOOKUPS.labels(cache="counted", result=FRESH)
+        misses = CACHE_LOOKUPS.labels(cache="counted", result=MISS)
+
+        cache.get("k")
+        cache.set("k", 1)
+        cache.get("k")
+        cache.get("k")
+
+        assert misses._value.get() == 1
+        assert hits._value.get() == 2
+
+
+class TestTimingSpans:
+    """Test latency spans and their collection"""
+
+    def test_span_is_collected_and_observed(self):
+        """Finished spans land in the collector and the histogram"""
+        from company_insight_service.monitoring.metrics import SERVICE_CALL_SECONDS
+        from company_insight_service.monitoring.timing import span, collect_timings
+
+        histogram = SERVICE_CALL_SECONDS.labels(service="testsvc", operation="op")
+        before = histogram._sum.get()
+
+        with collect_timings() as spans:
+            with span("testsvc", "op"):
+                time.sleep(0.01)
+
+        assert len(spans) == 1
+        assert spans[0]["service"] == "testsvc"
+        assert spans[0]["ms"] >= 10
+        assert histogram._sum.get() > before
+
+    def test_failed_service_calls_are_counted(self):
+        """Errors inside a service span increment the error counter"""
+        from company_insight_service.monitoring.metrics import SERVICE_CALL_ERRORS
+        from company_insight_service.monitoring.timing import span
+
+        errors = SERVICE_CALL_ERRORS.labels(service="testsvc", operation="failing")
+        before = errors._value.get()
+
+        with span("testsvc", "failing") as call:
+            call.error = True
+        with pytest.raises(RuntimeError):
+            with span("testsvc", "failing"):
+                raise RuntimeError("boom")
+        with span("testsvc", "failing"):
+            pass
+
+        assert errors._value.get() == before + 2
+
+    def test_multiprocess_exposition(self, tmp_path):
+        """With PROMETHEUS_MULTIPROC_DIR set, samples from every process are aggregated"""
+        import os
+        import subprocess
+        import sys
+
+        script = (
+            "import sys\n"
+            "from company_insight_service.monitoring.metrics import HTTP_REQUESTS_IN_FLIGHT, render_metrics\n"
+            "HTTP_REQUESTS_IN_FLIGHT.labels(method='GET', route='/x').inc()\n"
+            "if sys.argv[1] == 'render':\n"
+            "    print(render_metrics()[0].decode())\n"
+        )
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        subprocess.run([sys.executable, "-c", script, "write"], env=env, cwd=root, check=True)
+        result = subprocess.run(
+            [sys.executable, "-c", script, "render"],
+            env=env, cwd=root, check=True, capture_output=True, text=True
+        )
+
+        # livesum only counts live processes; the writer has exited
+        assert 'http_requests_in_flight{method="GET",route="/x"}' in result.stdout
+        assert len(list(tmp_path.glob("gauge_livesum_*.db"))) == 2
+
+    def test_worker_exporter_aggregates_processes(self, tmp_path):
+        """One worker exporter serves the samples of every worker sharing the directory"""
+        import os
+        import socket
+        import subprocess
+        import sys
+
+        with socket.socket() as sock:
+            sock.bind(("127.0.0.1", 0))
+            port = sock.getsockname()[1]
+
+        script = (
+            "import sys, urllib.request\n"
+            "from company_insight_service.monitoring.metrics import WORKER_MESSAGE_SECONDS, start_metrics_server\n"
+            "WORKER_MESSAGE_SECONDS.labels(outcome='ack').observe(0.5)\n"
+            "if sys.argv[1] == 'serve':\n"
+            f"    assert start_metrics_server({port})\n"
+            f"    print(urllib.request.urlopen('http://127.0.0.1:{port}/metrics').read().decode())\n"
+        )
+        env = {**os.environ, "PROMETHEUS_MULTIPROC_DIR": str(tmp_path)}
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+        subprocess.run([sys.executable, "-c", script, "write"], env=env, cwd=root, check=True)
+        result = subprocess.run(
+            [sys.executable, "-c", script, "serve"],
+            env=env, cwd=root, check=True, capture_output=True, text=True
+        )
+
+        assert 'worker_message_processing_seconds_count{outcome="ack"} 2.0' in result.stdout
+
+    def test_span_marks_errors(self):
+        """Exceptions inside a span flag it as an error"""
+        from company_insight_service.monitoring.timing import span, collect_timings
+
+        with collect_timings() as spans:
+            with pytest.raises(RuntimeError):
+                with span("testsvc", "fail"):
+                    raise RuntimeError("boom")
+
+        assert spans[0]["error"] is True
+
+    def test_spans_from_copied_context_threads(self):
+        """Spans recorded in worker threads with a copied context are collected"""
+        import contextvars
+        from concurrent.futures import ThreadPoolExecutor
+        from company_insight_service.monitoring.timing import span, collect_timings
+
+        def work():
+            with span("testsvc", "threaded"):
+                pass
+
+        with collect_timings() as spans:
+            with ThreadPoolExecutor(max_workers=2) as executor:
+                futures = [executor.submit(contextvars.copy_context().run, work) for _ in range(3)]
+                for f in futures:
+                    f.result()
+
+        assert len(spans) == 3
+
+    def test_textblob_sentiment_is_timed(self):
+        """analyze_sentiment records a textblob span; building a Gemini config does not"""
+        from company_insight_service.monitoring.timing import collect_timings
+        from company_insight_service.services.sentiment import analyze_sentiment, gemini_request_config
+
+        with collect_timings() as spans:
+            score, label = analyze_sentiment("A great, wonderful product")
+            gemini_request_config()
+
+        assert label == "Positive"
+        assert [(s["service"], s["operation"]) for s in spans] == [("textblob", "sentiment")]
+
+    def test_summarize_timings(self):
+        """Spans are grouped per service with the node time split out"""
+        from company_insight_service.monitoring.timing import summarize_timings
+
+        summary = summarize_timings([
+            {"service": "duckduckgo", "operation": "search", "ms": 100.0},
+            {"service": "duckduckgo", "operation": "search", "ms": 50.5},
+            {"service": "scrape", "operation": "fetch", "ms": 20.0},
+            {"service": "node", "operation": "research", "ms": 180.0},
+        ])
+
+        assert summary["node_ms"] == 180.0
+        assert summary["by_service"]["duckduckgo"] == {"count": 2, "ms": 150.5}
+        assert len(summary["spans"]) == 3
+
+
+class TestExecutors:
+    """Test instrumented executor pools"""
+
+    def test_run_records_queue_wait_and_runtime(self):
+        """Tasks report how long they queued and ran"""
+        import asyncio
+        from company_insight_service.core.executors import InstrumentedExecutor
+        from company_insight_service.monitoring.metrics import (
+            EXECUTOR_QUEUE_WAIT_SECONDS, EXECUTOR_RUN_SECONDS
+        )
+
+        pool = InstrumentedExecutor("testpool", max_workers=1)
+
+        async def main():
+            # Two tasks on one worker: the second must wait for the first
+            return await asyncio.gather(
+                pool.run(time.sleep, 0.1),
+                pool.run(lambda: "done")
+            )
+
+        try:
+            results = asyncio.run(main())
+        finally:
+            pool.shutdown()
+
+        assert results[1] == "done"
+        assert EXECUTOR_RUN_SECONDS.labels(pool="testpool")._sum.get() >= 0.1
+        assert EXECUTOR_QUEUE_WAIT_SECONDS.labels(pool="testpool")._sum.get() >= 0.09
+
+    def test_run_copies_context(self):
+        """Context variables (e.g. deadlines) follow the task into the pool"""
+        import asyncio
+        from company_insight_service.core.executors import InstrumentedExecutor
+        from company_insight_service.services.deadline import (
+            Deadline, deadline_scope, current_deadline
+        )
+
+        pool = InstrumentedExecutor("ctxpool", max_workers=1)
+        deadline = Deadline.after(10)
+
+        async def main():
+            with deadline_scope(deadline):
+                return await pool.run(current_deadline)
+
+        try:
+            assert asyncio.run(main()) is deadline
+        finally:
+            pool.shutdown()
+
+    def test_deep_search_steps_do_not_starve_network_pool(self):
+        """Long deep search steps run on their own pool, leaving the network pool free"""
+        import asyncio
+        from unittest.mock import patch
+        from company_insight_service.core import executors
+
+        network = executors.InstrumentedExecutor("testnetwork", max_workers=1)
+        deep_search = executors.InstrumentedExecutor("testdeepsearch", max_workers=1)
+        release = threading.Event()
+
+        async def main():
+            step = asyncio.ensure_future(executors.run_deep_search(release.wait, 5))
+            quick = await asyncio.wait_for(executors.run_network(lambda: "quick"), timeout=1)
+            release.set()
+            return quick, await step
+
+        try:
+            with patch.object(executors, "network_pool", network), \
+                 patch.object(executors, "deep_search_pool", deep_search):
+                assert asyncio.run(main()) == ("quick", True)
+        finally:
+            release.set()
+            network.shutdown()
+            deep_search.shutdown()
+
+
+class TestJobs:
+    """Test background job execution and the in-memory job store"""
+
+    @staticmethod
+    def wait_for(predicate, timeout=2.0):
+        deadline = time.monotonic() + timeout
+        while not predicate():
+            if time.monotonic() > deadline:
+                raise AssertionError("condition not met in time")
+            time.sleep(0.01)
+
+    def test_job_records_events_and_partial_state(self):
+        """Events and folded state are visible while the job is still running"""
+        from unittest.mock import patch
+        from company_insight_service.core.jobs import (
+            InMemoryJobStore, JobRunner, job_summary, RUNNING, SUCCEEDED
+        )
+
+        release = threading.Event()
+
+        def fake_stream(company_name, run_id=None, deadline=None):
+            yield {"event": "run", "run_id": run_id, "resumed": False}
+            yield {"event": "update", "node": "research", "data": {
+                "news": ["n1"], "timed_out": {"news": False}
+            }}
+            release.wait(2)
+            yield {"event": "update", "node": "financials", "data": {
+                "ticker": "TEST", "timed_out": {"ticker": True}
+            }}
+
+        store = InMemoryJobStore()
+        runner = JobRunner(store, max_workers=1, max_pending=4)
+        try:
+            with patch("company_insight_service.core.jobs.stream_workflow", fake_stream):
+                job = runner.submit("Test Company")
+                job_id = job["job_id"]
+
+                self.wait_for(lambda: store.get(job_id)["event_count"] == 2)
+                partial = job_summary(store.get(job_id))
+                assert partial["status"] == RUNNING
+                assert partial["result"]["news"] == ["n1"]
+                assert partial["result"]["ticker"] is None
+
+                release.set()
+                self.wait_for(lambda: store.get(job_id)["status"] == SUCCEEDED)
+        finally:
+            runner.shutdown()
+
+        final = job_summary(store.get(job_id))
+        assert final["result"]["ticker"] == "TEST"
+        assert final["timed_out"] == ["ticker"]
+        assert store.events_since(job_id, 0)[0]["run_id"] == job_id
+        assert len(store.events_since(job_id, 2)) == 1
+
+    def test_failed_job(self):
+        """Exceptions end the job as failed with an error event"""
+        from unittest.mock import patch
+        from company_insight_service.core.jobs import InMemoryJobStore, JobRunner, FAILED
+
+        def failing_stream(company_name, run_id=None, deadline=None):
+            yield {"event": "run", "run_id": run_id, "resumed": False}
+            raise RuntimeError("broker down")
+
+        store = InMemoryJobStore()
+        runner = JobRunner(store, max_workers=1, max_pending=4)
+        try:
+            with patch("company_insight_service.core.jobs.stream_workflow", failing_stream):
+                job_id = runner.submit("Test Company")["job_id"]
+                self.wait_for(lambda: store.get(job_id)["status"] == FAILED)
+        finally:
+            runner.shutdown()
+
+        assert store.get(job_id)["error"] == "broker down"
+        assert store.events_since(job_id, 0)[-1] == {"event": "error", "message": "broker down"}
+        assert runner.pending == 0
+
+    def test_submit_rejects_when_full(self):
+        """Only max_pending jobs may be queued or running at once"""
+        from unittest.mock import patch
+        from company_insight_service.core.jobs import InMemoryJobStore, JobRunner, JobQueueFull
+
+        release = threading.Event()
+
+        def blocking_stream(company_name, run_id=None, deadline=None):
+            release.wait(2)
+            yield {"event": "run", "run_id": run_id, "resumed": False}
+
+        runner = JobRunner(InMemoryJobStore(), max_workers=1, max_pending=2)
+        try:
+            with patch("company_insight_service.core.jobs.stream_workflow", blocking_stream):
+                runner.submit("A")
+                runner.submit("B")
+                with pytest.raises(JobQueueFull):
+                    runner.submit("C")
+                release.set()
+                self.wait_for(lambda: runner.pending == 0)
+                runner.submit("D")
+        finally:
+            runner.shutdown()
+
+    def test_store_evicts_oldest_finished_jobs(self):
+        """Running jobs are kept when the store is over capacity"""
+        from company_insight_service.core.jobs import InMemoryJobStore, SUCCEEDED
+
+        store = InMemoryJobStore(max_jobs=2)
+        running = store.create("A")["job_id"]
+        finished = store.create("B")["job_id"]
+        store.update(finished, status=SUCCEEDED)
+        newest = store.create("C")["job_id"]
+
+        assert store.get(running) is not None
+        assert store.get(finished) is None
+        assert store.get(newest) is not None
+
+
+class FakeBot:
+    """Records sends; stands in for telegram.Bot"""
+
+    instances = []
+
+    def __init__(self, token):
+        self.sent = []
+        FakeBot.instances.append(self)
+
+    async def initialize(self):
+        pass
+
+    async def shutdown(self):
+        pass
+
+    async def send_message(self, chat_id, text, parse_mode=None):
+        self.sent.append((time.monotonic(), text))
+
+
+class TestTelegramNotifier:
+    """Test the single background Telegram notifier"""
+
+    @pytest.fixture(autouse=True)
+    def reset_bots(self):
+        FakeBot.instances = []
+
+    def test_burst_is_one_digest_from_one_bot(self):
+        """Messages within the window share one send over one Bot"""
+        from company_insight_service.core.notifier import TelegramNotifier
+
+        notifier = TelegramNotifier("t", "c", window=0.2, min_interval=0, bot_factory=FakeBot)
+        for i in range(5):
+            assert notifier.notify(f"row {i}")
+        notifier.close()
+
+        assert len(FakeBot.instances) == 1
+        [(_, text)] = FakeBot.instances[0].sent
+        assert text.startswith("🗂 *5 database signals*")
+        assert "row 0" in text and "row 4" in text
+
+    def test_full_queue_drops_and_summarizes(self):
+        """Overflow is dropped without blocking and reported in the next digest"""
+        from company_insight_service.core.notifier import TelegramNotifier
+
+        release = threading.Event()
+
+        async def prepare():
+            release.wait(2)  # Keep the thread from draining the queue
+            return True
+
+        notifier = TelegramNotifier("t", "c", queue_size=3, window=0.05, prepare=prepare, bot_factory=FakeBot)
+        results = [notifier.notify(f"row {i}") for i in range(5)]
+        release.set()
+        notifier.close()
+
+        assert results == [True, True, True, False, False]
+        [(_, text)] = FakeBot.instances[0].sent
+        assert "3 database signals" in text
+        assert text.endswith("⚠️ 2 more notifications not shown")
+
+    def test_sends_are_spaced(self):
+        """Consecutive digests respect the per-chat interval"""
+        from company_insight_service.core.notifier import TelegramNotifier
+
+        notifier = TelegramNotifier("t", "c", window=0.01, min_interval=0.3, bot_factory=FakeBot)
+        notifier.notify("first")
+        deadline = time.monotonic() + 2
+        while not (FakeBot.instances and FakeBot.instances[0].sent) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        notifier.notify("second")
+        notifier.close()
+
+        (first_at, first), (second_at, second) = FakeBot.instances[0].sent
+        assert (first, second) == ("first", "second")
+        assert second_at - first_at >= 0.3
+
+    def test_digest_is_capped(self):
+        """Long digests are split at Telegram's size limit and cut at max_parts"""
+        from company_insight_service.core.notifier import format_digest
+
+        parts = format_digest(["x" * 300] * 10, max_parts=2, max_chars=1000)
+
+        assert len(parts) == 2
+        assert all(len(part) <= 1000 for part in parts)
+        shown = sum(part.count("x" * 300) for part in parts)
+        assert parts[-1].endswith(f"⚠️ {10 - shown} more notifications not shown")
+        assert format_digest(["only"]) == ["only"]
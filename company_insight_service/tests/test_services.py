@@ -142,6 +142,35 @@ class TestSentimentService:
         assert label == "Neutral"
 
 
+class TestProductAnalysis:
+    """Test incremental product analysis"""
+    
+    @patch('company_insight_service.services.sentiment.analyze_with_gemini', return_value=None)
+    @patch('company_insight_service.services.sentiment.scrape_url_content')
+    @patch('company_insight_service.services.search.search_web')
+    def test_iter_product_analyses_yields_incrementally(self, mock_search, mock_scrape, mock_gemini):
+        """Products are yielded one at a time and match analyze_products"""
+        from company_insight_service.services.sentiment import (
+            iter_product_analyses, analyze_products
+        )
+        
+        mock_search.return_value = [
+            {"title": "Review A", "link": "https://example.com/a", "snippet": "I love it, great product"},
+            {"title": "Review B", "link": "https://example.com/b", "snippet": "Terrible and awful"},
+        ]
+        mock_scrape.return_value = ""
+        
+        products = iter_product_analyses("Test Company")
+        first = next(products)
+        assert first["link"] in ("https://example.com/a", "https://example.com/b")
+        
+        remaining = list(products)
+        assert len(remaining) == 1
+        
+        listed = analyze_products("Test Company")
+        assert sorted(p["link"] for p in listed) == ["https://example.com/a", "https://example.com/b"]
+
+
 class TestStockService:
     """Test stock analysis service"""
     
@@ -187,6 +216,54 @@ class TestStockService:
         assert analysis is None
 
 
+class TestDeadline:
+    """Test request deadline helpers"""
+    
+    def test_time_budget_without_deadline(self):
+        """Without a deadline the default budget is used"""
+        from company_insight_service.services.deadline import time_budget
+        
+        assert time_budget(5) == 5
+    
+    def test_time_budget_is_capped_by_deadline(self):
+        """The budget never exceeds the time left"""
+        from company_insight_service.services.deadline import (
+            Deadline, deadline_scope, time_budget, DeadlineExceeded
+        )
+        
+        with deadline_scope(Deadline.after(1)):
+            assert time_budget(5) <= 1
+        
+        with deadline_scope(Deadline.after(-1)):
+            with pytest.raises(DeadlineExceeded):
+                time_budget(5)
+    
+    def test_call_with_deadline_abandons_slow_calls(self):
+        """Slow calls raise once the budget is exhausted"""
+        import time
+        from company_insight_service.services.deadline import (
+            Deadline, deadline_scope, call_with_deadline, DeadlineExceeded
+        )
+        
+        with deadline_scope(Deadline.after(0.2)):
+            assert call_with_deadline(lambda: "fast") == "fast"
+            started = time.time()
+            with pytest.raises(DeadlineExceeded):
+                call_with_deadline(time.sleep, 2)
+            assert time.time() - started < 1
+    
+    @patch('company_insight_service.services.scraping.requests.get')
+    def test_scrape_uses_remaining_budget(self, mock_get):
+        """Scrape timeouts shrink to the time left"""
+        from company_insight_service.services.deadline import Deadline, deadline_scope
+        
+        mock_get.return_value = Mock(status_code=404)
+        with deadline_scope(Deadline.after(1)):
+            scrape_url_content("https://example.com")
+        
+        assert mock_get.call_args.kwargs["timeout"] <= 1
+
+
 class TestIntegration:
     """Integration tests for service combinations"""
     
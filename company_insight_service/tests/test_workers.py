@@ -0,0 +1,1008 @@
+"""
+Worker tests
+Tests queue publishing and consumption with in-memory broker stand-ins
+"""
+import asyncio
+import json
+import queue
+import random
+import threading
+import time
+from datetime import date, datetime, timedelta
+from types import SimpleNamespace
+from unittest.mock import patch
+
+import pytest
+from pika.spec import Basic
+from sqlalchemy import create_engine, event, inspect, text
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+from company_insight_service.config.settings import settings
+from company_insight_service.core import signals
+from company_insight_service.core.cache import MISS
+from company_insight_service.database.migrations import SCHEMA_LOCK_KEY, lock_schema, upgrade
+from company_insight_service.database.models import (
+    Base,
+    Company,
+    ProductSentiment,
+    SentimentDailyRollup,
+    StockAnalysis,
+    async_database_url
+)
+from company_insight_service.database.partitioning import add_months, partition_name
+from company_insight_service.database.rollups import rebuild_rollups
+from company_insight_service.database.writes import company_ids, resolve_companies, write_batch
+from company_insight_service.workers.async_consumer import AsyncConsumer, partition_for
+from company_insight_service.workers.backfill import _merge_sql, backfill
+from company_insight_service.workers.consumer import BatchingConsumer
+from company_insight_service.workers.publisher import QueuePublisher, PublishError
+from company_insight_service.workers.retention import RetentionPolicy, Tier, period_start, run_retention
+
+
+class FakeIOLoop:
+    """Runs callbacks handed over from any thread until stopped"""
+
+    def __init__(self):
+        self.callbacks = queue.Queue()
+        self.stopped = False
+
+    def add_callback_threadsafe(self, callback):
+        self.callbacks.put(callback)
+
+    def start(self):
+        while not self.stopped:
+            self.callbacks.get()()
+
+    def stop(self):
+        self.stopped = True
+
+    def close(self):
+        pass
+
+
+class FakeChannel:
+    """Confirm-mode channel; the broker acks everything published after `confirm_delay`"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.broker = connection.broker
+        self.unconfirmed = []
+        self.tag = 0
+        self.on_confirm = None
+        self.confirm_scheduled = False
+
+    def add_on_close_callback(self, callback):
+        pass
+
+    def queue_declare(self, queue, durable=False, callback=None):
+        self.broker.declares += 1
+        self.connection.ioloop.add_callback_threadsafe(lambda: callback(None))
+
+    def confirm_delivery(self, ack_nack_callback, callback=None):
+        self.on_confirm = ack_nack_callback
+        self.connection.ioloop.add_callback_threadsafe(lambda: callback(None))
+
+    def basic_publish(self, exchange, routing_key, body, properties=None):
+        self.tag += 1
+        self.unconfirmed.append(body)
+        self.broker.max_unconfirmed = max(self.broker.max_unconfirmed, len(self.unconfirmed))
+        if not self.confirm_scheduled:
+            self.confirm_scheduled = True
+            timer = threading.Timer(
+                self.broker.confirm_delay, self.connection.ioloop.add_callback_threadsafe, (self._confirm,)
+            )
+            timer.daemon = True
+            timer.start()
+
+    def _confirm(self):
+        self.confirm_scheduled = False
+        if not self.connection.is_open:
+            return
+        if self.broker.fail_confirms:
+            self.broker.fail_confirms -= 1
+            self.connection.lost(ConnectionError("connection reset"))
+            return
+        if self.broker.nack:
+            self.unconfirmed = []
+            self.on_confirm(SimpleNamespace(method=Basic.Nack(delivery_tag=self.tag, multiple=True)))
+            return
+        with self.broker.lock:
+            self.broker.delivered.extend(self.unconfirmed)
+            self.broker.confirms.append(len(self.unconfirmed))
+        self.unconfirmed = []
+        self.on_confirm(SimpleNamespace(method=Basic.Ack(delivery_tag=self.tag, multiple=True)))
+
+
+class FakeConnection:
+    """SelectConnection stand-in: callbacks run on its I/O loop"""
+
+    def __init__(self, broker, on_open, on_open_error, on_close):
+        self.broker = broker
+        self.on_close = on_close
+        self.ioloop = FakeIOLoop()
+        self.is_open = True
+        self.ioloop.add_callback_threadsafe(lambda: on_open(self))
+
+    def channel(self, on_open_callback=None):
+        channel = FakeChannel(self)
+        self.ioloop.add_callback_threadsafe(lambda: on_open_callback(channel))
+        return channel
+
+    def lost(self, reason):
+        self.is_open = False
+        self.on_close(self, reason)
+
+    def close(self):
+        self.is_open = False
+        self.ioloop.add_callback_threadsafe(lambda: self.on_close(self, "closed by client"))
+
+
+class FakeBroker:
+    def __init__(self, confirm_delay=0.0, fail_confirms=0, nack=False):
+        self.confirm_delay = confirm_delay
+        self.fail_confirms = fail_confirms
+        self.nack = nack
+        self.delivered = []
+        self.confirms = []
+        self.connections = 0
+        self.declares = 0
+        self.max_unconfirmed = 0
+        self.lock = threading.Lock()
+
+    def connect(self, on_open, on_open_error, on_close):
+        self.connections += 1
+        return FakeConnection(self, on_open, on_open_error, on_close)
+
+
+class TestQueuePublisher:
+    """Test the persistent RabbitMQ publisher and its asynchronous confirms"""
+
+    def test_reuses_connections(self):
+        """Sequential publishes share one connection and one queue declare"""
+        broker = FakeBroker()
+        publisher = QueuePublisher("q", connection_factory=broker.connect)
+        try:
+            for i in range(5):
+                publisher.publish(f"m{i}".encode(), timeout=2)
+        finally:
+            publisher.close()
+
+        assert broker.delivered == [b"m0", b"m1", b"m2", b"m3", b"m4"]
+        assert broker.connections == 1
+        assert broker.declares == 1
+
+    def test_concurrent_publishes_share_confirms(self):
+        """Messages published while a confirm is outstanding are acked together"""
+        broker = FakeBroker(confirm_delay=0.05)
+        publisher = QueuePublisher("q", connection_factory=broker.connect)
+        threads = [
+            threading.Thread(target=publisher.publish, args=(f"m{i}".encode(),), kwargs={"timeout": 5})
+            for i in range(20)
+        ]
+        try:
+            for thread in threads:
+                thread.start()
+            for thread in threads:
+                thread.join()
+        finally:
+            publisher.close()
+
+        assert sorted(broker.delivered) == sorted(f"m{i}".encode() for i in range(20))
+        assert len(broker.confirms) < 20
+
+    def test_in_flight_window_is_bounded(self):
+        """No more than max_in_flight messages wait for a confirm"""
+        broker = FakeBroker(confirm_delay=0.01)
+        publisher = QueuePublisher("q", max_in_flight=3, connection_factory=broker.connect)
+        futures = [publisher.publish_async(f"m{i}".encode()) for i in range(10)]
+        for future in futures:
+            future.result(timeout=2)
+        publisher.close()
+
+        assert len(broker.delivered) == 10
+        assert broker.max_unconfirmed <= 3
+
+    def test_reconnects_and_republishes_unconfirmed(self):
+        """Messages unconfirmed when the connection drops go out on a new one"""
+        broker = FakeBroker(fail_confirms=1)
+        publisher = QueuePublisher(
+            "q", retry_backoff=0.01, connection_factory=broker.connect
+        )
+        try:
+            publisher.publish(b"payload", timeout=2)
+        finally:
+            publisher.close()
+
+        assert broker.delivered == [b"payload"]
+        assert broker.connections == 2
+
+    def test_gives_up_after_retries(self):
+        """Callers get an error once retries are exhausted"""
+        broker = FakeBroker(fail_confirms=10)
+        publisher = QueuePublisher(
+            "q", max_retries=2, retry_backoff=0.01, connection_factory=broker.connect
+        )
+        try:
+            with pytest.raises(PublishError):
+                publisher.publish(b"payload", timeout=2)
+        finally:
+            publisher.close()
+
+        assert broker.delivered == []
+        assert broker.connections == 3
+
+    def test_nack_fails_the_message(self):
+        """A message the broker nacks fails its publish"""
+        broker = FakeBroker(nack=True)
+        publisher = QueuePublisher("q", connection_factory=broker.connect)
+        try:
+            with pytest.raises(PublishError):
+                publisher.publish(b"payload", timeout=2)
+        finally:
+            publisher.close()
+
+    def test_close_flushes_queued_messages(self):
+        """Messages queued before close are still published and confirmed"""
+        broker = FakeBroker(confirm_delay=0.01)
+        publisher = QueuePublisher("q", max_in_flight=3, connection_factory=broker.connect)
+        futures = [publisher.publish_async(f"m{i}".encode()) for i in range(10)]
+        publisher.close()
+
+        assert all(f.done() and f.exception() is None for f in futures)
+        assert len(broker.delivered) == 10
+        with pytest.raises(PublishError):
+            publisher.publish(b"late")
+
+    def test_publishes_racing_close_never_hang(self):
+        """Every publish around close is either confirmed or fails; none waits forever"""
+        broker = FakeBroker(confirm_delay=0.001)
+        publisher = QueuePublisher("q", max_pending=5, connection_factory=broker.connect)
+        outcomes = []
+
+        def publish(i):
+            try:
+                publisher.publish(f"m{i}".encode())
+                outcomes.append("confirmed")
+            except PublishError:
+                outcomes.append("failed")
+
+        threads = [threading.Thread(target=publish, args=(i,), daemon=True) for i in range(50)]
+        for thread in threads:
+            thread.start()
+        publisher.close()
+        for thread in threads:
+            thread.join(timeout=5)
+
+        assert not any(thread.is_alive() for thread in threads)
+        assert len(outcomes) == 50
+        assert outcomes.count("confirmed") == len(broker.delivered)
+
+    def test_failed_io_thread_fails_publishes(self):
+        """If the I/O thread dies, waiting messages fail and later publishes fail at once"""
+        def broken_factory(on_open, on_open_error, on_close):
+            raise ValueError("bad broker URL")
+
+        publisher = QueuePublisher("q", connection_factory=broken_factory)
+        future = publisher.publish_async(b"payload")
+        assert isinstance(future.exception(timeout=2), PublishError)
+
+        started = time.perf_counter()
+        with pytest.raises(PublishError, match="bad broker URL"):
+            publisher.publish(b"late")
+        assert time.perf_counter() - started < 0.5
+        publisher.close()
+
+    def test_publish_to_queue_uses_shared_publisher(self):
+        """publish_to_queue serializes the payload through the shared publisher"""
+        import json
+        from unittest.mock import patch
+        from company_insight_service.workers import queue_utils
+
+        broker = FakeBroker()
+        publisher = QueuePublisher("q", connection_factory=broker.connect)
+        try:
+            with patch.object(queue_utils, "get_publisher", return_value=publisher):
+                queue_utils.publish_to_queue({"company_name": "Test"})
+        finally:
+            publisher.close()
+
+        assert json.loads(broker.delivered[0]) == {"company_name": "Test"}
+
+
+@pytest.fixture(autouse=True)
+def clear_company_ids():
+    """Every test database starts empty, so cached company IDs do not carry over"""
+    company_ids.clear()
+    yield
+    company_ids.clear()
+
+
+class AckRecorder:
+    """Consumer-side channel stand-in recording acks and nacks"""
+
+    def __init__(self):
+        self.acks = []
+        self.nacks = []
+        self.is_open = True
+
+    def basic_ack(self, delivery_tag, multiple=False):
+        self.acks.append((delivery_tag, multiple))
+
+    def basic_nack(self, delivery_tag, multiple=False, requeue=True):
+        self.nacks.append((delivery_tag, requeue))
+
+
+def _payload(company, products=1, ticker=None):
+    payload = {
+        "company_name": company,
+        "product_sentiment": [
+            {"title": f"{company} product {i}", "sentiment_score": 0.5, "link": f"https://example.com/{i}"}
+            for i in range(products)
+        ]
+    }
+    if ticker:
+        payload["ticker"] = ticker
+        payload["stock_analysis"] = {"overall_change_percent": 12.5}
+    return payload
+
+
+class TestBatchingConsumer:
+    """Test batched consumption and bulk writes"""
+
+    @pytest.fixture
+    def session_factory(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        yield sessionmaker(bind=engine)
+        engine.dispose()
+
+    def _deliver(self, consumer, *bodies):
+        for tag, body in enumerate(bodies, start=1):
+            if not isinstance(body, bytes):
+                body = json.dumps(body).encode()
+            consumer.on_message(SimpleNamespace(delivery_tag=tag), body)
+
+    def test_full_batch_written_and_acked_once(self, session_factory):
+        """A full batch is one transaction and one multiple ack"""
+        channel = AckRecorder()
+        consumer = BatchingConsumer(channel, batch_size=3, max_wait=60, session_factory=session_factory)
+        self._deliver(consumer, _payload("Acme", 2), _payload("Globex", ticker="GLX"), _payload("Acme"))
+
+        assert channel.acks == [(3, True)]
+        with session_factory() as db:
+            assert db.query(Company).count() == 2
+            # The second Acme message re-scraped https://example.com/0
+            assert db.query(ProductSentiment).count() == 3
+            assert db.query(StockAnalysis).one().ticker == "GLX"
+
+    def test_partial_batch_waits_for_max_wait(self, session_factory):
+        """Fewer than batch_size messages are held until max_wait has passed"""
+        channel = AckRecorder()
+        consumer = BatchingConsumer(channel, batch_size=100, max_wait=0.05, session_factory=session_factory)
+        self._deliver(consumer, _payload("Acme"))
+
+        assert not consumer.due()
+        assert channel.acks == []
+        time.sleep(0.06)
+        assert consumer.due()
+        consumer.flush()
+        assert channel.acks == [(1, True)]
+
+    def test_failed_batch_falls_back_to_single_messages(self, session_factory):
+        """One bad message is rejected without losing the rest of its batch"""
+        channel = AckRecorder()
+        consumer = BatchingConsumer(channel, batch_size=4, max_wait=60, session_factory=session_factory)
+        self._deliver(consumer, _payload("Acme"), {"product_sentiment": []}, b"not json", _payload("Globex"))
+
+        assert channel.nacks == [(3, False), (2, False)]
+        assert channel.acks == [(1, False), (4, False)]
+        with session_factory() as db:
+            assert {c.name for c in db.query(Company)} == {"Acme", "Globex"}
+            assert db.query(ProductSentiment).count() == 2
+
+    def test_shutdown_leaves_batch_for_redelivery_once_channel_closed(self, session_factory):
+        """A batch that could no longer be acked is not written at shutdown"""
+        channel = AckRecorder()
+        consumer = BatchingConsumer(channel, batch_size=100, max_wait=60, session_factory=session_factory)
+        self._deliver(consumer, _payload("Acme"))
+
+        channel.is_open = False
+        consumer.shutdown()
+
+        assert channel.acks == []
+        with session_factory() as db:
+            assert db.query(Company).count() == 0
+
+        channel.is_open = True
+        self._deliver(consumer, _payload("Acme"))
+        consumer.shutdown()
+        assert channel.acks == [(1, True)]
+
+
+class TestUpserts:
+    """Test idempotent writes and the schema upgrade they rely on"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        yield engine
+        engine.dispose()
+
+    def test_redelivered_payload_updates_rows(self, engine):
+        """Writing the same pages again updates them instead of adding rows"""
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        first = _payload("Acme", products=2, ticker="ACME")
+        again = _payload("Acme", products=2, ticker="ACME")
+        again["product_sentiment"][0]["sentiment_score"] = -0.25
+        again["product_sentiment"].append({"title": "No link", "sentiment_score": 0.1})
+
+        for payload in (first, again, again):
+            with Session() as db:
+                write_batch(db, [payload])
+                db.commit()
+
+        with Session() as db:
+            rows = {row.source_url: row for row in db.query(ProductSentiment).filter(
+                ProductSentiment.source_url.isnot(None)
+            )}
+            assert len(rows) == 2
+            assert rows["https://example.com/0"].sentiment_score == -0.25
+            # Rows without a link have nothing to match on and are always added
+            assert db.query(ProductSentiment).filter(ProductSentiment.source_url.is_(None)).count() == 2
+            assert db.query(StockAnalysis).one().overall_change_percent == 12.5
+
+    def test_duplicates_within_one_batch(self, engine):
+        """The latest of several rows for one key wins inside a batch"""
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        newer = _payload("Acme")
+        newer["product_sentiment"][0]["summary"] = "newer"
+
+        with Session() as db:
+            assert write_batch(db, [_payload("Acme"), newer]) == 1
+            db.commit()
+            assert db.query(ProductSentiment).one().summary == "newer"
+
+    def test_upgrade_legacy_tables(self, engine):
+        """Existing tables gain the new columns and deduplicated unique indexes"""
+        with engine.begin() as conn:
+            conn.execute(text(
+                "CREATE TABLE product_sentiments (id INTEGER PRIMARY KEY, company_id INTEGER, "
+                "product_name VARCHAR, sentiment_score FLOAT, sentiment_label VARCHAR, "
+                "similarity_score FLOAT, summary TEXT, source_url VARCHAR, created_at DATETIME)"
+            ))
+            conn.execute(text(
+                "CREATE TABLE stock_analyses (id INTEGER PRIMARY KEY, company_id INTEGER, "
+                "ticker VARCHAR, analysis_text TEXT, three_year_trend JSON, created_at DATETIME)"
+            ))
+            conn.execute(text("CREATE INDEX ix_product_sentiments_company_id ON product_sentiments (company_id)"))
+            conn.execute(text(
+                "CREATE TABLE financial_reports (id INTEGER PRIMARY KEY, company_id INTEGER, period VARCHAR, "
+                "revenue VARCHAR, net_income VARCHAR, data JSON, created_at DATETIME)"
+            ))
+            conn.execute(text(
+                "INSERT INTO product_sentiments (company_id, source_url, summary, created_at) VALUES "
+                "(1, 'u', 'old', '2024-01-01 10:00:00'), (1, 'u', 'new', '2024-01-02 10:00:00'), "
+                "(1, '', 'a', '2024-01-02 10:00:00'), (1, '', 'b', '2024-01-02 10:00:00')"
+            ))
+            conn.execute(text(
+                "INSERT INTO stock_analyses (company_id, ticker, three_year_trend, created_at) VALUES "
+                "(1, 'T', NULL, '2024-01-01 09:00:00'), "
+                "(1, 'T', '{\"overall_change_percent\": 21.5, \"typical_dip_month\": \"September\"}', "
+                "'2024-01-01 17:00:00'), (1, 'T', NULL, '2024-01-02 09:00:00'), "
+                "(1, 'U', '{\"overall_change_percent\": \"n/a\", \"latest_price\": \" 101.5\", "
+                "\"typical_dip_month\": \"May\"}', '2024-01-03 09:00:00')"
+            ))
+
+        with engine.begin() as conn:
+            upgrade(conn)
+        with engine.begin() as conn:
+            upgrade(conn)  # Idempotent
+
+        inspector = inspect(engine)
+        indexes = {i["name"] for i in inspector.get_indexes("product_sentiments")}
+        assert "uq_product_sentiments_company_source" in indexes
+        assert "ix_product_sentiments_company_created" in indexes
+        assert "ix_product_sentiments_company_id" not in indexes
+        stock_indexes = {i["name"] for i in inspector.get_indexes("stock_analyses")}
+        assert {"ix_stock_analyses_company_created", "ix_stock_analyses_dip_month"} <= stock_indexes
+        with engine.connect() as conn:
+            summaries = conn.execute(text("SELECT summary FROM product_sentiments ORDER BY id")).scalars().all()
+            stocks = conn.execute(text(
+                "SELECT analysis_date, overall_change_percent, typical_dip_month, latest_price "
+                "FROM stock_analyses ORDER BY id"
+            )).all()
+        assert summaries == ["new", "a", "b"]
+        # The promoted trend fields are filled from the stored JSON; values that are not numbers stay NULL
+        assert [tuple(row) for row in stocks] == [
+            ("2024-01-01", 21.5, "September", None),
+            ("2024-01-02", None, None, None),
+            ("2024-01-03", None, "May", 101.5),
+        ]
+
+    def test_schema_lock_on_postgresql(self):
+        """Schema changes wait on a transaction-level advisory lock on PostgreSQL only"""
+        executed = []
+        for dialect in ("postgresql", "sqlite"):
+            connection = SimpleNamespace(
+                dialect=SimpleNamespace(name=dialect),
+                execute=lambda stmt, params=None: executed.append((str(stmt), params))
+            )
+            lock_schema(connection)
+        assert executed == [("SELECT pg_advisory_xact_lock(:key)", {"key": SCHEMA_LOCK_KEY})]
+
+    def test_merge_without_unique_index(self, engine):
+        """The partitioned write path updates matching rows without ON CONFLICT"""
+        Base.metadata.create_all(engine)
+        with engine.begin() as conn:
+            conn.execute(text("DROP INDEX uq_product_sentiments_company_source"))
+        Session = sessionmaker(bind=engine)
+        again = _payload("Acme", products=2)
+        again["product_sentiment"][1]["summary"] = "updated"
+
+        with patch.object(settings, "PRODUCT_SENTIMENTS_PARTITIONED", True):
+            for payload in (_payload("Acme", products=2), again):
+                with Session() as db:
+                    write_batch(db, [payload])
+                    db.commit()
+
+        with Session() as db:
+            rows = db.query(ProductSentiment).order_by(ProductSentiment.id).all()
+            assert [row.summary for row in rows] == ["", "updated"]
+
+    def test_month_arithmetic(self):
+        """Partition ranges roll over year boundaries"""
+        assert add_months(date(2024, 11, 1), 3) == date(2025, 2, 1)
+        assert add_months(date(2024, 1, 1), -1) == date(2023, 12, 1)
+        assert partition_name(date(2025, 2, 1)) == "product_sentiments_y2025m02"
+
+
+class TestCompanyIds:
+    """Test the company name -> ID cache"""
+
+    @pytest.fixture
+    def Session(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        yield sessionmaker(bind=engine)
+        engine.dispose()
+
+    def test_cached_names_need_no_queries(self, Session):
+        """Once committed, known companies resolve without touching the database"""
+        with Session() as db:
+            first = resolve_companies(db, ["Acme", "Globex"])
+            db.commit()
+
+        statements = []
+
+        def record(conn, cursor, statement, *args):
+            statements.append(statement)
+
+        with Session() as db:
+            event.listen(db.get_bind(), "before_cursor_execute", record)
+            try:
+                assert resolve_companies(db, ["Acme", "Globex"]) == first
+            finally:
+                event.remove(db.get_bind(), "before_cursor_execute", record)
+        assert statements == []
+
+    def test_rolled_back_companies_are_not_cached(self, Session):
+        """IDs from a transaction that never committed are looked up again"""
+        with Session() as db:
+            resolve_companies(db, ["Acme"])
+            db.rollback()
+        assert company_ids.get("Acme").status == MISS
+
+        with Session() as db:
+            acme = resolve_companies(db, ["Acme"])["Acme"]
+            db.commit()
+            assert db.get(Company, acme).name == "Acme"
+
+    def test_existing_company_is_reused(self, Session):
+        """A company created elsewhere (e.g. by another consumer) is read back, not duplicated"""
+        with Session() as db:
+            db.add(Company(name="Acme"))
+            db.commit()
+            existing = db.query(Company).one().id
+
+        with Session() as db:
+            assert resolve_companies(db, ["Acme", "Globex"])["Acme"] == existing
+            db.commit()
+            assert db.query(Company).count() == 2
+
+
+class TestSignals:
+    """Test per-transaction signal summaries"""
+
+    @pytest.fixture
+    def Session(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        yield sessionmaker(bind=engine)
+        engine.dispose()
+
+    @pytest.fixture
+    def sent(self):
+        with patch.object(signals, "send_telegram_message") as send:
+            yield send
+
+    def test_one_summary_per_commit(self, Session, sent):
+        """A batch is announced once, after commit, with counts per company"""
+        with Session() as db:
+            write_batch(db, [_payload("Acme", 5, ticker="ACME"), _payload("Globex")])
+            assert not sent.called
+            db.commit()
+
+        sent.assert_called_once()
+        message = sent.call_args.args[0]
+        assert "*Acme:* new company, 5 product sentiments, 1 stock analysis" in message
+        assert "*Globex:* new company, 1 product sentiment" in message
+
+        with Session() as db:
+            write_batch(db, [_payload("Acme", 2)])
+            db.commit()
+        assert sent.call_args.args[0].endswith("*Acme:* 2 product sentiments")
+
+    def test_rolled_back_writes_are_not_announced(self, Session, sent):
+        """Nothing is sent for a rollback, and nothing of it leaks into the next commit"""
+        with Session() as db:
+            write_batch(db, [_payload("Acme", 3)])
+            db.rollback()
+            db.add(Company(name="Globex"))
+            db.commit()
+
+        sent.assert_called_once()
+        assert sent.call_args.args[0].endswith("*Globex:* new company")
+
+    def test_orm_writes_name_their_company(self, Session, sent):
+        """Rows added through the ORM are counted by the mapper events; names are looked up"""
+        with Session() as db:
+            db.add(Company(name="Acme"))
+            db.commit()
+            acme = db.query(Company).one().id
+        sent.reset_mock()
+
+        with Session() as db:
+            db.add_all([ProductSentiment(company_id=acme, product_name="Widget"),
+                        StockAnalysis(company_id=acme, ticker="ACME")])
+            db.commit()
+
+        sent.assert_called_once()
+        assert sent.call_args.args[0].endswith("*Acme:* 1 product sentiment, 1 stock analysis")
+
+
+class TestRollups:
+    """Test the daily sentiment rollups kept by the write path"""
+
+    @pytest.fixture
+    def engine(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        yield engine
+        engine.dispose()
+
+    @staticmethod
+    def _rollups(db):
+        return {
+            (row.company_id, row.day): (
+                row.sample_count, round(row.score_sum, 6), row.positive_count,
+                row.negative_count, row.neutral_count, row.min_score, row.max_score
+            )
+            for row in db.query(SentimentDailyRollup)
+        }
+
+    def test_batches_keep_rollups_exact(self, engine):
+        """New rows count towards today; re-scraped pages update the day they were first seen"""
+        Session = sessionmaker(bind=engine)
+        yesterday = datetime.utcnow() - timedelta(days=1)
+        with Session() as db:
+            acme = resolve_companies(db, ["Acme"])["Acme"]
+            db.add(ProductSentiment(
+                company_id=acme, product_name="Old", sentiment_score=0.9, sentiment_label="Positive",
+                source_url="https://example.com/0", created_at=yesterday, updated_at=yesterday
+            ))
+            db.commit()
+
+        rescraped = _payload("Acme", products=3)
+        rescraped["product_sentiment"][0].update(sentiment_score=-0.5, sentiment_label="Negative")
+        for payload in (rescraped, rescraped, _payload("Globex", products=1)):
+            with Session() as db:
+                write_batch(db, [payload])
+                db.commit()
+
+        today = datetime.utcnow().date()
+        with Session() as db:
+            globex = db.query(Company.id).filter_by(name="Globex").scalar()
+            rollups = self._rollups(db)
+            assert rollups == {
+                (acme, yesterday.date()): (1, -0.5, 0, 1, 0, -0.5, -0.5),
+                (acme, today): (2, 1.0, 0, 0, 2, 0.5, 0.5),
+                (globex, today): (1, 0.5, 0, 0, 1, 0.5, 0.5),
+            }
+
+        # A rebuild from the raw rows lands on the same numbers
+        with engine.begin() as conn:
+            conn.execute(text("DELETE FROM sentiment_daily_rollups"))
+        assert rebuild_rollups(engine) == 3
+        with Session() as db:
+            assert self._rollups(db) == rollups
+
+    def test_rebuild_range_keeps_older_rollups(self, engine):
+        """Days outside the rebuilt range (e.g. raw rows already expired) are left alone"""
+        Session = sessionmaker(bind=engine)
+        old_day = date(2020, 1, 1)
+        with Session() as db:
+            acme = resolve_companies(db, ["Acme"])["Acme"]
+            db.add(SentimentDailyRollup(
+                company_id=acme, day=old_day, sample_count=5, score_sum=1.0,
+                positive_count=5, negative_count=0, neutral_count=0
+            ))
+            write_batch(db, [_payload("Acme", products=2)])
+            db.commit()
+
+        assert rebuild_rollups(engine) == 1
+        with Session() as db:
+            assert {row.day for row in db.query(SentimentDailyRollup)} == {old_day, datetime.utcnow().date()}
+
+
+class TestRetention:
+    """Test downsampling and expiry of historical rows"""
+
+    NOW = datetime(2024, 6, 12, 12, 0)  # A Wednesday
+
+    @pytest.fixture
+    def Session(self):
+        engine = create_engine(
+            "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool
+        )
+        Base.metadata.create_all(engine)
+        yield sessionmaker(bind=engine)
+        engine.dispose()
+
+    def _daily_analyses(self, Session, days):
+        with Session() as db:
+            acme = resolve_companies(db, ["Acme"])["Acme"]
+            db.add_all([
+                StockAnalysis(
+                    company_id=acme, ticker=ticker, analysis_date=(self.NOW - timedelta(days=age)).date(),
+                    created_at=self.NOW - timedelta(days=age)
+                )
+                for age in range(days)
+                for ticker in ("ACME", "ACM2")
+            ])
+            db.commit()
+
+    def test_downsamples_by_week_then_month(self, Session):
+        """Recent rows stay; older ones thin to one per ticker per week, then per month"""
+        self._daily_analyses(Session, 200)
+        policies = [RetentionPolicy(StockAnalysis, ("company_id", "ticker"), (Tier(30, "week"), Tier(90, "month")))]
+
+        dry = run_retention(Session, dry_run=True, policies=policies, now=self.NOW)
+        with Session() as db:
+            assert db.query(StockAnalysis).count() == 400
+        deleted = run_retention(Session, batch_size=7, policies=policies, now=self.NOW)
+        assert deleted == dry
+        assert run_retention(Session, policies=policies, now=self.NOW)["stock_analyses"]["downsampled"] == 0
+
+        week_end = datetime.combine(period_start((self.NOW - timedelta(days=30)).date(), "week"), datetime.min.time())
+        month_end = datetime.combine(period_start((self.NOW - timedelta(days=90)).date(), "month"), datetime.min.time())
+        with Session() as db:
+            rows = db.query(StockAnalysis).filter_by(ticker="ACME").all()
+        recent = [row for row in rows if row.created_at >= week_end]
+        weekly = [row for row in rows if month_end <= row.created_at < week_end]
+        monthly = [row for row in rows if row.created_at < month_end]
+        assert len(recent) == (self.NOW - week_end).days + 1
+        assert len(weekly) == len({period_start(row.created_at.date(), "week") for row in weekly})
+        assert len(monthly) == len({row.created_at.strftime("%Y-%m") for row in monthly})
+        # The newest row of each month is the one kept
+        assert max(row.created_at for row in monthly).date() == (month_end - timedelta(days=1)).date()
+        assert deleted["stock_analyses"]["downsampled"] == 400 - 2 * len(rows)
+
+    def test_expires_old_sentiments(self, Session):
+        """Rows past max_age_days are deleted in batches; rollups are untouched"""
+        with Session() as db:
+            acme = resolve_companies(db, ["Acme"])["Acme"]
+            db.add_all([
+                ProductSentiment(company_id=acme, sentiment_score=0.5, created_at=self.NOW - timedelta(days=age))
+                for age in range(0, 100, 10)
+            ])
+            db.add(SentimentDailyRollup(company_id=acme, day=date(2024, 1, 1), sample_count=1, score_sum=0.5,
+                                        positive_count=1, negative_count=0, neutral_count=0))
+            db.commit()
+
+        policies = [RetentionPolicy(ProductSentiment, max_age_days=45)]
+        deleted = run_retention(Session, batch_size=2, policies=policies, now=self.NOW)
+
+        assert deleted == {"product_sentiments": {"downsampled": 0, "expired": 5}}
+        with Session() as db:
+            assert db.query(ProductSentiment).count() == 5
+            assert db.query(SentimentDailyRollup).count() == 1
+
+    def test_expiry_keeps_boundary_day_whole(self, Session):
+        """The cutoff is aligned to midnight, so rebuilding the boundary day's rollup leaves it unchanged"""
+        boundary = (self.NOW - timedelta(days=45)).date()
+        with Session() as db:
+            acme = resolve_companies(db, ["Acme"])["Acme"]
+            db.add_all([
+                ProductSentiment(company_id=acme, sentiment_score=score,
+                                 created_at=datetime.combine(day, datetime.min.time()) + timedelta(hours=hour))
+                for day in (boundary - timedelta(days=1), boundary, boundary + timedelta(days=1))
+                for hour, score in ((6, 0.5), (18, -0.5))
+            ])
+            db.commit()
+        engine = Session.kw["bind"]
+        rebuild_rollups(engine, until=self.NOW.date())
+        with Session() as db:
+            before = db.query(SentimentDailyRollup).filter_by(day=boundary).one()
+            before = (before.sample_count, before.score_sum, before.positive_count, before.negative_count)
+
+        policies = [RetentionPolicy(ProductSentiment, max_age_days=45)]
+        deleted = run_retention(Session, policies=policies, now=self.NOW)
+        rebuild_rollups(engine, until=self.NOW.date())
+
+        # Only the day before the boundary went, though NOW - 45 days falls at noon on the boundary day
+        assert deleted["product_sentiments"]["expired"] == 2
+        with Session() as db:
+            after = db.query(SentimentDailyRollup).filter_by(day=boundary).one()
+            assert (after.sample_count, after.score_sum, after.positive_count, after.negative_count) == before
+            assert before[0] == 2
+
+
+class TestBackfill:
+    """Test the NDJSON backfill command"""
+
+    def test_loads_dumps_in_chunks(self, tmp_path):
+        """Payloads are loaded chunk by chunk, keeping their timestamps and skipping bad lines"""
+        import gzip
+
+        engine = create_engine("sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool)
+        Base.metadata.create_all(engine)
+        Session = sessionmaker(bind=engine)
+        replayed = dict(_payload("Acme", products=2, ticker="ACME"), created_at="2024-03-01T10:00:00+00:00")
+        plain = tmp_path / "dump.ndjson"
+        plain.write_text("\n".join([json.dumps(replayed), "not json", "", json.dumps({"no": "company"})]))
+        packed = tmp_path / "more.ndjson.gz"
+        with gzip.open(packed, "wt") as f:
+            f.write("\n".join(json.dumps(_payload(f"Co {i}")) for i in range(5)))
+
+        totals = backfill([str(plain), str(packed)], Session, chunk_size=2)
+
+        assert (totals["payloads"], totals["rows"], totals["invalid"]) == (6, 8, 2)
+        with Session() as db:
+            assert db.query(Company).count() == 6
+            acme = db.query(StockAnalysis).one()
+            assert (acme.analysis_date, acme.created_at) == (date(2024, 3, 1), datetime(2024, 3, 1, 10))
+            assert db.query(SentimentDailyRollup).filter_by(day=date(2024, 3, 1)).one().sample_count == 2
+        engine.dispose()
+
+    def test_merge_statements(self):
+        """Staged rows merge with ON CONFLICT, or UPDATE + INSERT on a partitioned table"""
+        columns = ["company_id", "source_url", "summary", "created_at"]
+        plain = _merge_sql(ProductSentiment, columns, ("company_id", "source_url"), partitioned=False)
+        partitioned = _merge_sql(ProductSentiment, columns, ("company_id", "source_url"), partitioned=True)
+
+        assert "ON CONFLICT (company_id, source_url) DO UPDATE SET summary = EXCLUDED.summary" in plain[0]
+        assert "created_at = EXCLUDED" not in plain[0]
+        assert "DISTINCT ON (company_id, source_url)" in plain[0] and "seq DESC" in plain[0]
+        assert [statement.split()[0] for statement in partitioned] == ["UPDATE", "INSERT", "INSERT"]
+        assert not any("ON CONFLICT" in statement for statement in partitioned)
+
+
+class FakeMessage:
+    """aio_pika IncomingMessage stand-in"""
+
+    def __init__(self, delivery_tag, body, channel_closed=False):
+        self.delivery_tag = delivery_tag
+        self.body = body if isinstance(body, bytes) else json.dumps(body).encode()
+        self.channel_closed = channel_closed
+        self.settled = None
+
+    async def ack(self):
+        if self.channel_closed:
+            raise RuntimeError("Channel closed")
+        self.settled = "ack"
+
+    async def reject(self, requeue=False):
+        self.settled = "reject"
+
+
+class TestAsyncConsumer:
+    """Test the asyncio consumer's concurrency, ordering and shutdown"""
+
+    def _run(self, write, bodies, concurrency=4, batch_size=1):
+        messages = [FakeMessage(tag, body) for tag, body in enumerate(bodies, start=1)]
+
+        async def scenario():
+            consumer = AsyncConsumer(write, concurrency=concurrency, batch_size=batch_size)
+            consumer.start()
+            for message in messages:
+                await consumer.on_message(message)
+            await consumer.drain()
+
+        asyncio.run(scenario())
+        return messages
+
+    def test_per_company_order_with_concurrent_companies(self):
+        """Companies are written concurrently, each in queue order"""
+        written = []
+        active = {"now": 0, "max": 0}
+        rng = random.Random(3)
+
+        async def write(payloads):
+            active["now"] += 1
+            active["max"] = max(active["max"], active["now"])
+            await asyncio.sleep(rng.uniform(0, 0.01))
+            written.extend((p["company_name"], p["seq"]) for p in payloads)
+            active["now"] -= 1
+
+        companies = ["Acme", "Globex", "Initech", "Umbrella", "Hooli", "Stark"]
+        bodies = [{"company_name": c, "seq": i} for i in range(5) for c in companies]
+        messages = self._run(write, bodies)
+
+        assert all(m.settled == "ack" for m in messages)
+        assert active["max"] > 1
+        for company in companies:
+            assert [seq for name, seq in written if name == company] == list(range(5))
+
+    def test_lane_batches_and_single_message_fallback(self):
+        """Queued messages share a write; a failing batch is retried per message"""
+        calls = []
+
+        async def write(payloads):
+            calls.append(len(payloads))
+            if any(p.get("bad") for p in payloads):
+                raise RuntimeError("constraint violation")
+
+        bodies = [{"company_name": "Acme", "seq": 0}, {"company_name": "Acme", "bad": True},
+                  {"company_name": "Acme", "seq": 2}, b"not json"]
+        messages = self._run(write, bodies, concurrency=1, batch_size=10)
+
+        assert calls == [3, 1, 1, 1]
+        assert [m.settled for m in messages] == ["ack", "reject", "ack", "reject"]
+
+    def test_drain_finishes_in_flight_messages(self):
+        """Shutdown waits for every received message to be written and acked"""
+        async def write(payloads):
+            await asyncio.sleep(0.02)
+
+        messages = self._run(write, [{"company_name": f"C{i}"} for i in range(20)], concurrency=3)
+        assert all(m.settled == "ack" for m in messages)
+
+    def test_failed_ack_keeps_lane_running(self):
+        """An ack that raises (e.g. closed channel) is logged; the lane keeps consuming"""
+        messages = [FakeMessage(1, {"company_name": "Acme"}, channel_closed=True),
+                    FakeMessage(2, {"company_name": "Acme"})]
+
+        async def write(payloads):
+            pass
+
+        async def scenario():
+            consumer = AsyncConsumer(write, concurrency=1)
+            consumer.start()
+            for message in messages:
+                await consumer.on_message(message)
+            await asyncio.wait_for(consumer.drain(), timeout=2)
+            return consumer._tasks
+
+        tasks = asyncio.run(scenario())
+        assert [m.settled for m in messages] == [None, "ack"]
+        assert all(task.exception() is None for task in tasks)
+
+    def test_partitions_and_driver_urls(self):
+        """Lanes are stable per company and URLs switch to async drivers"""
+        assert partition_for("Acme", 8) == partition_for("Acme", 8)
+        assert {partition_for(f"C{i}", 8) for i in range(100)} == set(range(8))
+        assert async_database_url("postgresql+psycopg2://u:p@h/db") == "postgresql+asyncpg://u:p@h/db"
+        assert async_database_url("sqlite:///./x.db") == "sqlite+aiosqlite:///./x.db"
@@ -0,0 +1,189 @@
+"""
+Workflow tests
+Tests the LangGraph research workflow and its runner with mocked services
+"""
+import time
+
+import pytest
+from unittest.mock import patch
+
+from langgraph.checkpoint.memory import InMemorySaver
+
+from company_insight_service.workflows.company_research import build_workflow
+from company_insight_service.services.deadline import Deadline
+from company_insight_service.workflows.runner import get_run_company, run_workflow, stream_workflow
+
+
+NEWS = [{"title": "News 1", "link": "https://example.com/1", "snippet": "snippet 1"}]
+PRODUCTS = [{
+    "title": "Product Review",
+    "link": "https://example.com/review",
+    "sentiment_score": 0.8,
+    "sentiment_label": "Positive",
+    "similarity_score": None,
+    "summary": "Great product"
+}]
+STOCK = {"ticker": "TEST", "overall_change_percent": 15.5}
+
+
+@pytest.fixture
+def mocked_services():
+    """Patch every service the workflow nodes call"""
+    target = 'company_insight_service.workflows.company_research'
+    with patch(f'{target}.get_latest_news', return_value=NEWS) as news, \
+         patch(f'{target}.iter_product_analyses', side_effect=lambda c: iter(PRODUCTS)) as products, \
+         patch(f'{target}.find_ticker', return_value="TEST") as ticker, \
+         patch(f'{target}.get_stock_data_analysis', return_value=STOCK) as stock, \
+         patch(f'{target}.publish_to_queue') as publish:
+        yield {
+            "news": news,
+            "products": products,
+            "ticker": ticker,
+            "stock": stock,
+            "publish": publish,
+        }
+
+
+@pytest.fixture
+def flow():
+    """Workflow compiled with an isolated in-memory checkpointer"""
+    return build_workflow(checkpointer=InMemorySaver())
+
+
+class TestWorkflowRunner:
+    """Test checkpointed runs and resume"""
+
+    def test_new_run_streams_all_nodes(self, flow, mocked_services):
+        """A fresh run announces its run ID and executes every node"""
+        events = list(stream_workflow("Test Company", flow=flow))
+        updates = [e for e in events if e["event"] == "update"]
+
+        assert events[0]["event"] == "run"
+        assert events[0]["resumed"] is False
+        assert events[0]["run_id"]
+        assert [e["node"] for e in updates] == ["research", "financials", "save"]
+        assert updates[0]["data"]["product_sentiment"] == PRODUCTS
+        mocked_services["publish"].assert_called_once()
+
+    def test_products_streamed_before_research_update(self, flow, mocked_services):
+        """Each analyzed product is emitted as its own event ahead of the node update"""
+        events = list(stream_workflow("Test Company", flow=flow))
+        kinds = [(e["event"], e.get("node")) for e in events]
+
+        assert kinds[:3] == [("run", None), ("product", "research"), ("update", "research")]
+        assert events[1]["data"] == PRODUCTS[0]
+        assert events[2]["data"]["product_sentiment"] == [e["data"] for e in events if e["event"] == "product"]
+
+    def test_updates_carry_timing_breakdown(self, flow, mocked_services):
+        """Executed nodes report their own time and the service calls beneath them"""
+        from company_insight_service.monitoring.timing import span
+
+        def news_with_span(company):
+            with span("duckduckgo", "search"):
+                return NEWS
+
+        mocked_services["news"].side_effect = news_with_span
+        updates = [e for e in stream_workflow("Test Company", flow=flow) if e["event"] == "update"]
+
+        research = updates[0]
+        assert research["node"] == "research"
+        assert research["timings"]["node_ms"] >= 0
+        assert research["timings"]["by_service"]["duckduckgo"]["count"] == 1
+        assert "duckduckgo" not in updates[1]["timings"]["by_service"]
+
+    def test_resume_after_save_failure_skips_completed_nodes(self, flow, mocked_services):
+        """A failed save can be retried without redoing research"""
+        mocked_services["publish"].side_effect = RuntimeError("broker down")
+
+        events = []
+        with pytest.raises(RuntimeError):
+            for event in stream_workflow("Test Company", run_id="run-1", flow=flow):
+                events.append(event)
+        assert [e["node"] for e in events if e["event"] == "update"] == ["research", "financials"]
+
+        mocked_services["publish"].side_effect = None
+        resumed = list(stream_workflow("Test Company", run_id="run-1", flow=flow))
+
+        assert resumed[0] == {"event": "run", "run_id": "run-1", "resumed": True}
+        assert [(e["node"], e.get("replayed", False)) for e in resumed[1:]] == [
+            ("research", True),
+            ("financials", True),
+            ("save", False),
+        ]
+        assert resumed[1]["data"]["news"] == NEWS
+        assert mocked_services["news"].call_count == 1
+        assert mocked_services["products"].call_count == 1
+        assert mocked_services["ticker"].call_count == 1
+        assert mocked_services["publish"].call_count == 2
+
+    def test_resume_completed_run_only_replays(self, flow, mocked_services):
+        """Resuming a finished run replays outputs without executing nodes"""
+        list(stream_workflow("Test Company", run_id="run-2", flow=flow))
+        replayed = list(stream_workflow("Test Company", run_id="run-2", flow=flow))
+
+        assert all(e.get("replayed") for e in replayed[1:])
+        assert mocked_services["publish"].call_count == 1
+
+    def test_get_run_company(self, flow, mocked_services):
+        """Runs are tied to the company they were started for"""
+        list(stream_workflow("Test Company", run_id="run-3", flow=flow))
+
+        assert get_run_company("run-3", flow=flow) == "Test Company"
+        assert get_run_company("unknown-run", flow=flow) is None
+        with pytest.raises(ValueError):
+            list(stream_workflow("Other Company", run_id="run-3", flow=flow))
+
+
+class TestWorkflowDeadline:
+    """Test deadline propagation and partial results"""
+
+    def test_hanging_call_returns_partial_state(self, flow, mocked_services):
+        """A call that outlives the deadline is abandoned and flagged"""
+        def slow_ticker(company):
+            time.sleep(2)
+            return "TEST"
+
+        mocked_services["ticker"].side_effect = slow_ticker
+
+        started = time.time()
+        events = list(stream_workflow("Test Company", flow=flow, deadline=Deadline.after(0.5)))
+        elapsed = time.time() - started
+
+        updates = {e["node"]: e["data"] for e in events if e["event"] == "update"}
+        assert elapsed < 1.5
+        assert updates["research"]["product_sentiment"] == PRODUCTS
+        assert updates["research"]["timed_out"] == {"news": False, "product_sentiment": False}
+        assert updates["financials"]["timed_out"] == {"ticker": True, "stock_analysis": True}
+        assert updates["save"] == {"timed_out": {"save": True}}
+        mocked_services["stock"].assert_not_called()
+        mocked_services["publish"].assert_not_called()
+
+    def test_expired_deadline_skips_work(self, flow, mocked_services):
+        """Nodes do no work once the deadline has passed"""
+        events = list(stream_workflow("Test Company", flow=flow, deadline=Deadline.after(-1)))
+
+        updates = {e["node"]: e["data"] for e in events if e["event"] == "update"}
+        assert updates["research"]["timed_out"]["news"] is True
+        mocked_services["news"].assert_not_called()
+        mocked_services["ticker"].assert_not_called()
+
+    def test_timed_out_flags_are_merged_in_state(self, flow, mocked_services):
+        """Flags from every node end up in the final state"""
+        mocked_services["publish"].side_effect = lambda payload: time.sleep(1)
+        list(stream_workflow("Test Company", run_id="run-deadline", flow=flow,
+                             deadline=Deadline.after(0.3)))
+
+        state = flow.get_state({"configurable": {"thread_id": "run-deadline"}}).values
+        assert state["timed_out"]["save"] is True
+        assert state["timed_out"]["ticker"] is False
+
+    def test_run_workflow_honours_deadline(self, flow, mocked_services):
+        """Non-streaming runs (e.g. cache refreshes) give up at the deadline too"""
+        mocked_services["ticker"].side_effect = lambda company: time.sleep(2) or "TEST"
+
+        started = time.time()
+        state = run_workflow("Test Company", flow=flow, deadline=Deadline.after(0.5))
+
+        assert time.time() - started < 1.5
+        assert state["timed_out"]["ticker"] is True
+        assert state["product_sentiment"] == PRODUCTS
@@ -3,5 +3,6 @@ Workers package
 """
 from company_insight_service.workers.consumer import main as run_consumer
 from company_insight_service.workers.queue_utils import publish_to_queue
+from company_insight_service.workers.retention import run_retention
 
-__all__ = ['run_consumer', 'publish_to_queue']
+__all__ = ['run_consumer', 'publish_to_queue', 'run_retention']
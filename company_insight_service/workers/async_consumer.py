@@ -0,0 +1,244 @@
+"""
+Asyncio RabbitMQ consumer worker
+
+Handles up to `concurrency` messages at once per process. Messages are
+routed to a fixed lane by a stable hash of their company name and every
+lane writes sequentially, so rows for one company are written in the order
+they were queued while different companies are written concurrently.
+
+A lane drains whatever is waiting in it (up to `batch_size`) and writes it
+in one transaction with the same `write_batch` the blocking consumer uses.
+On SIGINT/SIGTERM the consumer stops taking deliveries, finishes every
+message already received and only then closes the connection.
+"""
+import asyncio
+import json
+import logging
+import signal
+import time
+import zlib
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from company_insight_service.config.settings import settings
+from company_insight_service.database.writes import write_batch
+from company_insight_service.monitoring.metrics import (
+    WORKER_MESSAGE_SECONDS,
+    WORKER_DB_WRITE_SECONDS,
+    start_metrics_server
+)
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+def partition_for(company_name: str, partitions: int) -> int:
+    """Stable lane for a company (the same in every process and run)"""
+    return zlib.crc32(company_name.encode("utf-8")) % partitions
+
+
+def session_writer(session_factory) -> Callable[[List[Dict]], Awaitable[int]]:
+    """
+    Async batch writer backed by an AsyncSession factory
+
+    The ORM work runs through `run_sync`, so it is the same code (and fires
+    the same mapper signals) as the blocking consumer.
+    """
+    async def write(payloads: List[Dict]) -> int:
+        async with session_factory() as session:
+            try:
+                rows = await session.run_sync(write_batch, payloads)
+                await session.commit()
+            except Exception:
+                await session.rollback()
+                raise
+        return rows
+    return write
+
+
+class AsyncConsumer:
+    """
+    Concurrent, per-company ordered message handler
+
+    Args:
+        write: Coroutine function storing a list of payloads in one transaction
+        concurrency: Lanes (messages written at once)
+        batch_size: Most messages a lane writes in one transaction
+    """
+
+    def __init__(
+        self,
+        write: Callable[[List[Dict]], Awaitable[int]],
+        concurrency: int = 8,
+        batch_size: int = 100
+    ):
+        self.write = write
+        self.concurrency = concurrency
+        self.batch_size = batch_size
+        self._lanes: List[asyncio.Queue] = []
+        self._tasks: List[asyncio.Task] = []
+
+    def start(self):
+        """Start the lane tasks (inside the running loop)"""
+        self._lanes = [asyncio.Queue() for _ in range(self.concurrency)]
+        self._tasks = [
+            asyncio.create_task(self._run_lane(lane), name=f"consumer-lane-{i}")
+            for i, lane in enumerate(self._lanes)
+        ]
+
+    async def on_message(self, message):
+        """Route an incoming aio_pika message to its company's lane"""
+        received_at = time.perf_counter()
+        try:
+            payload = json.loads(message.body)
+            company_name = payload["company_name"]
+            if not company_name:
+                raise ValueError("empty company_name")
+        except (ValueError, KeyError, TypeError) as e:
+            logger.error(f"Rejecting malformed message {message.delivery_tag}: {e!r}")
+            await self._settle(message, ack=False)
+            WORKER_MESSAGE_SECONDS.labels(outcome="error").observe(time.perf_counter() - received_at)
+            return
+
+        lane = self._lanes[partition_for(company_name, self.concurrency)]
+        lane.put_nowait((message, payload, received_at))
+
+    async def drain(self):
+        """Finish every routed message, then stop the lanes"""
+        await asyncio.gather(*(lane.join() for lane in self._lanes))
+        for lane in self._lanes:
+            lane.put_nowait(_STOP)
+        await asyncio.gather(*self._tasks)
+
+    def _next_batch(self, lane: asyncio.Queue, first) -> tuple:
+        """Take what is already waiting after `first`; returns (batch, stop)"""
+        batch = [first]
+        while len(batch) < self.batch_size and not lane.empty():
+            item = lane.get_nowait()
+            if item is _STOP:
+                lane.task_done()
+                return batch, True
+            batch.append(item)
+        return batch, False
+
+    async def _run_lane(self, lane: asyncio.Queue):
+        while True:
+            first = await lane.get()
+            if first is _STOP:
+                lane.task_done()
+                return
+            batch, stop = self._next_batch(lane, first)
+            try:
+                await self._write_batch(batch)
+            except Exception as e:
+                # Keep the lane alive: its companies would otherwise stop being consumed
+                logger.error(f"Lane failed handling a batch of {len(batch)}: {e}", exc_info=True)
+            finally:
+                for _ in batch:
+                    lane.task_done()
+            if stop:
+                return
+
+    async def _write_batch(self, batch: List[tuple]):
+        started = time.perf_counter()
+        try:
+            await self.write([payload for _, payload, _ in batch])
+        except Exception as e:
+            WORKER_DB_WRITE_SECONDS.labels(outcome="error").observe(time.perf_counter() - started)
+            if len(batch) > 1:
+                logger.warning(f"Batch of {len(batch)} failed ({e}); retrying messages one by one")
+                for item in batch:
+                    await self._write_batch([item])
+                return
+            message, payload, received_at = batch[0]
+            logger.error(f"Database save failed for {payload.get('company_name')}: {e}")
+            await self._settle(message, ack=False)
+            WORKER_MESSAGE_SECONDS.labels(outcome="error").observe(time.perf_counter() - received_at)
+            return
+
+        WORKER_DB_WRITE_SECONDS.labels(outcome="ok").observe(time.perf_counter() - started)
+        for message, _, received_at in batch:
+            await self._settle(message, ack=True)
+            WORKER_MESSAGE_SECONDS.labels(outcome="ok").observe(time.perf_counter() - received_at)
+
+    @staticmethod
+    async def _settle(message, ack: bool):
+        """
+        Ack or reject (without requeue) a message
+
+        Failures (e.g. the channel closed) are logged, not raised: an
+        unsettled message is redelivered once the connection recovers.
+        """
+        try:
+            if ack:
+                await message.ack()
+            else:
+                await message.reject(requeue=False)
+        except Exception as e:
+            logger.warning(f"Could not {'ack' if ack else 'reject'} message {message.delivery_tag}: {e!r}")
+
+
+async def run(stop_event: Optional[asyncio.Event] = None):
+    """
+    Consume the data save queue until stopped
+
+    Args:
+        stop_event: Set to shut down (defaults to SIGINT/SIGTERM)
+    """
+    # Imported here so the module imports without the asyncio extras installed
+    import aio_pika
+    from company_insight_service.database.async_engine import (
+        AsyncSessionLocal,
+        async_engine,
+        init_async_db
+    )
+
+    if stop_event is None:
+        stop_event = asyncio.Event()
+        loop = asyncio.get_running_loop()
+        for sig in (signal.SIGINT, signal.SIGTERM):
+            loop.add_signal_handler(sig, stop_event.set)
+
+    await init_async_db()
+
+    consumer = AsyncConsumer(
+        session_writer(AsyncSessionLocal),
+        concurrency=settings.ASYNC_CONSUMER_CONCURRENCY,
+        batch_size=settings.CONSUMER_BATCH_SIZE
+    )
+    consumer.start()
+
+    connection = await aio_pika.connect_robust(settings.RABBITMQ_URL)
+    try:
+        channel = await connection.channel()
+        await channel.set_qos(prefetch_count=settings.CONSUMER_PREFETCH)
+        queue = await channel.declare_queue(settings.RABBITMQ_QUEUE_NAME, durable=True)
+        consumer_tag = await queue.consume(consumer.on_message)
+
+        logger.info(
+            f" [*] Consuming with {consumer.concurrency} concurrent lanes. To exit press CTRL+C"
+        )
+        await stop_event.wait()
+
+        logger.info("Shutting down: no new deliveries, draining in-flight messages...")
+        await queue.cancel(consumer_tag)
+        await consumer.drain()
+    finally:
+        await connection.close()
+        await async_engine.dispose()
+    logger.info("Consumer stopped")
+
+
+def main():
+    """Async worker entry point"""
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    # The worker has no HTTP app, so it exports its metrics on its own port
+    start_metrics_server(settings.WORKER_METRICS_PORT)
+    asyncio.run(run())
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,269 @@
+"""
+Bulk backfill from NDJSON dumps of queue payloads
+
+Seeding an environment or replaying archived queue messages through
+RabbitMQ writes one small transaction per message. This command reads
+dumps of the same payloads (one JSON object per line, optionally
+gzipped) and loads them BACKFILL_CHUNK_PAYLOADS at a time:
+
+- On PostgreSQL each chunk's rows are streamed with COPY into temporary
+  staging tables and merged into the real tables with one set-based
+  INSERT ... SELECT ... ON CONFLICT per table (the latest payload wins,
+  as with the consumers).
+- Other databases fall back to the consumers' write_batch.
+
+Each chunk is its own transaction and only one chunk is held in memory.
+The daily sentiment rollups are refreshed per chunk; the COPY path only
+announces new companies. A payload may carry its original `created_at`
+(ISO 8601, UTC); otherwise rows are stamped with the load time.
+
+    python -m company_insight_service.workers.backfill dump.ndjson [more.ndjson.gz ...]
+"""
+import argparse
+import csv
+import gzip
+import io
+import json
+import logging
+import sys
+import time
+from datetime import datetime
+from typing import Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from sqlalchemy import text
+from sqlalchemy.orm import Session
+
+from company_insight_service.config.settings import settings
+from company_insight_service.database.models import ProductSentiment, SessionLocal, StockAnalysis, init_db
+from company_insight_service.database.writes import (
+    PRODUCT_SENTIMENT_KEY,
+    STOCK_ANALYSIS_KEY,
+    payload_time,
+    product_rows,
+    refresh_rollups,
+    resolve_companies,
+    stock_rows,
+    write_batch
+)
+
+logger = logging.getLogger(__name__)
+
+# Staging table per model (temporary, emptied on commit)
+STAGING_TABLES = {
+    ProductSentiment: "backfill_product_sentiments",
+    StockAnalysis: "backfill_stock_analyses",
+}
+
+
+def read_payloads(paths: Iterable[str], invalid: Optional[List[int]] = None) -> Iterator[Dict]:
+    """
+    Yield payloads from NDJSON files ("-" reads stdin, *.gz is decompressed)
+
+    Blank lines are skipped; lines that are not JSON objects with a
+    company_name are logged and counted in `invalid` (a one-item list).
+    """
+    for path in paths:
+        if path == "-":
+            stream = sys.stdin
+        elif path.endswith(".gz"):
+            stream = gzip.open(path, "rt", encoding="utf-8")
+        else:
+            stream = open(path, encoding="utf-8")
+        try:
+            for number, line in enumerate(stream, 1):
+                if not line.strip():
+                    continue
+                try:
+                    payload = json.loads(line)
+                    if not isinstance(payload, dict) or not payload.get("company_name"):
+                        raise ValueError("not a payload with a company_name")
+                except ValueError as e:
+                    logger.warning(f"Skipping {path}:{number}: {e}")
+                    if invalid is not None:
+                        invalid[0] += 1
+                    continue
+                yield payload
+        finally:
+            if stream is not sys.stdin:
+                stream.close()
+
+
+def chunked(payloads: Iterable[Dict], size: int) -> Iterator[List[Dict]]:
+    chunk = []
+    for payload in payloads:
+        chunk.append(payload)
+        if len(chunk) >= size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def _csv_value(value):
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    return value
+
+
+def copy_rows(session: Session, table: str, columns: List[str], rows: List[Dict]):
+    """COPY rows into `table` through the session's connection (psycopg2 or psycopg 3)"""
+    buffer = io.StringIO()
+    # Unquoted empty fields are NULL in COPY's CSV format; quoted ones are ''
+    writer = csv.writer(buffer, quoting=csv.QUOTE_NOTNULL, lineterminator="\n")
+    for seq, row in enumerate(rows):
+        writer.writerow([*(_csv_value(row[column]) for column in columns), seq])
+    buffer.seek(0)
+
+    sql = f"COPY {table} ({', '.join(columns)}, seq) FROM STDIN WITH (FORMAT csv)"
+    driver_connection = session.connection().connection.driver_connection
+    with driver_connection.cursor() as cursor:
+        if hasattr(cursor, "copy_expert"):
+            cursor.copy_expert(sql, buffer)
+        else:
+            with cursor.copy(sql) as copy:
+                copy.write(buffer.getvalue())
+
+
+def _create_staging(session: Session, model, columns: List[str]):
+    session.execute(text(
+        f"CREATE TEMP TABLE IF NOT EXISTS {STAGING_TABLES[model]} ON COMMIT DELETE ROWS AS "
+        f"SELECT {', '.join(columns)}, 0::bigint AS seq FROM {model.__tablename__} WITH NO DATA"
+    ))
+
+
+def _merge_sql(model, columns: List[str], key: Tuple[str, ...], partitioned: bool) -> List[str]:
+    """
+    Set-based merge of a staging table into `model`'s table
+
+    The newest staged row (highest seq) per key wins, existing rows keep
+    their created_at, and rows with a NULL key part are always inserted.
+    """
+    table, staging = model.__tablename__, STAGING_TABLES[model]
+    column_list = ", ".join(columns)
+    has_key = " AND ".join(f"{column} IS NOT NULL" for column in key)
+    latest = (
+        f"SELECT DISTINCT ON ({', '.join(key)}) {column_list} FROM {staging} WHERE {has_key} "
+        f"ORDER BY {', '.join(key)}, seq DESC"
+    )
+    updated = [column for column in columns if column not in key and column != "created_at"]
+    null_keys = f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM {staging} WHERE NOT ({has_key})"
+
+    if not partitioned:
+        return [
+            f"INSERT INTO {table} ({column_list}) {latest} "
+            f"ON CONFLICT ({', '.join(key)}) DO UPDATE SET "
+            + ", ".join(f"{column} = EXCLUDED.{column}" for column in updated),
+            null_keys,
+        ]
+    # A partitioned table has no unique index to conflict on
+    matches = " AND ".join(f"t.{column} = s.{column}" for column in key)
+    return [
+        f"UPDATE {table} t SET {', '.join(f'{column} = s.{column}' for column in updated)} "
+        f"FROM ({latest}) s WHERE {matches}",
+        f"INSERT INTO {table} ({column_list}) SELECT {column_list} FROM ({latest}) s "
+        f"WHERE NOT EXISTS (SELECT 1 FROM {table} t WHERE {matches})",
+        null_keys,
+    ]
+
+
+def _rollup_buckets(session: Session) -> set:
+    """(company_id, day) of the product sentiments the staged rows landed in"""
+    staging = STAGING_TABLES[ProductSentiment]
+    return set(session.execute(text(
+        f"SELECT DISTINCT t.company_id, CAST(t.created_at AS DATE) FROM product_sentiments t "
+        f"JOIN {staging} s ON t.company_id = s.company_id AND t.source_url = s.source_url "
+        f"UNION SELECT DISTINCT company_id, CAST(created_at AS DATE) FROM {staging} WHERE source_url IS NULL"
+    )).all())
+
+
+def copy_chunk(session: Session, payloads: List[Dict]) -> int:
+    """
+    Stage one chunk with COPY and merge it (PostgreSQL); the caller commits
+
+    Returns:
+        Number of staged rows
+    """
+    company_ids = resolve_companies(session, (payload["company_name"] for payload in payloads))
+    now = datetime.utcnow()
+    rows = {ProductSentiment: [], StockAnalysis: []}
+    for payload in payloads:
+        company_id = company_ids[payload["company_name"]]
+        written_at = payload_time(payload, now)
+        rows[ProductSentiment].extend(product_rows(payload, company_id, written_at))
+        rows[StockAnalysis].extend(stock_rows(payload, company_id, written_at))
+
+    keys = {ProductSentiment: PRODUCT_SENTIMENT_KEY, StockAnalysis: STOCK_ANALYSIS_KEY}
+    for model, model_rows in rows.items():
+        if not model_rows:
+            continue
+        columns = list(model_rows[0])
+        _create_staging(session, model, columns)
+        copy_rows(session, STAGING_TABLES[model], columns, model_rows)
+        partitioned = model is ProductSentiment and settings.PRODUCT_SENTIMENTS_PARTITIONED
+        for statement in _merge_sql(model, columns, keys[model], partitioned):
+            session.execute(text(statement))
+
+    if rows[ProductSentiment]:
+        refresh_rollups(session, _rollup_buckets(session))
+    return sum(len(model_rows) for model_rows in rows.values())
+
+
+def backfill(paths: Iterable[str], session_factory: Callable[[], Session] = SessionLocal,
+             chunk_size: Optional[int] = None) -> Dict[str, float]:
+    """
+    Load NDJSON payload dumps into the database
+
+    Args:
+        paths: NDJSON files ("-" for stdin)
+        session_factory: Session factory for the database
+        chunk_size: Payloads per transaction (BACKFILL_CHUNK_PAYLOADS by default)
+
+    Returns:
+        Totals: payloads, rows, invalid (skipped lines), seconds
+    """
+    chunk_size = chunk_size or settings.BACKFILL_CHUNK_PAYLOADS
+    invalid = [0]
+    totals = {"payloads": 0, "rows": 0}
+    started = time.perf_counter()
+
+    for chunk in chunked(read_payloads(paths, invalid), chunk_size):
+        with session_factory() as session:
+            if session.get_bind().dialect.name == "postgresql":
+                rows = copy_chunk(session, chunk)
+            else:
+                rows = write_batch(session, chunk)
+            session.commit()
+
+        totals["payloads"] += len(chunk)
+        totals["rows"] += rows
+        elapsed = time.perf_counter() - started
+        logger.info(
+            f"{totals['payloads']} payloads, {totals['rows']} rows in {elapsed:.1f}s "
+            f"({totals['payloads'] / elapsed:.0f} payloads/s, {totals['rows'] / elapsed:.0f} rows/s)"
+        )
+
+    return {**totals, "invalid": invalid[0], "seconds": time.perf_counter() - started}
+
+
+def main(argv: Optional[List[str]] = None):
+    parser = argparse.ArgumentParser(description="Bulk load NDJSON dumps of queue payloads")
+    parser.add_argument("paths", nargs="+", help="NDJSON files (.gz accepted, - for stdin)")
+    parser.add_argument("--chunk-size", type=int, help="Payloads per transaction")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    init_db()
+    totals = backfill(args.paths, chunk_size=args.chunk_size)
+    print(
+        f"Loaded {totals['payloads']} payloads ({totals['rows']} rows, {totals['invalid']} invalid lines) "
+        f"in {totals['seconds']:.1f}s"
+    )
+
+
+if __name__ == '__main__':
+    main()
@@ -7,14 +7,20 @@ import json
 import logging
 import sys
 import os
+import time
+from typing import Dict, List
 from company_insight_service.config.settings import settings, BaseSettings
 from company_insight_service.config.settings import settings
-from company_insight_service.database.models import (
-    SessionLocal, Company, ProductSentiment, StockAnalysis, init_db
-)
+from company_insight_service.database.models import SessionLocal, init_db
+from company_insight_service.database.writes import write_batch
 
 # Import signals to register event listeners
 from company_insight_service.core import signals
+from company_insight_service.monitoring.metrics import (
+    WORKER_MESSAGE_SECONDS,
+    WORKER_DB_WRITE_SECONDS,
+    start_metrics_server
+)
 
 # Configure logging
 logging.basicConfig(
@@ -24,6 +30,19 @@ logging.basicConfig(
 logger = logging.getLogger(__name__)
 
 
+def _write_payloads(payloads: List[Dict], session_factory=SessionLocal):
+    """Write payloads in one transaction"""
+    db = session_factory()
+    try:
+        write_batch(db, payloads)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    finally:
+        db.close()
+
+
 def save_data_to_db(data: dict):
     """
     Save company data to database
@@ -33,54 +52,111 @@ def save_data_to_db(data: dict):
     """
     logger.info("Processing message from queue...")
     
+    started = time.perf_counter()
+    outcome = "error"
     try:
-        db = SessionLocal()
-        company_name = data.get('company_name')
+        _write_payloads([data])
+        outcome = "ok"
+        logger.info(f"Successfully saved data for {data.get('company_name')}")
+    except Exception as e:
+        logger.error(f"Database save failed: {e}")
+    finally:
+        WORKER_DB_WRITE_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - started)
+
+
+class BatchingConsumer:
+    """
+    Accumulates deliveries and writes them in one transaction
+    
+    A batch is flushed once it holds `batch_size` messages or its oldest
+    message has waited `max_wait` seconds. A written batch is acked with a
+    single `multiple=True` ack. If the batch write fails, its messages are
+    retried one by one; messages that still fail (or are not valid JSON)
+    are rejected without requeue.
+    """
+    
+    def __init__(self, channel, batch_size: int, max_wait: float, session_factory=SessionLocal):
+        self.channel = channel
+        self.batch_size = batch_size
+        self.max_wait = max_wait
+        self.session_factory = session_factory
+        self._batch: List[tuple] = []  # (delivery_tag, body, received_at)
+    
+    def on_message(self, method, body: bytes):
+        self._batch.append((method.delivery_tag, body, time.perf_counter()))
+        if len(self._batch) >= self.batch_size:
+            self.flush()
+    
+    def due(self) -> bool:
+        """Whether the oldest pending message has waited long enough"""
+        return bool(self._batch) and time.perf_counter() - self._batch[0][2] >= self.max_wait
+    
+    def flush(self):
+        """Write and ack the pending batch"""
+        batch, self._batch = self._batch, []
+        if not batch:
+            return
         
-        if not company_name:
-            logger.error("No company_name in message")
+        parsed = []
+        for delivery_tag, body, received_at in batch:
+            try:
+                parsed.append((delivery_tag, json.loads(body), received_at))
+            except ValueError as e:
+                logger.error(f"Rejecting malformed message {delivery_tag}: {e}")
+                self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+                self._observe_message(received_at, "error")
+        if not parsed:
             return
-            
-        # Check if company exists or create
-        company = db.query(Company).filter(Company.name == company_name).first()
-        if not company:
-            company = Company(name=company_name)
-            db.add(company)
-            db.commit()
-            db.refresh(company)
         
-        # Save Product Sentiments
-        product_sentiments = data.get('product_sentiment', [])
-        for prod in product_sentiments:
-            sentiment = ProductSentiment(
-                company_id=company.id,
-                product_name=prod.get('title', 'Unknown'),
-                sentiment_score=prod.get('sentiment_score', 0.0),
-                sentiment_label=prod.get('sentiment_label', 'Neutral'),
-                similarity_score=prod.get('similarity_score', None),
-                summary=prod.get('summary', ''),
-                source_url=prod.get('link', '')
-            )
-            db.add(sentiment)
-            
-        # Save Stock Analysis
-        stock_analysis = data.get('stock_analysis')
-        ticker = data.get('ticker')
-        if stock_analysis:
-            analysis = StockAnalysis(
-                company_id=company.id,
-                ticker=ticker,
-                analysis_text=f"Trend: {stock_analysis.get('overall_change_percent', 0)}%",
-                three_year_trend=stock_analysis
-            )
-            db.add(analysis)
-            
-        db.commit()
-        db.close()
-        logger.info(f"Successfully saved data for {company_name}")
+        started = time.perf_counter()
+        try:
+            _write_payloads([payload for _, payload, _ in parsed], self.session_factory)
+        except Exception as e:
+            WORKER_DB_WRITE_SECONDS.labels(outcome="error").observe(time.perf_counter() - started)
+            logger.warning(f"Batch of {len(parsed)} failed ({e}); retrying messages one by one")
+            self._flush_individually(parsed)
+            return
         
-    except Exception as e:
-        logger.error(f"Database save failed: {e}")
+        WORKER_DB_WRITE_SECONDS.labels(outcome="ok").observe(time.perf_counter() - started)
+        self.channel.basic_ack(delivery_tag=parsed[-1][0], multiple=True)
+        for _, _, received_at in parsed:
+            self._observe_message(received_at, "ok")
+        logger.info(f"Saved batch of {len(parsed)} messages")
+    
+    def shutdown(self):
+        """
+        Flush the pending batch if the channel is still open
+        
+        Once the channel (or its connection) is gone the batch could be
+        written but not acked, so it is left alone: the broker redelivers
+        the unacked messages and the idempotent upserts absorb the repeat.
+        """
+        if not self._batch:
+            return
+        if not self.channel.is_open:
+            logger.info(f"Channel closed; leaving {len(self._batch)} unacked messages for redelivery")
+            self._batch = []
+            return
+        self.flush()
+    
+    def _flush_individually(self, parsed: List[tuple]):
+        for delivery_tag, payload, received_at in parsed:
+            started = time.perf_counter()
+            try:
+                _write_payloads([payload], self.session_factory)
+            except Exception as e:
+                WORKER_DB_WRITE_SECONDS.labels(outcome="error").observe(time.perf_counter() - started)
+                logger.error(f"Database save failed for message {delivery_tag}: {e}")
+                self.channel.basic_nack(delivery_tag=delivery_tag, requeue=False)
+                self._observe_message(received_at, "error")
+                continue
+            WORKER_DB_WRITE_SECONDS.labels(outcome="ok").observe(time.perf_counter() - started)
+            self.channel.basic_ack(delivery_tag=delivery_tag)
+            self._observe_message(received_at, "ok")
+    
+    @staticmethod
+    def _observe_message(received_at: float, outcome: str):
+        WORKER_MESSAGE_SECONDS.labels(outcome=outcome).observe(time.perf_counter() - received_at)
 
 
 def main():
@@ -88,25 +164,37 @@ def main():
     # Ensure tables exist
     init_db()
     
+    # The worker has no HTTP app, so it exports its metrics on its own port
+    start_metrics_server(settings.WORKER_METRICS_PORT)
+    
     params = pika.URLParameters(settings.RABBITMQ_URL)
     connection = pika.BlockingConnection(params)
     channel = connection.channel()
     
     channel.queue_declare(queue=settings.RABBITMQ_QUEUE_NAME, durable=True)
+    channel.basic_qos(prefetch_count=settings.CONSUMER_PREFETCH)
     
-    def callback(ch, method, properties, body):
-        message = json.loads(body)
-        save_data_to_db(message)
-        ch.basic_ack(delivery_tag=method.delivery_tag)
-
-    channel.basic_qos(prefetch_count=1)
-    channel.basic_consume(
-        queue=settings.RABBITMQ_QUEUE_NAME,
-        on_message_callback=callback
+    consumer = BatchingConsumer(
+        channel,
+        batch_size=settings.CONSUMER_BATCH_SIZE,
+        max_wait=settings.CONSUMER_BATCH_MAX_WAIT_MS / 1000
     )
-
+    
     logger.info(' [*] Waiting for messages. To exit press CTRL+C')
-    channel.start_consuming()
+    try:
+        # Wake up at least twice per max wait so partial batches are flushed on time
+        for method, properties, body in channel.consume(
+            settings.RABBITMQ_QUEUE_NAME,
+            inactivity_timeout=consumer.max_wait / 2
+        ):
+            if method is not None:
+                consumer.on_message(method, body)
+            if consumer.due():
+                consumer.flush()
+    finally:
+        consumer.shutdown()
+        if connection.is_open:
+            connection.close()
 
 
 if __name__ == '__main__':
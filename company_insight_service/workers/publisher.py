@@ -0,0 +1,386 @@
+"""
+Long-lived RabbitMQ publisher with asynchronous publisher confirms
+
+One background thread owns one SelectConnection (pika connections are not
+thread-safe) and its I/O loop; callers on any thread hand messages over
+through a bounded queue and wait on a Future.
+
+The channel is in confirm mode. Messages are published without waiting,
+up to `max_in_flight` unconfirmed at a time, and the broker acknowledges
+them in batches (one Basic.Ack with `multiple` covers every message up to
+its delivery tag), so concurrent publishers share the broker round trip
+and fsync instead of paying one per message. A future resolves when its
+message is confirmed. Messages still unconfirmed when the connection drops
+are republished on a new connection.
+
+Once the I/O thread stops (after close, or because it failed) every
+message still waiting fails, and later publishes fail immediately.
+"""
+import atexit
+import logging
+import threading
+import time
+from collections import OrderedDict, deque
+from concurrent.futures import Future
+from typing import Callable, Deque, List, Optional
+
+import pika
+from pika.spec import Basic
+
+from company_insight_service.config.settings import settings
+
+logger = logging.getLogger(__name__)
+
+_STOP = object()
+
+
+class PublishError(Exception):
+    """Raised when a message could not be handed to the broker"""
+
+
+class _Message:
+    __slots__ = ("body", "future")
+
+    def __init__(self, body: bytes):
+        self.body = body
+        self.future: Future = Future()
+
+
+def default_connection_factory(on_open: Callable, on_open_error: Callable,
+                               on_close: Callable) -> pika.SelectConnection:
+    """Connect to the configured broker (asynchronously; `on_open` fires once connected)"""
+    return pika.SelectConnection(
+        pika.URLParameters(settings.RABBITMQ_URL),
+        on_open_callback=on_open,
+        on_open_error_callback=on_open_error,
+        on_close_callback=on_close
+    )
+
+
+class QueuePublisher:
+    """
+    Thread-safe publisher over one persistent channel in confirm mode
+
+    Args:
+        queue_name: Durable queue to publish to
+        max_in_flight: Most published messages awaiting a broker confirm
+        max_pending: Messages that may wait for the channel before publish blocks
+        max_retries: Reconnects in a row before unconfirmed messages fail
+        retry_backoff: Seconds before the first reconnect (doubled each time)
+        connection_factory: Callable(on_open, on_open_error, on_close)
+            returning a pika SelectConnection-compatible connection
+    """
+
+    def __init__(
+        self,
+        queue_name: str,
+        max_in_flight: int = 1000,
+        max_pending: int = 1000,
+        max_retries: int = 3,
+        retry_backoff: float = 0.5,
+        connection_factory: Callable = default_connection_factory
+    ):
+        self.queue_name = queue_name
+        self.max_in_flight = max_in_flight
+        self.max_pending = max_pending
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.connection_factory = connection_factory
+        # Messages waiting for the channel; the condition also guards _closed
+        # and _stopped, so nothing is queued after close or once the thread is gone
+        self._pending: Deque = deque()
+        self._pending_changed = threading.Condition()
+        self._closed = False
+        self._stopped: Optional[str] = None  # Why the I/O thread exited
+        self._lock = threading.Lock()
+        self._thread: Optional[threading.Thread] = None
+        # Owned by the I/O thread
+        self._connection = None  # Set (under _lock) only while the channel is ready
+        self._channel = None
+        self._wake_scheduled = False
+        self._in_flight: "OrderedDict[int, _Message]" = OrderedDict()
+        self._next_tag = 0
+        self._retry: List[_Message] = []  # Taken off the queue, not yet confirmed
+        self._failures = 0
+        self._stopping = False
+        self._closing = False
+
+    def publish(self, body: bytes, timeout: Optional[float] = None):
+        """
+        Publish a message and wait until the broker has confirmed it
+
+        Args:
+            body: Message body
+            timeout: Seconds to wait for queue space and the confirm
+
+        Raises:
+            PublishError: If the message was not confirmed in time or the
+                broker kept failing
+        """
+        future = self.publish_async(body, timeout=timeout)
+        try:
+            future.result(timeout=timeout)
+        except PublishError:
+            raise
+        except Exception as e:
+            raise PublishError(f"Publish not confirmed: {e!r}") from e
+
+    def publish_async(self, body: bytes, timeout: Optional[float] = None) -> Future:
+        """
+        Queue a message for publishing
+
+        Returns:
+            Future resolved once the broker confirms the message
+
+        Raises:
+            PublishError: If the publisher is closed or stopped, or its
+                queue stays full
+        """
+        message = _Message(body)
+        with self._pending_changed:
+            has_room = self._pending_changed.wait_for(
+                lambda: self._closed or self._stopped or len(self._pending) < self.max_pending, timeout
+            )
+            if self._closed:
+                raise PublishError("Publisher is closed")
+            if self._stopped:
+                raise PublishError(f"Publisher stopped: {self._stopped}")
+            if not has_room:
+                raise PublishError(f"Publish queue full ({self.max_pending} pending)")
+            self._ensure_started()
+            self._pending.append(message)
+            self._pending_changed.notify_all()
+        self._wake()
+        return message.future
+
+    def close(self, timeout: Optional[float] = 10):
+        """Publish what is already queued, wait for its confirms, then close the connection"""
+        with self._pending_changed:
+            if self._closed:
+                return
+            self._closed = True
+            # Queued last, so everything accepted before close goes out first
+            self._pending.append(_STOP)
+            self._pending_changed.notify_all()
+        with self._lock:
+            thread = self._thread
+        if thread is None:
+            return
+        self._wake()
+        thread.join(timeout)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is not None:
+                return
+            self._thread = threading.Thread(target=self._run, name="amqp-publisher", daemon=True)
+            self._thread.start()
+
+    def _wake(self):
+        """Have the I/O loop pick up queued messages (from any thread)"""
+        with self._lock:
+            if self._connection is None or self._wake_scheduled:
+                return
+            self._wake_scheduled = True
+            connection = self._connection
+        connection.ioloop.add_callback_threadsafe(self._drain)
+
+    # Everything below runs on the I/O thread
+
+    def _run(self):
+        try:
+            self._loop()
+        except Exception as e:
+            logger.error(f"Publisher I/O thread failed: {e}", exc_info=True)
+            self._stop(f"I/O thread failed: {e!r}")
+        else:
+            self._stop("closed")
+
+    def _stop(self, reason: str):
+        """Fail every message not yet confirmed; later publishes fail at once"""
+        with self._pending_changed:
+            self._stopped = reason
+            waiting = [message for message in self._pending if message is not _STOP]
+            self._pending.clear()
+            self._pending_changed.notify_all()
+        with self._lock:
+            self._connection = None
+        unconfirmed = [*self._in_flight.values(), *self._retry, *waiting]
+        self._in_flight.clear()
+        self._retry = []
+        for message in unconfirmed:
+            if not message.future.done():
+                message.future.set_exception(PublishError(f"Publisher stopped: {reason}"))
+
+    def _take(self, block: bool = False):
+        """Next queued message (or _STOP); None if there is none and not blocking"""
+        with self._pending_changed:
+            if block:
+                self._pending_changed.wait_for(lambda: self._pending)
+            elif not self._pending:
+                return None
+            message = self._pending.popleft()
+            self._pending_changed.notify_all()
+            return message
+
+    def _loop(self):
+        while True:
+            if not self._retry:
+                # Idle: connect again only once there is something to send
+                first = self._take(block=True)
+                if first is _STOP:
+                    break
+                self._retry.append(first)
+            failures = self._failures
+            connection = self.connection_factory(self._on_open, self._on_open_error, self._on_closed)
+            connection.ioloop.start()
+            connection.ioloop.close()
+            if self._stopping and not self._retry:
+                break
+            if self._failures > failures:
+                time.sleep(self.retry_backoff * 2 ** (self._failures - 1))
+
+    def _on_open(self, connection):
+        connection.channel(on_open_callback=lambda channel: self._on_channel_open(connection, channel))
+
+    def _on_channel_open(self, connection, channel):
+        channel.add_on_close_callback(lambda channel, reason: self._on_channel_closed(connection, reason))
+        channel.queue_declare(
+            queue=self.queue_name,
+            durable=True,
+            callback=lambda frame: channel.confirm_delivery(
+                ack_nack_callback=self._on_confirm,
+                callback=lambda frame: self._on_ready(connection, channel)
+            )
+        )
+
+    def _on_ready(self, connection, channel):
+        logger.info(f"Publisher connected to queue: {self.queue_name}")
+        self._channel = channel
+        self._next_tag = 0
+        with self._lock:
+            self._connection = connection
+        self._drain()
+
+    def _on_channel_closed(self, connection, reason):
+        if not self._closing and connection.is_open:
+            logger.warning(f"Publisher channel closed: {reason}")
+            connection.close()
+
+    def _drain(self):
+        """Publish retried, then queued messages while the in-flight window has room"""
+        with self._lock:
+            self._wake_scheduled = False
+        if self._channel is None:
+            return
+        while len(self._in_flight) < self.max_in_flight:
+            if self._retry:
+                message = self._retry.pop(0)
+            elif self._stopping:
+                break
+            else:
+                message = self._take()
+                if message is None:
+                    break
+                if message is _STOP:
+                    self._stopping = True
+                    break
+            self._channel.basic_publish(
+                exchange='',
+                routing_key=self.queue_name,
+                body=message.body,
+                properties=pika.BasicProperties(
+                    delivery_mode=2,  # Make message persistent
+                )
+            )
+            self._next_tag += 1
+            self._in_flight[self._next_tag] = message
+        if self._stopping and not self._in_flight and not self._retry:
+            self._close_connection()
+
+    def _on_confirm(self, frame):
+        method = frame.method
+        if method.multiple:
+            tags = [tag for tag in self._in_flight if tag <= method.delivery_tag]
+        else:
+            tags = [method.delivery_tag] if method.delivery_tag in self._in_flight else []
+        acked = isinstance(method, Basic.Ack)
+        for tag in tags:
+            message = self._in_flight.pop(tag)
+            if acked:
+                message.future.set_result(None)
+            else:
+                message.future.set_exception(PublishError("Broker rejected the message (nack)"))
+        if acked:
+            self._failures = 0
+        self._drain()
+
+    def _on_open_error(self, connection, error):
+        self._connection_lost(connection, error)
+
+    def _on_closed(self, connection, reason):
+        self._connection_lost(connection, reason)
+
+    def _connection_lost(self, connection, reason):
+        with self._lock:
+            self._connection = None
+            self._wake_scheduled = False
+        self._channel = None
+        # Unconfirmed messages go out again, in their original order
+        self._retry = [*self._in_flight.values(), *self._retry]
+        self._in_flight.clear()
+        if self._closing:
+            self._closing = False
+        else:
+            self._failures += 1
+            if self._failures > self.max_retries and self._retry:
+                logger.error(
+                    f"Dropping {len(self._retry)} unconfirmed messages after {self._failures} attempts: {reason}"
+                )
+                for message in self._retry:
+                    message.future.set_exception(PublishError(str(reason)))
+                self._retry = []
+                self._failures = 0
+            elif self._retry:
+                logger.warning(f"Publisher connection lost ({reason}); reconnecting (attempt {self._failures})")
+            else:
+                # Nothing unconfirmed: reconnect when the next message comes
+                logger.warning(f"Publisher connection lost while idle: {reason}")
+                self._failures = 0
+        connection.ioloop.stop()
+
+    def _close_connection(self):
+        with self._lock:
+            connection, self._connection = self._connection, None
+        if connection is not None and connection.is_open:
+            self._closing = True
+            connection.close()
+
+
+_publisher: Optional[QueuePublisher] = None
+_publisher_lock = threading.Lock()
+
+
+def get_publisher() -> QueuePublisher:
+    """The process-wide publisher for the data save queue (created on first use)"""
+    global _publisher
+    with _publisher_lock:
+        if _publisher is None:
+            _publisher = QueuePublisher(
+                settings.RABBITMQ_QUEUE_NAME,
+                max_in_flight=settings.RABBITMQ_PUBLISH_MAX_IN_FLIGHT,
+                max_pending=settings.RABBITMQ_PUBLISH_MAX_PENDING
+            )
+        return _publisher
+
+
+def shutdown_publisher(timeout: Optional[float] = 10):
+    """Flush and close the process-wide publisher"""
+    global _publisher
+    with _publisher_lock:
+        publisher, _publisher = _publisher, None
+    if publisher is not None:
+        publisher.close(timeout)
+
+
+atexit.register(shutdown_publisher)
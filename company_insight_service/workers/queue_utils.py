@@ -1,11 +1,14 @@
 """
 RabbitMQ queue utilities
 """
-import pika
 import json
 import logging
 
 from company_insight_service.config.settings import settings
+from company_insight_service.monitoring.metrics import QUEUE_PUBLISH_SECONDS
+from company_insight_service.monitoring.timing import span
+from company_insight_service.services.deadline import time_budget
+from company_insight_service.workers.publisher import get_publisher
 
 logger = logging.getLogger(__name__)
 
@@ -14,26 +17,19 @@ def publish_to_queue(data: dict):
     """
     Publish data to RabbitMQ queue
     
+    Uses the process-wide persistent publisher and returns once the broker
+    has confirmed the message.
+    
     Args:
         data: Dictionary to publish to queue
     """
     try:
-        params = pika.URLParameters(settings.RABBITMQ_URL)
-        connection = pika.BlockingConnection(params)
-        channel = connection.channel()
-        
-        channel.queue_declare(queue=settings.RABBITMQ_QUEUE_NAME, durable=True)
-        
-        channel.basic_publish(
-            exchange='',
-            routing_key=settings.RABBITMQ_QUEUE_NAME,
-            body=json.dumps(data),
-            properties=pika.BasicProperties(
-                delivery_mode=2,  # Make message persistent
+        with span("rabbitmq", "publish"), \
+             QUEUE_PUBLISH_SECONDS.labels(queue=settings.RABBITMQ_QUEUE_NAME).time():
+            get_publisher().publish(
+                json.dumps(data).encode(),
+                timeout=time_budget(settings.RABBITMQ_PUBLISH_TIMEOUT)
             )
-        )
-        
-        connection.close()
         logger.info(f"Published message to queue: {settings.RABBITMQ_QUEUE_NAME}")
         
     except Exception as e:
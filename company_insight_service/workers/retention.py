@@ -0,0 +1,229 @@
+"""
+Retention worker for historical insight tables
+
+Every deep search appends another stock analysis (one per ticker per day)
+and financial snapshot, so old history is thinned out per policy: all rows
+are kept for RETENTION_KEEP_ALL_DAYS, then the latest row per company (and
+ticker or period) per week, and past RETENTION_WEEKLY_DAYS the latest per
+month. Raw product sentiments can be expired outright after
+PRODUCT_SENTIMENTS_MAX_AGE_DAYS, a whole day at a time; their daily
+rollups are kept.
+
+Rows are found per company through the (company_id, created_at, id)
+indexes and deleted RETENTION_BATCH_SIZE at a time, each batch in its own
+short transaction, so no run holds long locks.
+
+    python -m company_insight_service.workers.retention [--once] [--dry-run]
+"""
+import argparse
+import logging
+import time
+from datetime import date, datetime, timedelta
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Tuple
+
+from sqlalchemy import delete, select
+from sqlalchemy.orm import Session
+
+from company_insight_service.config.settings import settings
+from company_insight_service.database.models import (
+    Company,
+    FinancialReport,
+    ProductSentiment,
+    SessionLocal,
+    StockAnalysis
+)
+from company_insight_service.database.partitioning import month_start
+
+logger = logging.getLogger(__name__)
+
+PERIODS = ("week", "month")
+
+
+class Tier(NamedTuple):
+    """Rows older than `after_days` are kept one per group per `period`"""
+    after_days: int
+    period: str
+
+
+class RetentionPolicy(NamedTuple):
+    model: type
+    group_by: Tuple[str, ...] = ()  # Columns (besides the period) a kept row represents
+    tiers: Tuple[Tier, ...] = ()  # Ordered by after_days
+    max_age_days: int = 0  # Rows older than this are deleted (0 = never)
+
+
+def default_policies() -> List[RetentionPolicy]:
+    """Policies from the RETENTION_* settings"""
+    tiers = (Tier(settings.RETENTION_KEEP_ALL_DAYS, "week"), Tier(settings.RETENTION_WEEKLY_DAYS, "month"))
+    return [
+        RetentionPolicy(StockAnalysis, ("company_id", "ticker"), tiers),
+        RetentionPolicy(FinancialReport, ("company_id", "period"), tiers),
+        RetentionPolicy(ProductSentiment, max_age_days=settings.PRODUCT_SENTIMENTS_MAX_AGE_DAYS),
+    ]
+
+
+def period_start(day: date, period: str) -> date:
+    """First day of the week (Monday) or month containing `day`"""
+    if period == "week":
+        return day - timedelta(days=day.weekday())
+    if period == "month":
+        return month_start(day)
+    raise ValueError(f"Unknown retention period: {period} (expected one of {', '.join(PERIODS)})")
+
+
+def tier_ranges(tiers: Tuple[Tier, ...], now: datetime) -> Iterator[Tuple[Tier, Optional[datetime], datetime]]:
+    """
+    (tier, start, end) created_at ranges each tier thins out
+
+    Ends are aligned to the tier's period, so only complete weeks or
+    months are downsampled; the oldest tier has no start.
+    """
+    ends = [
+        datetime.combine(period_start((now - timedelta(days=tier.after_days)).date(), tier.period), datetime.min.time())
+        for tier in tiers
+    ]
+    for i, tier in enumerate(tiers):
+        start = ends[i + 1] if i + 1 < len(tiers) else None
+        if start is None or start < ends[i]:
+            yield tier, start, ends[i]
+
+
+def surplus_ids(rows, group_by: Tuple[str, ...], period: str) -> List[int]:
+    """IDs of all but the newest row per group and period (rows ordered newest first)"""
+    seen = set()
+    surplus = []
+    for row in rows:
+        key = (*(getattr(row, column) for column in group_by), period_start(row.created_at.date(), period))
+        if key in seen:
+            surplus.append(row.id)
+        else:
+            seen.add(key)
+    return surplus
+
+
+class RetentionRun:
+    """One pass of the policies, deleting in batches and counting what went"""
+
+    def __init__(self, session_factory: Callable[[], Session] = SessionLocal,
+                 batch_size: Optional[int] = None, dry_run: bool = False):
+        self.session_factory = session_factory
+        self.batch_size = batch_size or settings.RETENTION_BATCH_SIZE
+        self.dry_run = dry_run
+        self.deleted: Dict[str, Dict[str, int]] = {}
+
+    def _delete(self, model, ids: List[int], reason: str):
+        counts = self.deleted.setdefault(model.__tablename__, {"downsampled": 0, "expired": 0})
+        for start in range(0, len(ids), self.batch_size):
+            chunk = ids[start:start + self.batch_size]
+            if not self.dry_run:
+                with self.session_factory() as session:
+                    session.execute(delete(model).where(model.id.in_(chunk)))
+                    session.commit()
+            counts[reason] += len(chunk)
+
+    def downsample(self, policy: RetentionPolicy, company_id: int, now: datetime):
+        model = policy.model
+        columns = [model.id, model.created_at, *(getattr(model, column) for column in policy.group_by)]
+        for tier, start, end in tier_ranges(policy.tiers, now):
+            stmt = (
+                select(*columns)
+                .where(model.company_id == company_id, model.created_at < end)
+                .order_by(model.created_at.desc(), model.id.desc())
+            )
+            if start is not None:
+                stmt = stmt.where(model.created_at >= start)
+            with self.session_factory() as session:
+                rows = session.execute(stmt).all()
+            self._delete(model, surplus_ids(rows, policy.group_by, tier.period), "downsampled")
+
+    def expire(self, policy: RetentionPolicy, company_id: int, now: datetime):
+        model = policy.model
+        # Whole days only, so a day's rollup can still be rebuilt from its raw rows
+        cutoff = datetime.combine((now - timedelta(days=policy.max_age_days)).date(), datetime.min.time())
+        stmt = (
+            select(model.id)
+            .where(model.company_id == company_id, model.created_at < cutoff)
+            .order_by(model.created_at, model.id)
+            .limit(self.batch_size)
+        )
+        while True:
+            with self.session_factory() as session:
+                ids = session.execute(stmt).scalars().all()
+            if not ids:
+                return
+            self._delete(model, ids, "expired")
+            if self.dry_run:
+                # Nothing was deleted, so the same batch would come back
+                stmt = stmt.where(model.id.not_in(ids))
+
+    def run(self, policies: List[RetentionPolicy], now: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+        """
+        Apply `policies` to every company's rows
+
+        Returns:
+            Rows removed (or, in a dry run, that would be) per table and reason
+        """
+        now = now or datetime.utcnow()
+        with self.session_factory() as session:
+            company_ids = session.execute(select(Company.id).order_by(Company.id)).scalars().all()
+
+        for policy in policies:
+            self.deleted.setdefault(policy.model.__tablename__, {"downsampled": 0, "expired": 0})
+            for company_id in company_ids:
+                if policy.max_age_days:
+                    self.expire(policy, company_id, now)
+                if policy.tiers:
+                    self.downsample(policy, company_id, now)
+        return self.deleted
+
+
+def run_retention(session_factory: Callable[[], Session] = SessionLocal, dry_run: bool = False,
+                  policies: Optional[List[RetentionPolicy]] = None, batch_size: Optional[int] = None,
+                  now: Optional[datetime] = None) -> Dict[str, Dict[str, int]]:
+    """
+    Apply the retention policies once and log what was reclaimed
+
+    Args:
+        session_factory: Session factory for the database
+        dry_run: Count the rows that would go without deleting them
+        policies: Policies to apply (default_policies() by default)
+        batch_size: Rows deleted per transaction (RETENTION_BATCH_SIZE by default)
+        now: Reference time (defaults to now, UTC)
+
+    Returns:
+        Rows removed per table and reason ("downsampled", "expired")
+    """
+    started = time.perf_counter()
+    deleted = RetentionRun(session_factory, batch_size, dry_run).run(policies or default_policies(), now)
+    verb = "Would remove" if dry_run else "Removed"
+    for table, counts in deleted.items():
+        logger.info(f"{verb} {counts['downsampled']} downsampled and {counts['expired']} expired rows from {table}")
+    logger.info(f"Retention run finished in {time.perf_counter() - started:.1f}s")
+    return deleted
+
+
+def main(argv: Optional[List[str]] = None):
+    """Retention worker entry point (runs every RETENTION_INTERVAL_SECONDS unless --once)"""
+    parser = argparse.ArgumentParser(description="Thin out and expire historical insight rows")
+    parser.add_argument("--once", action="store_true", help="Run one pass and exit (for cron)")
+    parser.add_argument("--dry-run", action="store_true", help="Only report what would be removed")
+    args = parser.parse_args(argv)
+
+    logging.basicConfig(
+        level=getattr(logging, settings.LOG_LEVEL.upper(), logging.INFO),
+        format='%(asctime)s - %(name)s - %(levelname)s - %(message)s'
+    )
+    while True:
+        try:
+            run_retention(dry_run=args.dry_run)
+        except Exception as e:
+            if args.once:
+                raise
+            logger.error(f"Retention run failed: {e}", exc_info=True)
+        if args.once:
+            return
+        time.sleep(settings.RETENTION_INTERVAL_SECONDS)
+
+
+if __name__ == '__main__':
+    main()
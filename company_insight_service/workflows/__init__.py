@@ -2,5 +2,6 @@
 Workflows package
 """
 from company_insight_service.workflows.company_research import app_flow
+from company_insight_service.workflows.runner import stream_workflow
 
-__all__ = ['app_flow']
+__all__ = ['app_flow', 'stream_workflow']
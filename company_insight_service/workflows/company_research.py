@@ -1,17 +1,40 @@
 """
 LangGraph workflow for company research
 """
-from typing import TypedDict, List, Optional, Dict, Any
+import logging
+import sqlite3
+from typing import TypedDict, List, Optional, Dict, Annotated
+from langgraph.config import get_stream_writer
 from langgraph.graph import StateGraph, END
+from langgraph.checkpoint.memory import InMemorySaver
 
+try:
+    from langgraph.checkpoint.sqlite import SqliteSaver
+except ImportError:
+    SqliteSaver = None
+
+from company_insight_service.config.settings import settings
+from company_insight_service.monitoring.timing import timed, NODE
 from company_insight_service.services import (
-    analyze_products,
+    iter_product_analyses,
     find_ticker,
     get_stock_data_analysis,
     get_latest_news
 )
+from company_insight_service.services.deadline import (
+    DeadlineExceeded,
+    call_with_deadline,
+    deadline_expired
+)
 from company_insight_service.workers.queue_utils import publish_to_queue
 
+logger = logging.getLogger(__name__)
+
+
+def merge_flags(current: Optional[Dict], update: Optional[Dict]) -> Dict:
+    """State reducer merging per-field flags reported by different nodes"""
+    return {**(current or {}), **(update or {})}
+
 
 class AgentState(TypedDict):
     company_name: str
@@ -21,38 +44,83 @@ class AgentState(TypedDict):
     stock_analysis: Optional[Dict]
     financials: Optional[Dict]
     errors: List[str]
+    timed_out: Annotated[Dict[str, bool], merge_flags]  # field -> cut short by the deadline
 
 
+@timed(NODE, "research")
 def research_company_node(state: AgentState):
-    """Research company news and products"""
-    print(f"Researching: {state['company_name']}")
+    """
+    Research company news and products
+    
+    Each analyzed product is also written to the custom stream as a
+    `product` event as soon as it is ready. When the request deadline
+    passes, whatever was gathered is returned and the cut-short fields are
+    flagged in `timed_out`.
+    """
+    logger.info(f"Researching: {state['company_name']}")
     company = state['company_name']
-    news = get_latest_news(company)
-    products = analyze_products(company)
+    timed_out = {"news": False, "product_sentiment": False}
+    
+    news = []
+    try:
+        news = call_with_deadline(get_latest_news, company)
+    except DeadlineExceeded:
+        timed_out["news"] = True
+    
+    writer = get_stream_writer()
+    products = []
+    try:
+        for product in iter_product_analyses(company):
+            products.append(product)
+            writer({"event": "product", "node": "research", "data": product})
+    except DeadlineExceeded:
+        timed_out["product_sentiment"] = True
+    
     return {
         "news": news,
-        "product_sentiment": products
+        "product_sentiment": products,
+        "timed_out": timed_out
     }
 
 
+@timed(NODE, "financials")
 def financial_node(state: AgentState):
-    """Analyze company financials and stock"""
-    print(f"Analyzing Financials: {state['company_name']}")
+    """Analyze company financials and stock (bounded by the request deadline)"""
+    logger.info(f"Analyzing Financials: {state['company_name']}")
     company = state['company_name']
-    ticker = find_ticker(company)
+    timed_out = {"ticker": False, "stock_analysis": False}
+    ticker = None
     stock_data = None
-    if ticker:
-        stock_data = get_stock_data_analysis(ticker)
+    
+    try:
+        ticker = call_with_deadline(find_ticker, company)
+        # find_ticker gives up quietly when its budget runs out
+        if ticker is None and deadline_expired():
+            raise DeadlineExceeded("Deadline exceeded during ticker search")
+        if ticker:
+            stock_data = call_with_deadline(get_stock_data_analysis, ticker)
+    except DeadlineExceeded:
+        if ticker is None:
+            timed_out["ticker"] = True
+        timed_out["stock_analysis"] = True
     
     return {
         "ticker": ticker,
-        "stock_analysis": stock_data
+        "stock_analysis": stock_data,
+        "timed_out": timed_out
     }
 
 
+@timed(NODE, "save")
 def save_node(state: AgentState):
-    """Queue data for saving to database"""
-    print("Queueing save operation...")
+    """
+    Queue data for saving to database
+    
+    Failures are re-raised so the run stops with this node pending in the
+    checkpoint; resuming the run retries only the save. If the request
+    deadline has passed, nothing is queued and `timed_out.save` is set.
+    """
+    logger.info("Queueing save operation...")
     try:
         payload = {
             "company_name": state['company_name'],
@@ -60,17 +128,45 @@ def save_node(state: AgentState):
             "stock_analysis": state['stock_analysis'],
             "ticker": state['ticker']
         }
-        publish_to_queue(payload)
+        call_with_deadline(publish_to_queue, payload)
         
+    except DeadlineExceeded:
+        logger.warning(f"⏱️ Deadline exceeded before saving {state['company_name']}")
+        return {"timed_out": {"save": True}}
     except Exception as e:
-        print(f"Queueing failed: {e}")
-        return {"errors": [str(e)]}
+        logger.error(f"Queueing failed: {e}")
+        raise
         
     return {}
 
 
-def build_workflow():
-    """Build and compile the LangGraph workflow"""
+def create_checkpointer():
+    """
+    Create the checkpoint saver used to persist workflow runs
+    
+    Uses a local SQLite file when WORKFLOW_CHECKPOINT_PATH is set and the
+    sqlite saver is installed, otherwise falls back to an in-memory saver.
+    """
+    path = settings.WORKFLOW_CHECKPOINT_PATH
+    
+    if path and SqliteSaver is not None:
+        conn = sqlite3.connect(path, check_same_thread=False)
+        logger.info(f"Workflow checkpoints stored in: {path}")
+        return SqliteSaver(conn)
+    
+    if path:
+        logger.warning("langgraph-checkpoint-sqlite not installed, using in-memory checkpoints.")
+    return InMemorySaver()
+
+
+def build_workflow(checkpointer=None):
+    """
+    Build and compile the LangGraph workflow
+    
+    Args:
+        checkpointer: Checkpoint saver; runs are keyed by the `thread_id`
+            passed in the config (the run ID)
+    """
     workflow = StateGraph(AgentState)
     
     workflow.add_node("research", research_company_node)
@@ -83,7 +179,7 @@ def build_workflow():
     workflow.add_edge("financials", "save")
     workflow.add_edge("save", END)
     
-    return workflow.compile()
+    return workflow.compile(checkpointer=checkpointer)
 
 
-app_flow = build_workflow()
+app_flow = build_workflow(checkpointer=create_checkpointer())
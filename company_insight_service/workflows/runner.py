@@ -0,0 +1,169 @@
+"""
+Run the company research workflow with checkpointing and resume support
+"""
+import logging
+import uuid
+from typing import Dict, Iterator, Optional
+
+from company_insight_service.monitoring.timing import collect_timings, summarize_timings
+from company_insight_service.services.deadline import Deadline, deadline_scope
+from company_insight_service.workflows.company_research import app_flow
+
+logger = logging.getLogger(__name__)
+
+# State fields that make up the result of a deep search
+RESULT_FIELDS = ("news", "product_sentiment", "ticker", "stock_analysis")
+
+# Node updates plus events nodes write themselves (see get_stream_writer)
+STREAM_MODES = ["updates", "custom"]
+
+
+def initial_state(company_name: str) -> Dict:
+    """Build the starting state for a new workflow run"""
+    return {
+        "company_name": company_name,
+        "ticker": None,
+        "news": [],
+        "product_sentiment": [],
+        "stock_analysis": None,
+        "financials": None,
+        "errors": [],
+        "timed_out": {}
+    }
+
+
+def run_config(run_id: str) -> Dict:
+    """LangGraph config that keys checkpoints by run ID"""
+    return {"configurable": {"thread_id": run_id}}
+
+
+def get_run_company(run_id: str, flow=None) -> Optional[str]:
+    """Return the company a checkpointed run belongs to, or None if unknown"""
+    flow = flow or app_flow
+    snapshot = flow.get_state(run_config(run_id))
+    return snapshot.values.get("company_name")
+
+
+def completed_node_updates(run_id: str, flow=None) -> Iterator[Dict]:
+    """
+    Yield the outputs of nodes already completed for a checkpointed run
+
+    Args:
+        run_id: ID of the run to inspect
+        flow: Compiled workflow (defaults to app_flow)
+
+    Yields:
+        Dicts of {node_name: updates} in execution order
+    """
+    flow = flow or app_flow
+    history = list(flow.get_state_history(run_config(run_id)))
+
+    # History is newest first; replay oldest first
+    for snapshot in reversed(history):
+        if snapshot.metadata.get("source") != "loop":
+            continue
+        for task in snapshot.tasks:
+            if task.error is None and task.result is not None:
+                yield {task.name: task.result}
+
+
+def stream_workflow(
+    company_name: str,
+    run_id: Optional[str] = None,
+    flow=None,
+    deadline: Optional[Deadline] = None
+) -> Iterator[Dict]:
+    """
+    Stream workflow events, resuming from the checkpoint when the run exists
+
+    A resumed run replays the outputs of its completed nodes and only
+    executes the nodes that are still pending.
+
+    Args:
+        company_name: Name of the company to research
+        run_id: Optional ID of a previous run to resume
+        flow: Compiled workflow (defaults to app_flow)
+        deadline: Optional end-to-end deadline propagated into every node
+            and service call; nodes return partial results once it passes
+
+    Yields:
+        Event dicts: a `run` event, then one `update` event per node.
+        Nodes may emit finer-grained events (e.g. `product`) before their
+        update. Executed (not replayed) updates carry a `timings` breakdown
+        of the node and the service calls made beneath it.
+    """
+    flow = flow or app_flow
+    run_id = run_id or uuid.uuid4().hex
+    config = run_config(run_id)
+
+    snapshot = flow.get_state(config)
+    resumed = snapshot.created_at is not None
+
+    if resumed and snapshot.values.get("company_name") != company_name:
+        raise ValueError(f"Run {run_id} belongs to {snapshot.values.get('company_name')!r}")
+
+    yield {"event": "run", "run_id": run_id, "resumed": resumed}
+
+    if resumed:
+        logger.info(f"Resuming run {run_id} (pending: {list(snapshot.next)})")
+        for event in completed_node_updates(run_id, flow=flow):
+            for node_name, updates in event.items():
+                yield {"event": "update", "node": node_name, "data": updates, "replayed": True}
+
+        if not snapshot.next:
+            return
+        stream = flow.stream(None, config, stream_mode=STREAM_MODES)
+    else:
+        stream = flow.stream(initial_state(company_name), config, stream_mode=STREAM_MODES)
+
+    stream = iter(stream)
+    spans = []
+    reported = 0
+    while True:
+        # Collect around next() only: the node runs while the stream advances
+        with collect_timings(spans), deadline_scope(deadline):
+            item = next(stream, None)
+        if item is None:
+            break
+
+        mode, chunk = item
+        if mode == "custom":
+            yield chunk
+            continue
+
+        timings = summarize_timings(spans[reported:])
+        reported = len(spans)
+        for node_name, updates in chunk.items():
+            yield {"event": "update", "node": node_name, "data": updates, "timings": timings}
+
+
+def apply_update(state: Dict, updates: Dict) -> Dict:
+    """
+    Fold a node update into an accumulated state, in place
+
+    Mirrors the graph's reducers: `timed_out` flags are merged, every other
+    field is overwritten.
+    """
+    timed_out = {**state.get("timed_out", {}), **updates.get("timed_out", {})}
+    state.update(updates)
+    state["timed_out"] = timed_out
+    return state
+
+
+def result_from_state(state: Dict) -> Dict:
+    """Pick the deep search result fields out of a workflow state"""
+    return {field: state.get(field) for field in RESULT_FIELDS}
+
+
+def run_workflow(company_name: str, flow=None, deadline: Optional[Deadline] = None) -> Dict:
+    """
+    Run the workflow to completion in a new run and return the final state
+
+    Args:
+        company_name: Name of the company to research
+        flow: Compiled workflow (defaults to app_flow)
+        deadline: Optional end-to-end deadline, as for stream_workflow
+    """
+    flow = flow or app_flow
+    with deadline_scope(deadline):
+        return flow.invoke(initial_state(company_name), run_config(uuid.uuid4().hex))